@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/contest_problem.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from google.protobuf import duration_pb2 as google_dot_protobuf_dot_duration__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1bproto/contest_problem.proto\x12\x0e\x63ode_prompting\x1a\x1egoogle/protobuf/duration.proto\"\xc6\r\n\x0e\x43ontestProblem\x12\x11\n\x04name\x18\x01 \x01(\tH\x00\x88\x01\x01\x12\x18\n\x0b\x64\x65scription\x18\x02 \x01(\tH\x01\x88\x01\x01\x12\x39\n\x0cpublic_tests\x18\x04 \x03(\x0b\x32#.code_prompting.ContestProblem.Test\x12:\n\rprivate_tests\x18\x05 \x03(\x0b\x32#.code_prompting.ContestProblem.Test\x12<\n\x0fgenerated_tests\x18\x12 \x03(\x0b\x32#.code_prompting.ContestProblem.Test\x12:\n\x06source\x18\x06 \x01(\x0e\x32%.code_prompting.ContestProblem.SourceH\x02\x88\x01\x01\x12\x42\n\ndifficulty\x18\x07 \x01(\x0e\x32).code_prompting.ContestProblem.DifficultyH\x03\x88\x01\x01\x12:\n\tsolutions\x18\x08 \x03(\x0b\x32\'.code_prompting.ContestProblem.Solution\x12\x44\n\x13incorrect_solutions\x18\x13 \x03(\x0b\x32\'.code_prompting.ContestProblem.Solution\x12\x15\n\rcf_contest_id\x18\n \x01(\x05\x12\x10\n\x08\x63\x66_index\x18\x0c \x01(\t\x12\x11\n\tcf_points\x18\r \x01(\x02\x12\x11\n\tcf_rating\x18\x0e \x01(\x05\x12\x0f\n\x07\x63\x66_tags\x18\x0f \x03(\t\x12!\n\x19is_description_translated\x18\x14 \x01(\x08\x12 \n\x18untranslated_description\x18\x15 \x01(\t\x12-\n\ntime_limit\x18\x1d \x01(\x0b\x32\x19.google.protobuf.Duration\x12\x1a\n\x12memory_limit_bytes\x18\x1e \x01(\x03\x12\x12\n\ninput_file\x18\x1f \x01(\t\x12\x13\n\x0boutput_file\x18  \x01(\t\x1aP\n\x04Test\x12\x12\n\x05input\x18\x01 \x01(\tH\x00\x88\x01\x01\x12\x13\n\x06output\x18\x02 \x01(\tH\x01\x88\x01\x01\x42\x08\n\x06_inputB\t\n\x07_outputJ\x04\x08\x03\x10\x04J\x04\x08\x04\x10\x05\x1a\xd1\x02\n\x08Solution\x12G\n\x08language\x18\x01 \x01(\x0e\x32\x30.code_prompting.ContestProblem.Solution.LanguageH\x00\x88\x01\x01\x12\x15\n\x08solution\x18\x02 \x01(\tH\x01\x88\x01\x01\"\x82\x01\n\x08Language\x12\x14\n\x10UNKNOWN_LANGUAGE\x10\x00\x12\n\n\x06PYTHON\x10\x01\x12\x07\n\x03\x43PP\x10\x02\x12\x0b\n\x07PYTHON3\x10\x03\x12\x08\n\x04JAVA\x10\x04\"\x04\x08\x05\x10\x05\"\x04\x08\x06\x10\x06\"\x04\x08\x07\x10\x07\"\x04\x08\x08\x10\x08\"\x04\x08\t\x10\t\"\x04\x08\n\x10\n\"\x04\x08\x0b\x10\x0b\"\x04\x08\x0c\x10\x0c\"\x04\x08\r\x10\rB\x0b\n\t_languageB\x0b\n\t_solutionJ\x04\x08\x03\x10\x04J\x04\x08\x04\x10\x05J\x04\x08\x05\x10\x06J\x04\x08\x06\x10\x07J\x04\x08\x07\x10\x08J\x04\x08\x08\x10\tJ\x04\x08\t\x10\nJ\x04\x08\n\x10\x0bJ\x04\x08\x0b\x10\x0cJ\x04\x08\x0c\x10\rJ\x04\x08\r\x10\x0eJ\x04\x08\x0e\x10\x0f\"\x8d\x01\n\x06Source\x12\x12\n\x0eUNKNOWN_SOURCE\x10\x00\x12\x0c\n\x08\x43ODECHEF\x10\x01\x12\x0e\n\nCODEFORCES\x10\x02\x12\x0f\n\x0bHACKEREARTH\x10\x03\x12\x0b\n\x07\x43ODEJAM\x10\x04\x12\x0b\n\x07\x41TCODER\x10\x06\x12\x08\n\x04\x41IZU\x10\x07\"\x04\x08\x05\x10\x05\"\x04\x08\x08\x10\x08\"\x04\x08\t\x10\t\"\x04\x08\n\x10\n\"\x04\x08\x0b\x10\x0b\"\x85\x02\n\nDifficulty\x12\x16\n\x12UNKNOWN_DIFFICULTY\x10\x00\x12\x08\n\x04\x45\x41SY\x10\x01\x12\n\n\x06MEDIUM\x10\x02\x12\x08\n\x04HARD\x10\x03\x12\n\n\x06HARDER\x10\x04\x12\x0b\n\x07HARDEST\x10\x05\x12\x0c\n\x08\x45XTERNAL\x10\x06\x12\x05\n\x01\x41\x10\x07\x12\x05\n\x01\x42\x10\x08\x12\x05\n\x01\x43\x10\t\x12\x05\n\x01\x44\x10\n\x12\x05\n\x01\x45\x10\x0b\x12\x05\n\x01\x46\x10\x0c\x12\x05\n\x01G\x10\r\x12\x05\n\x01H\x10\x0e\x12\x05\n\x01I\x10\x0f\x12\x05\n\x01J\x10\x10\x12\x05\n\x01K\x10\x11\x12\x05\n\x01L\x10\x13\x12\x05\n\x01M\x10\x14\x12\x05\n\x01N\x10\x15\x12\x05\n\x01O\x10\x16\x12\x05\n\x01P\x10\x17\x12\x05\n\x01Q\x10\x18\x12\x05\n\x01R\x10\x19\x12\x05\n\x01S\x10\x1a\x12\x05\n\x01T\x10\x1b\x12\x05\n\x01U\x10\x1c\x12\x05\n\x01V\x10\x1d\x42\x07\n\x05_nameB\x0e\n\x0c_descriptionB\t\n\x07_sourceB\r\n\x0b_difficultyJ\x04\x08\x03\x10\x04J\x04\x08\t\x10\nJ\x04\x08\x0b\x10\x0cJ\x04\x08\x10\x10\x11J\x04\x08\x11\x10\x12J\x04\x08\x16\x10\x17J\x04\x08\x17\x10\x18J\x04\x08\x18\x10\x19J\x04\x08\x19\x10\x1aJ\x04\x08\x1a\x10\x1bJ\x04\x08\x1b\x10\x1cJ\x04\x08\x1c\x10\x1d\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.contest_problem_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _CONTESTPROBLEM._serialized_start=80
+  _CONTESTPROBLEM._serialized_end=1814
+  _CONTESTPROBLEM_TEST._serialized_start=863
+  _CONTESTPROBLEM_TEST._serialized_end=943
+  _CONTESTPROBLEM_SOLUTION._serialized_start=946
+  _CONTESTPROBLEM_SOLUTION._serialized_end=1283
+  _CONTESTPROBLEM_SOLUTION_LANGUAGE._serialized_start=1055
+  _CONTESTPROBLEM_SOLUTION_LANGUAGE._serialized_end=1185
+  _CONTESTPROBLEM_SOURCE._serialized_start=1286
+  _CONTESTPROBLEM_SOURCE._serialized_end=1427
+  _CONTESTPROBLEM_DIFFICULTY._serialized_start=1430
+  _CONTESTPROBLEM_DIFFICULTY._serialized_end=1691
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,113 @@
+from google.protobuf import duration_pb2 as _duration_pb2
+from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import message as _message
+from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
+
+DESCRIPTOR: _descriptor.FileDescriptor
+
+class ContestProblem(_message.Message):
+    __slots__ = ["cf_contest_id", "cf_index", "cf_points", "cf_rating", "cf_tags", "description", "difficulty", "generated_tests", "incorrect_solutions", "input_file", "is_description_translated", "memory_limit_bytes", "name", "output_file", "private_tests", "public_tests", "solutions", "source", "time_limit", "untranslated_description"]
+    class Difficulty(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+        __slots__ = []
+    class Source(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+        __slots__ = []
+    class Solution(_message.Message):
+        __slots__ = ["language", "solution"]
+        class Language(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+            __slots__ = []
+        CPP: ContestProblem.Solution.Language
+        JAVA: ContestProblem.Solution.Language
+        LANGUAGE_FIELD_NUMBER: _ClassVar[int]
+        PYTHON: ContestProblem.Solution.Language
+        PYTHON3: ContestProblem.Solution.Language
+        SOLUTION_FIELD_NUMBER: _ClassVar[int]
+        UNKNOWN_LANGUAGE: ContestProblem.Solution.Language
+        language: ContestProblem.Solution.Language
+        solution: str
+        def __init__(self, language: _Optional[_Union[ContestProblem.Solution.Language, str]] = ..., solution: _Optional[str] = ...) -> None: ...
+    class Test(_message.Message):
+        __slots__ = ["input", "output"]
+        INPUT_FIELD_NUMBER: _ClassVar[int]
+        OUTPUT_FIELD_NUMBER: _ClassVar[int]
+        input: str
+        output: str
+        def __init__(self, input: _Optional[str] = ..., output: _Optional[str] = ...) -> None: ...
+    A: ContestProblem.Difficulty
+    AIZU: ContestProblem.Source
+    ATCODER: ContestProblem.Source
+    B: ContestProblem.Difficulty
+    C: ContestProblem.Difficulty
+    CF_CONTEST_ID_FIELD_NUMBER: _ClassVar[int]
+    CF_INDEX_FIELD_NUMBER: _ClassVar[int]
+    CF_POINTS_FIELD_NUMBER: _ClassVar[int]
+    CF_RATING_FIELD_NUMBER: _ClassVar[int]
+    CF_TAGS_FIELD_NUMBER: _ClassVar[int]
+    CODECHEF: ContestProblem.Source
+    CODEFORCES: ContestProblem.Source
+    CODEJAM: ContestProblem.Source
+    D: ContestProblem.Difficulty
+    DESCRIPTION_FIELD_NUMBER: _ClassVar[int]
+    DIFFICULTY_FIELD_NUMBER: _ClassVar[int]
+    E: ContestProblem.Difficulty
+    EASY: ContestProblem.Difficulty
+    EXTERNAL: ContestProblem.Difficulty
+    F: ContestProblem.Difficulty
+    G: ContestProblem.Difficulty
+    GENERATED_TESTS_FIELD_NUMBER: _ClassVar[int]
+    H: ContestProblem.Difficulty
+    HACKEREARTH: ContestProblem.Source
+    HARD: ContestProblem.Difficulty
+    HARDER: ContestProblem.Difficulty
+    HARDEST: ContestProblem.Difficulty
+    I: ContestProblem.Difficulty
+    INCORRECT_SOLUTIONS_FIELD_NUMBER: _ClassVar[int]
+    INPUT_FILE_FIELD_NUMBER: _ClassVar[int]
+    IS_DESCRIPTION_TRANSLATED_FIELD_NUMBER: _ClassVar[int]
+    J: ContestProblem.Difficulty
+    K: ContestProblem.Difficulty
+    L: ContestProblem.Difficulty
+    M: ContestProblem.Difficulty
+    MEDIUM: ContestProblem.Difficulty
+    MEMORY_LIMIT_BYTES_FIELD_NUMBER: _ClassVar[int]
+    N: ContestProblem.Difficulty
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    O: ContestProblem.Difficulty
+    OUTPUT_FILE_FIELD_NUMBER: _ClassVar[int]
+    P: ContestProblem.Difficulty
+    PRIVATE_TESTS_FIELD_NUMBER: _ClassVar[int]
+    PUBLIC_TESTS_FIELD_NUMBER: _ClassVar[int]
+    Q: ContestProblem.Difficulty
+    R: ContestProblem.Difficulty
+    S: ContestProblem.Difficulty
+    SOLUTIONS_FIELD_NUMBER: _ClassVar[int]
+    SOURCE_FIELD_NUMBER: _ClassVar[int]
+    T: ContestProblem.Difficulty
+    TIME_LIMIT_FIELD_NUMBER: _ClassVar[int]
+    U: ContestProblem.Difficulty
+    UNKNOWN_DIFFICULTY: ContestProblem.Difficulty
+    UNKNOWN_SOURCE: ContestProblem.Source
+    UNTRANSLATED_DESCRIPTION_FIELD_NUMBER: _ClassVar[int]
+    V: ContestProblem.Difficulty
+    cf_contest_id: int
+    cf_index: str
+    cf_points: float
+    cf_rating: int
+    cf_tags: _containers.RepeatedScalarFieldContainer[str]
+    description: str
+    difficulty: ContestProblem.Difficulty
+    generated_tests: _containers.RepeatedCompositeFieldContainer[ContestProblem.Test]
+    incorrect_solutions: _containers.RepeatedCompositeFieldContainer[ContestProblem.Solution]
+    input_file: str
+    is_description_translated: bool
+    memory_limit_bytes: int
+    name: str
+    output_file: str
+    private_tests: _containers.RepeatedCompositeFieldContainer[ContestProblem.Test]
+    public_tests: _containers.RepeatedCompositeFieldContainer[ContestProblem.Test]
+    solutions: _containers.RepeatedCompositeFieldContainer[ContestProblem.Solution]
+    source: ContestProblem.Source
+    time_limit: _duration_pb2.Duration
+    untranslated_description: str
+    def __init__(self, name: _Optional[str] = ..., description: _Optional[str] = ..., public_tests: _Optional[_Iterable[_Union[ContestProblem.Test, _Mapping]]] = ..., private_tests: _Optional[_Iterable[_Union[ContestProblem.Test, _Mapping]]] = ..., generated_tests: _Optional[_Iterable[_Union[ContestProblem.Test, _Mapping]]] = ..., source: _Optional[_Union[ContestProblem.Source, str]] = ..., difficulty: _Optional[_Union[ContestProblem.Difficulty, str]] = ..., solutions: _Optional[_Iterable[_Union[ContestProblem.Solution, _Mapping]]] = ..., incorrect_solutions: _Optional[_Iterable[_Union[ContestProblem.Solution, _Mapping]]] = ..., cf_contest_id: _Optional[int] = ..., cf_index: _Optional[str] = ..., cf_points: _Optional[float] = ..., cf_rating: _Optional[int] = ..., cf_tags: _Optional[_Iterable[str]] = ..., is_description_translated: bool = ..., untranslated_description: _Optional[str] = ..., time_limit: _Optional[_Union[_duration_pb2.Duration, _Mapping]] = ..., memory_limit_bytes: _Optional[int] = ..., input_file: _Optional[str] = ..., output_file: _Optional[str] = ...) -> None: ...
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: proto/patched_solutions.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from proto import contest_problem_pb2 as proto_dot_contest__problem__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1dproto/patched_solutions.proto\x12\x0e\x63ode_prompting\x1a\x1bproto/contest_problem.proto\"E\n\x11\x43ontestProblemSet\x12\x30\n\x08problems\x18\x01 \x03(\x0b\x32\x1e.code_prompting.ContestProblem\"A\n\rTestResultSet\x12\x30\n\x0ctest_results\x18\x01 \x03(\x0b\x32\x1a.code_prompting.TestResult\"\x9b\x02\n\nTestResult\x12\x0f\n\x07test_id\x18\x01 \x01(\t\x12\x12\n\nproblem_id\x18\x02 \x01(\t\x12\x13\n\x0bsolution_id\x18\x03 \x01(\t\x12\x17\n\x0fsolution_output\x18\x04 \x01(\t\x12\x16\n\x0e\x65xception_info\x18\x05 \x01(\t\x12\x17\n\x0f\x65xpected_output\x18\x06 \x01(\t\x12\x16\n\x0ewall_time_nsec\x18\x07 \x01(\x03\x12\x31\n\x0elimit_exceeded\x18\x08 \x01(\x0e\x32\x19.code_prompting.LimitType\x12\x15\n\rcpu_time_nsec\x18\t \x01(\x03\x12\x16\n\x0epeak_rss_bytes\x18\n \x01(\x03\x12\x0f\n\x07skipped\x18\x0b \x01(\x08\"D\n\x12\x43odePatchingPrompt\x12\x13\n\x0bprompt_name\x18\x01 \x01(\t\x12\x19\n\x11unformated_prompt\x18\x02 \x01(\t\"\x99\x02\n\x0fPatchedSolution\x12\x13\n\x0bsolution_id\x18\x01 \x01(\t\x12\x12\n\nproblem_id\x18\x02 \x01(\t\x12\x11\n\tprompt_id\x18\x03 \x01(\t\x12(\n\x05model\x18\x04 \x01(\x0e\x32\x19.code_prompting.ModelType\x12\x18\n\x10patched_solution\x18\x05 \x01(\t\x12N\n\x10patched_response\x18\x06 \x03(\x0b\x32\x34.code_prompting.PatchedSolution.PatchedResponseEntry\x1a\x36\n\x14PatchedResponseEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"P\n\x12PatchedSolutionSet\x12:\n\x11patched_solutions\x18\x01 \x03(\x0b\x32\x1f.code_prompting.PatchedSolution*\x88\x01\n\tLimitType\x12\x1a\n\x16LIMIT_TYPE_UNSPECIFIED\x10\x00\x12\x18\n\x14LIMIT_TYPE_WALL_TIME\x10\x01\x12\x17\n\x13LIMIT_TYPE_CPU_TIME\x10\x02\x12\x15\n\x11LIMIT_TYPE_MEMORY\x10\x03\x12\x15\n\x11LIMIT_TYPE_OUTPUT\x10\x04*a\n\tModelType\x12\x1a\n\x16MODEL_TYPE_UNSPECIFIED\x10\x00\x12\x1c\n\x18MODEL_TYPE_GPT_3_5_TURBO\x10\x01\x12\x1a\n\x16MODEL_TYPE_GPT_4_TURBO\x10\x02\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.patched_solutions_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _PATCHEDSOLUTION_PATCHEDRESPONSEENTRY._options = None
+  _PATCHEDSOLUTION_PATCHEDRESPONSEENTRY._serialized_options = b'8\001'
+  _LIMITTYPE._serialized_start=939
+  _LIMITTYPE._serialized_end=1075
+  _MODELTYPE._serialized_start=1077
+  _MODELTYPE._serialized_end=1174
+  _CONTESTPROBLEMSET._serialized_start=78
+  _CONTESTPROBLEMSET._serialized_end=147
+  _TESTRESULTSET._serialized_start=149
+  _TESTRESULTSET._serialized_end=214
+  _TESTRESULT._serialized_start=217
+  _TESTRESULT._serialized_end=500
+  _CODEPATCHINGPROMPT._serialized_start=502
+  _CODEPATCHINGPROMPT._serialized_end=570
+  _PATCHEDSOLUTION._serialized_start=573
+  _PATCHEDSOLUTION._serialized_end=854
+  _PATCHEDSOLUTION_PATCHEDRESPONSEENTRY._serialized_start=800
+  _PATCHEDSOLUTION_PATCHEDRESPONSEENTRY._serialized_end=854
+  _PATCHEDSOLUTIONSET._serialized_start=856
+  _PATCHEDSOLUTIONSET._serialized_end=936
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,97 @@
+from proto import contest_problem_pb2 as _contest_problem_pb2
+from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import message as _message
+from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
+
+DESCRIPTOR: _descriptor.FileDescriptor
+LIMIT_TYPE_CPU_TIME: LimitType
+LIMIT_TYPE_MEMORY: LimitType
+LIMIT_TYPE_OUTPUT: LimitType
+LIMIT_TYPE_UNSPECIFIED: LimitType
+LIMIT_TYPE_WALL_TIME: LimitType
+MODEL_TYPE_GPT_3_5_TURBO: ModelType
+MODEL_TYPE_GPT_4_TURBO: ModelType
+MODEL_TYPE_UNSPECIFIED: ModelType
+
+class CodePatchingPrompt(_message.Message):
+    __slots__ = ["prompt_name", "unformated_prompt"]
+    PROMPT_NAME_FIELD_NUMBER: _ClassVar[int]
+    UNFORMATED_PROMPT_FIELD_NUMBER: _ClassVar[int]
+    prompt_name: str
+    unformated_prompt: str
+    def __init__(self, prompt_name: _Optional[str] = ..., unformated_prompt: _Optional[str] = ...) -> None: ...
+
+class ContestProblemSet(_message.Message):
+    __slots__ = ["problems"]
+    PROBLEMS_FIELD_NUMBER: _ClassVar[int]
+    problems: _containers.RepeatedCompositeFieldContainer[_contest_problem_pb2.ContestProblem]
+    def __init__(self, problems: _Optional[_Iterable[_Union[_contest_problem_pb2.ContestProblem, _Mapping]]] = ...) -> None: ...
+
+class PatchedSolution(_message.Message):
+    __slots__ = ["model", "patched_response", "patched_solution", "problem_id", "prompt_id", "solution_id"]
+    class PatchedResponseEntry(_message.Message):
+        __slots__ = ["key", "value"]
+        KEY_FIELD_NUMBER: _ClassVar[int]
+        VALUE_FIELD_NUMBER: _ClassVar[int]
+        key: str
+        value: str
+        def __init__(self, key: _Optional[str] = ..., value: _Optional[str] = ...) -> None: ...
+    MODEL_FIELD_NUMBER: _ClassVar[int]
+    PATCHED_RESPONSE_FIELD_NUMBER: _ClassVar[int]
+    PATCHED_SOLUTION_FIELD_NUMBER: _ClassVar[int]
+    PROBLEM_ID_FIELD_NUMBER: _ClassVar[int]
+    PROMPT_ID_FIELD_NUMBER: _ClassVar[int]
+    SOLUTION_ID_FIELD_NUMBER: _ClassVar[int]
+    model: ModelType
+    patched_response: _containers.ScalarMap[str, str]
+    patched_solution: str
+    problem_id: str
+    prompt_id: str
+    solution_id: str
+    def __init__(self, solution_id: _Optional[str] = ..., problem_id: _Optional[str] = ..., prompt_id: _Optional[str] = ..., model: _Optional[_Union[ModelType, str]] = ..., patched_solution: _Optional[str] = ..., patched_response: _Optional[_Mapping[str, str]] = ...) -> None: ...
+
+class PatchedSolutionSet(_message.Message):
+    __slots__ = ["patched_solutions"]
+    PATCHED_SOLUTIONS_FIELD_NUMBER: _ClassVar[int]
+    patched_solutions: _containers.RepeatedCompositeFieldContainer[PatchedSolution]
+    def __init__(self, patched_solutions: _Optional[_Iterable[_Union[PatchedSolution, _Mapping]]] = ...) -> None: ...
+
+class TestResult(_message.Message):
+    __slots__ = ["cpu_time_nsec", "exception_info", "expected_output", "limit_exceeded", "peak_rss_bytes", "problem_id", "skipped", "solution_id", "solution_output", "test_id", "wall_time_nsec"]
+    CPU_TIME_NSEC_FIELD_NUMBER: _ClassVar[int]
+    EXCEPTION_INFO_FIELD_NUMBER: _ClassVar[int]
+    EXPECTED_OUTPUT_FIELD_NUMBER: _ClassVar[int]
+    LIMIT_EXCEEDED_FIELD_NUMBER: _ClassVar[int]
+    PEAK_RSS_BYTES_FIELD_NUMBER: _ClassVar[int]
+    PROBLEM_ID_FIELD_NUMBER: _ClassVar[int]
+    SKIPPED_FIELD_NUMBER: _ClassVar[int]
+    SOLUTION_ID_FIELD_NUMBER: _ClassVar[int]
+    SOLUTION_OUTPUT_FIELD_NUMBER: _ClassVar[int]
+    TEST_ID_FIELD_NUMBER: _ClassVar[int]
+    WALL_TIME_NSEC_FIELD_NUMBER: _ClassVar[int]
+    cpu_time_nsec: int
+    exception_info: str
+    expected_output: str
+    limit_exceeded: LimitType
+    peak_rss_bytes: int
+    problem_id: str
+    skipped: bool
+    solution_id: str
+    solution_output: str
+    test_id: str
+    wall_time_nsec: int
+    def __init__(self, test_id: _Optional[str] = ..., problem_id: _Optional[str] = ..., solution_id: _Optional[str] = ..., solution_output: _Optional[str] = ..., exception_info: _Optional[str] = ..., expected_output: _Optional[str] = ..., wall_time_nsec: _Optional[int] = ..., limit_exceeded: _Optional[_Union[LimitType, str]] = ..., cpu_time_nsec: _Optional[int] = ..., peak_rss_bytes: _Optional[int] = ..., skipped: bool = ...) -> None: ...
+
+class TestResultSet(_message.Message):
+    __slots__ = ["test_results"]
+    TEST_RESULTS_FIELD_NUMBER: _ClassVar[int]
+    test_results: _containers.RepeatedCompositeFieldContainer[TestResult]
+    def __init__(self, test_results: _Optional[_Iterable[_Union[TestResult, _Mapping]]] = ...) -> None: ...
+
+class LimitType(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = []
+
+class ModelType(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = []
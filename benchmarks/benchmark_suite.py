@@ -0,0 +1,406 @@
+# Benchmarks of the pipeline's hot paths on synthetic data, e.g.
+#   PYTHONPATH=.:.bin python -m benchmarks.benchmark_suite \
+#       --baseline data/benchmarks/<previous commit>.json
+# writes data/benchmarks/<commit>.json and exits non-zero when a benchmark got
+# slower than the baseline by more than --threshold
+from __future__ import annotations
+import argparse
+import asyncio
+import dataclasses
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import openai
+
+from benchmarks import synthetic_data
+from code_patching import solution_evaluator
+from code_patching import solution_generator
+from domain.domain_dao import CompressedDomainFileDAO, DomainFileDAO
+from domain.problems_d import ContestProblemSetD, PatchedSolutionSetD, TestResultSetD
+from llm_handler.async_openai_handler import AsyncOpenAIHandler
+from llm_handler.mock_llm_handler import MockLLMHandler
+from llm_handler.mock_openai_server import MockOpenAIServer
+
+BENCHMARK_RESULTS_DIR = "data/benchmarks"
+DEFAULT_REPEATS = 3
+# Slowdown of the median relative to the baseline reported as a regression
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_EVAL_MODES = (solution_evaluator.ExecutionMode.SANDBOX_POOL,
+                      solution_evaluator.ExecutionMode.BATCHED)
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    # Records, ids, chunks or tests processed by each repeat
+    items: int
+    seconds: List[float]
+
+    @property
+    def median_sec(self) -> float:
+        return statistics.median(self.seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'items': self.items,
+            'seconds': self.seconds,
+            'min_sec': min(self.seconds),
+            'median_sec': self.median_sec,
+            'items_per_sec': self.items / self.median_sec
+        }
+
+
+@dataclasses.dataclass(frozen=True)
+class Regression:
+    name: str
+    baseline_median_sec: float
+    median_sec: float
+
+    @property
+    def slowdown(self) -> float:
+        return self.median_sec / self.baseline_median_sec - 1
+
+
+# Synthetic dataset shared by the benchmarks, and a scratch directory for what
+# they write
+@dataclasses.dataclass
+class BenchmarkContext:
+    scale: synthetic_data.SyntheticScale
+    repeats: int
+    work_dir: str
+    eval_modes: Sequence[solution_evaluator.ExecutionMode] = DEFAULT_EVAL_MODES
+
+    def __post_init__(self):
+        self.problem_sets = synthetic_data.contest_problem_sets(self.scale)
+        self.patched_sets = synthetic_data.patched_solution_sets(
+            self.problem_sets, self.scale)
+        self.result_sets = synthetic_data.test_result_sets(
+            self.problem_sets, self.patched_sets)
+
+    def fresh_dir(self, name: str) -> str:
+        dir_path = os.path.join(self.work_dir, name)
+        shutil.rmtree(dir_path, ignore_errors=True)
+        os.makedirs(dir_path)
+        return dir_path
+
+
+# Seconds per call of fn, after an untimed setup and collection so neither is
+# charged to fn
+def time_repeats(fn: Callable[[], Any],
+                 repeats: int,
+                 setup: Optional[Callable[[], Any]] = None) -> List[float]:
+    seconds = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def bench_serialization(ctx: BenchmarkContext) -> Iterable[BenchmarkResult]:
+    for domain_objects in (ctx.problem_sets, ctx.patched_sets,
+                           ctx.result_sets):
+        name = type(domain_objects[0]).__name__
+        compressed = [
+            domain_object.to_compressed() for domain_object in domain_objects
+        ]
+        yield BenchmarkResult(
+            f"to_compressed/{name}", len(domain_objects),
+            time_repeats(lambda: [o.to_compressed() for o in domain_objects],
+                         ctx.repeats))
+        domain_cls = type(domain_objects[0])
+        yield BenchmarkResult(
+            f"from_compressed/{name}", len(compressed),
+            time_repeats(
+                lambda: [domain_cls.from_compressed(c) for c in compressed],
+                ctx.repeats))
+
+
+def bench_proto_id(ctx: BenchmarkContext) -> Iterable[BenchmarkResult]:
+    records = {
+        'ContestProblemD': [
+            problem for problem_set in ctx.problem_sets
+            for problem in problem_set.problems
+        ],
+        'PatchedSolutionD': [
+            solution for patched_set in ctx.patched_sets
+            for solution in patched_set.solutions
+        ],
+        'TestResultD': [
+            result for result_set in ctx.result_sets
+            for result in result_set.test_results
+        ]
+    }
+    for name, domain_objects in records.items():
+
+        def forget_ids(domain_objects=domain_objects):
+            # proto_id is memoized per instance
+            for domain_object in domain_objects:
+                vars(domain_object).pop('proto_id', None)
+
+        yield BenchmarkResult(
+            f"proto_id/{name}", len(domain_objects),
+            time_repeats(lambda: [o.proto_id for o in domain_objects],
+                         ctx.repeats,
+                         setup=forget_ids))
+
+
+def bench_compressed_dao(ctx: BenchmarkContext) -> Iterable[BenchmarkResult]:
+    for domain_cls, domain_objects in ((ContestProblemSetD, ctx.problem_sets),
+                                       (TestResultSetD, ctx.result_sets)):
+        name = domain_cls.__name__
+        dao = CompressedDomainFileDAO(ctx.fresh_dir(f"compressed_{name}"),
+                                      domain_cls)
+        yield BenchmarkResult(
+            f"compressed_dao/write/{name}", len(domain_objects),
+            time_repeats(lambda: dao.write(domain_objects),
+                         ctx.repeats,
+                         setup=dao.clear_cache))
+        for parallelize in (False, True):
+            mode = 'parallel' if parallelize else 'sequential'
+            yield BenchmarkResult(
+                f"compressed_dao/read_{mode}/{name}", len(domain_objects),
+                time_repeats(lambda: list(dao.read(parallelize=parallelize)),
+                             ctx.repeats))
+
+
+def bench_domain_file_dao(ctx: BenchmarkContext) -> Iterable[BenchmarkResult]:
+    for extension in ('jsonl', 'pb'):
+        dao = DomainFileDAO(
+            os.path.join(ctx.fresh_dir(f"domain_file_{extension}"),
+                         f"results.{extension}"), TestResultSetD)
+        yield BenchmarkResult(
+            f"domain_file_dao/write/{extension}", len(ctx.result_sets),
+            time_repeats(lambda: dao.write(ctx.result_sets), ctx.repeats))
+        yield BenchmarkResult(
+            f"domain_file_dao/read/{extension}", len(ctx.result_sets),
+            time_repeats(lambda: list(dao.read()), ctx.repeats))
+
+
+def _first_problems(ctx: BenchmarkContext,
+                    count: int) -> List[ContestProblemSetD]:
+    problems = [
+        problem for problem_set in ctx.problem_sets
+        for problem in problem_set.problems
+    ][:count]
+    return [ContestProblemSetD(problems=problems)]
+
+
+# Against an in-process MockLLMHandler and a local mock of the OpenAI API
+# answering at once, so only the pipeline's own overhead and the HTTP round
+# trip are measured
+def bench_generation(ctx: BenchmarkContext) -> Iterable[BenchmarkResult]:
+    contest_problems = _first_problems(ctx, ctx.scale.generated_problems)
+    prompts = synthetic_data.prompts(ctx.scale)
+    model_types = synthetic_data.model_types(ctx.scale)
+    dao = CompressedDomainFileDAO(ctx.fresh_dir("generation"),
+                                  PatchedSolutionSetD)
+    content = json.dumps(
+        {"solution": synthetic_data.patched_source(0, 0, model_types[0])})
+
+    async def generate(server: MockOpenAIServer) -> int:
+        handler = AsyncOpenAIHandler(client=openai.AsyncOpenAI(
+            api_key="benchmark", base_url=server.base_url))
+        return sum([
+            len(solution_set.solutions)
+            async for solution_set in solution_generator.
+            generate_prompted_dataset_async(contest_problems=contest_problems,
+                                            model_types=model_types,
+                                            prompts=prompts,
+                                            domain_reader=dao,
+                                            handler=handler)
+        ])
+
+    items = sum(len(problem.incorrect_solutions)
+                for problem in contest_problems[0].problems) * len(prompts) * \
+        len(model_types)
+    mock_handler = MockLLMHandler(chat_completion=[content])
+
+    def generate_sync():
+        for _ in solution_generator.generate_prompted_dataset(
+                contest_problems=contest_problems,
+                model_types=model_types,
+                prompts=prompts,
+                domain_reader=dao,
+                handler=mock_handler):
+            pass
+
+    yield BenchmarkResult(
+        "generation/sync_mock_handler", items,
+        time_repeats(generate_sync, ctx.repeats, setup=dao.clear_cache))
+    with MockOpenAIServer(content=content) as server:
+        yield BenchmarkResult(
+            "generation/async_mock_server", items,
+            time_repeats(lambda: asyncio.run(generate(server)),
+                         ctx.repeats,
+                         setup=dao.clear_cache))
+
+
+# Tests per second, from a fresh result directory each repeat so nothing is
+# resumed
+def bench_evaluation(ctx: BenchmarkContext) -> Iterable[BenchmarkResult]:
+    problems = _first_problems(ctx, ctx.scale.evaluated_problems)[0].problems
+    problem_ids = {problem.proto_id for problem in problems}
+    problem_tests = {problem.proto_id: problem.tests for problem in problems}
+    patched_solutions: Dict[str, List] = {
+        problem_id: []
+        for problem_id in problem_ids
+    }
+    for patched_set in ctx.patched_sets:
+        for solution in patched_set.solutions:
+            if solution.problem_id in problem_ids:
+                patched_solutions[solution.problem_id].append(solution)
+    items = sum(
+        len(solutions) * len(problem_tests[problem_id])
+        for problem_id, solutions in patched_solutions.items())
+
+    for execution_mode in ctx.eval_modes:
+        dao = CompressedDomainFileDAO(ctx.fresh_dir("evaluation"),
+                                      TestResultSetD)
+
+        def evaluate(execution_mode=execution_mode, dao=dao):
+            for _ in solution_evaluator.eval_patched_solutions(
+                    problem_tests=problem_tests,
+                    patched_solutions=patched_solutions,
+                    domain_writer=dao,
+                    execution_mode=execution_mode):
+                pass
+
+        yield BenchmarkResult(
+            f"evaluation/{execution_mode.value}", items,
+            time_repeats(evaluate, ctx.repeats, setup=dao.clear_cache))
+
+
+BENCHMARKS: Dict[str, Callable[[BenchmarkContext],
+                               Iterable[BenchmarkResult]]] = {
+                                   'serialization': bench_serialization,
+                                   'proto_id': bench_proto_id,
+                                   'compressed_dao': bench_compressed_dao,
+                                   'domain_file_dao': bench_domain_file_dao,
+                                   'generation': bench_generation,
+                                   'evaluation': bench_evaluation,
+                               }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True,
+                              text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    scale: synthetic_data.SyntheticScale,
+    repeats: int = DEFAULT_REPEATS,
+    groups: Optional[Iterable[str]] = None,
+    eval_modes: Sequence[solution_evaluator.ExecutionMode] = DEFAULT_EVAL_MODES
+) -> Dict[str, Any]:
+    results: List[BenchmarkResult] = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        ctx = BenchmarkContext(scale, repeats, work_dir, eval_modes)
+        for group in groups or BENCHMARKS:
+            for result in BENCHMARKS[group](ctx):
+                logging.info(f"{result.name}: {result.median_sec:.4f}s, "
+                             f"{result.items / result.median_sec:.1f}/s")
+                results.append(result)
+    return {
+        'commit': git_commit(),
+        'created_at': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scale': dataclasses.asdict(scale),
+        'repeats': repeats,
+        'benchmarks': [result.to_dict() for result in results]
+    }
+
+
+# Benchmarks whose median grew by more than threshold. Reports of different
+# scales are not comparable
+def find_regressions(report: Dict[str, Any],
+                     baseline: Dict[str, Any],
+                     threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    if report['scale'] != baseline['scale']:
+        raise ValueError(f"Report scale {report['scale']} does not match "
+                         f"baseline scale {baseline['scale']}")
+    baseline_medians = {
+        benchmark['name']: benchmark['median_sec']
+        for benchmark in baseline['benchmarks']
+    }
+    regressions = []
+    for benchmark in report['benchmarks']:
+        baseline_median = baseline_medians.get(benchmark['name'])
+        if baseline_median and (benchmark['median_sec'] > baseline_median *
+                                (1 + threshold)):
+            regressions.append(
+                Regression(benchmark['name'], baseline_median,
+                           benchmark['median_sec']))
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale',
+                        type=float,
+                        default=1.0,
+                        help="multiplies the default SyntheticScale")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--only',
+                        nargs='+',
+                        choices=list(BENCHMARKS),
+                        help="benchmark groups to run, all by default")
+    parser.add_argument(
+        '--eval-modes',
+        nargs='+',
+        choices=[mode.value for mode in solution_evaluator.ExecutionMode],
+        default=[mode.value for mode in DEFAULT_EVAL_MODES])
+    parser.add_argument('--output',
+                        help="defaults to BENCHMARK_RESULTS_DIR/<commit>.json")
+    parser.add_argument('--baseline',
+                        help="report of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    report = run_suite(
+        synthetic_data.SyntheticScale().scaled(args.scale), args.repeats,
+        args.only,
+        [solution_evaluator.ExecutionMode(mode) for mode in args.eval_modes])
+    output = args.output or os.path.join(
+        BENCHMARK_RESULTS_DIR, f"{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    logging.info(f"Wrote {output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        regressions = find_regressions(report, json.load(file), args.threshold)
+    for regression in regressions:
+        logging.warning(f"{regression.name} regressed by "
+                        f"{regression.slowdown:.0%}: "
+                        f"{regression.baseline_median_sec:.4f}s -> "
+                        f"{regression.median_sec:.4f}s")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from benchmarks import benchmark_suite
+from benchmarks import synthetic_data
+from code_patching import solution_evaluator
+
+_SCALE = synthetic_data.SyntheticScale(problem_sets=2,
+                                       problems_per_set=2,
+                                       solutions_per_problem=2,
+                                       tests_per_problem=2,
+                                       prompts=2,
+                                       models=2,
+                                       description_chars=100,
+                                       generated_problems=1,
+                                       evaluated_problems=1)
+
+
+def test_synthetic_data_is_reproducible():
+    problem_sets = synthetic_data.contest_problem_sets(_SCALE)
+    assert problem_sets == synthetic_data.contest_problem_sets(_SCALE)
+    patched_sets = synthetic_data.patched_solution_sets(problem_sets, _SCALE)
+    result_sets = synthetic_data.test_result_sets(problem_sets, patched_sets)
+    assert [len(s.solutions) for s in patched_sets] == [16, 16]
+    assert [len(s.test_results) for s in result_sets] == [32, 32]
+    patched_sources = {
+        s.patched_solution
+        for patched_set in patched_sets
+        for s in patched_set.solutions
+    }
+    # Distinct per problem, which is what evaluation shares executions by
+    assert len(patched_sources) == 8
+
+
+def test_run_suite_reports_every_benchmark():
+    report = json.loads(
+        json.dumps(
+            benchmark_suite.run_suite(
+                _SCALE,
+                repeats=1,
+                eval_modes=[solution_evaluator.ExecutionMode.BATCHED])))
+    benchmarks = {b['name']: b for b in report['benchmarks']}
+    assert {
+        'from_compressed/TestResultSetD', 'proto_id/PatchedSolutionD',
+        'compressed_dao/read_parallel/ContestProblemSetD',
+        'domain_file_dao/read/jsonl', 'generation/sync_mock_handler',
+        'generation/async_mock_server', 'evaluation/batched'
+    } <= set(benchmarks)
+    assert benchmarks['proto_id/PatchedSolutionD']['items'] == 32
+    assert benchmarks['generation/sync_mock_handler']['items'] == 8
+    assert benchmarks['generation/async_mock_server']['items'] == 8
+    assert benchmarks['evaluation/batched']['items'] == 16
+    assert all(len(b['seconds']) == 1 for b in report['benchmarks'])
+    assert report['scale']['problem_sets'] == 2
+
+
+def _report(**median_secs) -> dict:
+    return {
+        'scale': {},
+        'benchmarks': [{
+            'name': name,
+            'median_sec': median_sec
+        } for name, median_sec in median_secs.items()]
+    }
+
+
+def test_find_regressions_over_threshold():
+    regressions = benchmark_suite.find_regressions(_report(a=1.3, b=1.1,
+                                                           c=5.0),
+                                                   _report(a=1.0, b=1.0),
+                                                   threshold=0.2)
+    assert [(r.name, r.slowdown)
+            for r in regressions] == [('a', pytest.approx(0.3))]
+    with pytest.raises(ValueError):
+        benchmark_suite.find_regressions(_report(), {
+            **_report(), 'scale': {
+                'problem_sets': 1
+            }
+        })
+
+
+def test_main_exits_non_zero_on_regression(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    argv = ['--scale', '0.25', '--repeats', '1', '--only', 'proto_id']
+    assert benchmark_suite.main(argv + ['--output', str(baseline_path)]) == 0
+    baseline = json.loads(baseline_path.read_text())
+    for benchmark in baseline['benchmarks']:
+        benchmark['median_sec'] /= 100
+    baseline_path.write_text(json.dumps(baseline))
+    assert benchmark_suite.main(argv + [
+        '--output',
+        str(tmp_path / "report.json"), '--baseline',
+        str(baseline_path)
+    ]) == 1
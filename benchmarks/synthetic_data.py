@@ -0,0 +1,163 @@
+from __future__ import annotations
+import dataclasses
+import random
+import string
+from typing import List, cast
+
+from domain.problems_d import CodePatchingPromptD, ContestProblemD, ContestProblemSetD, PatchedSolutionD, PatchedSolutionSetD, SolutionD, TestD, TestResultD, TestResultSetD
+import proto.patched_solutions_pb2 as ps_pb2
+
+_PYTHON3 = 3
+_SUM_SOLUTION = "a, b = map(int, input().split())\nprint(a + b + {offset})\n"
+
+
+# Each problem set is written as one chunk, and every problem gets
+# solutions_per_problem incorrect solutions, patched once per prompt and model
+@dataclasses.dataclass(frozen=True)
+class SyntheticScale:
+    problem_sets: int = 4
+    problems_per_set: int = 25
+    solutions_per_problem: int = 5
+    tests_per_problem: int = 10
+    prompts: int = 3
+    models: int = 2
+    description_chars: int = 2_000
+    # Generation and evaluation run on the first problems only, as they
+    # cost a request or a process per solution rather than a decode
+    generated_problems: int = 10
+    evaluated_problems: int = 4
+
+    # Scales the number of problem sets, and with them every count
+    def scaled(self, factor: float) -> SyntheticScale:
+        return dataclasses.replace(
+            self,
+            problem_sets=max(1, round(self.problem_sets * factor)),
+            generated_problems=max(1, round(self.generated_problems * factor)),
+            evaluated_problems=max(1, round(self.evaluated_problems * factor)))
+
+
+def prompts(scale: SyntheticScale) -> List[CodePatchingPromptD]:
+    return [
+        CodePatchingPromptD(
+            f"prompt_{i}", f"Fix the solution ({i}): {{function_description}}")
+        for i in range(scale.prompts)
+    ]
+
+
+def model_types(scale: SyntheticScale) -> List['ps_pb2.ModelType']:
+    # The enum wrapper types its values as plain ints
+    models = [
+        cast('ps_pb2.ModelType', model) for model in ps_pb2.ModelType.values()
+        if model != ps_pb2.MODEL_TYPE_UNSPECIFIED
+    ]
+    if scale.models > len(models):
+        raise ValueError(f"Only {len(models)} model types exist")
+    return models[:scale.models]
+
+
+def _tests(rng: random.Random, count: int) -> List[TestD]:
+    tests = []
+    for _ in range(count):
+        a, b = rng.randrange(10**6), rng.randrange(10**6)
+        tests.append(TestD(input=f"{a} {b}\n", output=f"{a + b}\n"))
+    return tests
+
+
+# Problems of summing two integers, whose incorrect solutions are off by their
+# index, so only a patch of solution 0 can pass
+def contest_problem_sets(scale: SyntheticScale,
+                         seed: int = 0) -> List[ContestProblemSetD]:
+    rng = random.Random(seed)
+    words = string.ascii_lowercase + ' ' * 5
+    problem_sets = []
+    for set_index in range(scale.problem_sets):
+        problems = []
+        for problem_index in range(scale.problems_per_set):
+            public_count = scale.tests_per_problem // 2
+            problems.append(
+                ContestProblemD(
+                    name=f"problem_{set_index}_{problem_index}",
+                    description=''.join(
+                        rng.choices(words, k=scale.description_chars)),
+                    difficulty=rng.randrange(1, 8),  # type: ignore
+                    time_limit_nsec=2 * 10**9,
+                    memory_limit_bytes=256 * 2**20,
+                    public_tests=_tests(rng, public_count),
+                    private_tests=_tests(
+                        rng, scale.tests_per_problem - public_count),
+                    generated_tests=[],
+                    solutions=[
+                        SolutionD(solution=_SUM_SOLUTION.format(offset=0),
+                                  language=_PYTHON3)  # type: ignore
+                    ],
+                    incorrect_solutions=[
+                        SolutionD(solution=_SUM_SOLUTION.format(offset=i),
+                                  language=_PYTHON3)  # type: ignore
+                        for i in range(1, scale.solutions_per_problem + 1)
+                    ],
+                    cf_points=rng.random() * 3000,
+                    cf_rating=rng.randrange(800, 3500)))
+        problem_sets.append(ContestProblemSetD(problems=problems))
+    return problem_sets
+
+
+# Fixes every other solution. The trailing comment keeps each patch distinct,
+# so evaluation cannot share their executions
+def patched_source(solution_index: int, prompt_index: int,
+                   model: 'ps_pb2.ModelType') -> str:
+    offset = 0 if (solution_index + prompt_index) % 2 else solution_index + 1
+    return (_SUM_SOLUTION.format(offset=offset) +
+            f"# solution {solution_index} prompt {prompt_index} "
+            f"model {model}\n")
+
+
+# A patch per incorrect solution, prompt and model
+def patched_solution_sets(problem_sets: List[ContestProblemSetD],
+                          scale: SyntheticScale) -> List[PatchedSolutionSetD]:
+    patched_sets = []
+    for problem_set in problem_sets:
+        solutions = []
+        for problem in problem_set.problems:
+            for solution_index, solution in enumerate(
+                    problem.incorrect_solutions):
+                for prompt_index, prompt in enumerate(prompts(scale)):
+                    for model in model_types(scale):
+                        source = patched_source(solution_index, prompt_index,
+                                                model)
+                        solutions.append(
+                            PatchedSolutionD(
+                                solution_id=solution.proto_id,
+                                problem_id=problem.proto_id,
+                                prompt_id=prompt.proto_id,
+                                model=model,
+                                patched_solution=source,
+                                patched_response={"response": source}))
+        patched_sets.append(PatchedSolutionSetD(solutions=solutions))
+    return patched_sets
+
+
+# As eval_patched_solutions would write them for a full run
+def test_result_sets(
+        problem_sets: List[ContestProblemSetD],
+        patched_sets: List[PatchedSolutionSetD]) -> List[TestResultSetD]:
+    problem_tests = {
+        problem.proto_id: problem.tests
+        for problem_set in problem_sets
+        for problem in problem_set.problems
+    }
+    result_sets = []
+    for patched_set in patched_sets:
+        results = []
+        for solution in patched_set.solutions:
+            for wall_time_nsec, test in enumerate(
+                    problem_tests[solution.problem_id], start=10**6):
+                results.append(
+                    TestResultD(test_id=test.proto_id,
+                                problem_id=solution.problem_id,
+                                solution_id=solution.proto_id,
+                                solution_output=test.output,
+                                exception_info="",
+                                expected_output=test.output,
+                                wall_time_nsec=wall_time_nsec))
+        result_sets.append(TestResultSetD(test_results=results))
+    return result_sets
@@ -0,0 +1,330 @@
+from __future__ import annotations
+import collections
+import concurrent.futures as futures
+import dataclasses
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.connection as mp_connection
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple, Union
+
+from domain import metrics
+
+# ('host', port) for TCP or a file path for a Unix socket
+AddressT = Union[Tuple[str, int], str]
+
+DEFAULT_ADDRESS: AddressT = ('127.0.0.1', 0)
+DEFAULT_LEASE_TIMEOUT_SEC = 30.0
+
+
+@dataclasses.dataclass
+class _Task:
+    fn: Callable
+    args: Tuple
+    kwargs: Dict[str, Any]
+    future: futures.Future
+
+
+@dataclasses.dataclass
+class _Lease:
+    task_id: int
+    worker: str
+    deadline: float
+
+
+# Hands submitted tasks out to workers over a TCP or Unix socket, e.g. for
+#   eval_patched_solutions(..., executor_factory=functools.partial(
+#       EvalCoordinator, address=('0.0.0.0', 6000), authkey=KEY))
+# with run_eval_worker(('coordinator', 6000), KEY) on each other host. Idle
+# workers pull the next task, which is leased to them and requeued when they
+# disconnect or stop heartbeating for lease_timeout_sec. The max_workers local
+# workers come from a forkserver, as forked workers cannot start their own
+# task processes once this process started one, and are not daemonic, as
+# daemonic processes cannot start any
+class EvalCoordinator(futures.Executor):
+
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 initializer: Optional[Callable] = None,
+                 initargs: Tuple = (),
+                 address: AddressT = DEFAULT_ADDRESS,
+                 authkey: Optional[bytes] = None,
+                 lease_timeout_sec: float = DEFAULT_LEASE_TIMEOUT_SEC):
+        self._initializer = initializer
+        self._initargs = initargs
+        self._authkey = authkey or multiprocessing.current_process().authkey
+        self._lease_timeout_sec = lease_timeout_sec
+        self._lock = threading.Condition()
+        self._task_ids = itertools.count()
+        self._tasks: Dict[int, _Task] = {}
+        self._pending: Deque[int] = collections.deque()
+        self._leases: Dict[int, _Lease] = {}
+        self._connections: Set[mp_connection.Connection] = set()
+        self._closing = False
+        self._listening = True
+        self.reassigned = 0
+
+        # Listener's default backlog of 1 drops workers connecting at once
+        self._listener = mp_connection.Listener(address,
+                                                backlog=socket.SOMAXCONN,
+                                                authkey=self._authkey)
+        self.address: AddressT = self._listener.address
+        context = multiprocessing.get_context('forkserver')
+        self._local_workers = [
+            context.Process(target=run_eval_worker,
+                            args=(self.address, self._authkey))
+            for _ in range((
+                os.cpu_count() or 1) if max_workers is None else max_workers)
+        ]
+        for process in self._local_workers:
+            process.start()
+        self._threads = [
+            threading.Thread(target=self._accept_loop, daemon=True),
+            threading.Thread(target=self._expire_loop, daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> futures.Future:
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Cannot submit after shutdown")
+            task_id = next(self._task_ids)
+            future: futures.Future = futures.Future()
+            self._tasks[task_id] = _Task(fn, args, kwargs, future)
+            self._pending.append(task_id)
+            metrics.set_gauge('coordinator_pending_tasks', len(self._pending))
+            self._lock.notify()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            if cancel_futures:
+                for task_id in self._pending:
+                    self._tasks.pop(task_id).future.cancel()
+                self._pending.clear()
+            # Re-checked every lease_timeout_sec, as tasks cannot finish once
+            # every worker is gone
+            while wait and not self._lock.wait_for(lambda: not self._tasks,
+                                                   self._lease_timeout_sec):
+                if not self._workers_alive():
+                    self._fail_tasks(RuntimeError("No eval workers left"))
+            self._closing = True
+            self._lock.notify_all()
+        # Workers connecting from here on are still accepted and told to stop
+        for process in self._local_workers:
+            process.join(timeout=self._lease_timeout_sec)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._listening = False
+        # Wakes the accept loop, which only checks _listening between accepts
+        try:
+            mp_connection.Client(self.address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        for thread in self._threads:
+            thread.join()
+        self._listener.close()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.close()
+
+    def _workers_alive(self) -> bool:
+        # Called with the lock held
+        return bool(self._leases or self._connections) or any(
+            process.is_alive() for process in self._local_workers)
+
+    def _fail_tasks(self, error: Exception):
+        # Called with the lock held
+        for task in self._tasks.values():
+            if not task.future.done():
+                task.future.set_exception(error)
+        self._tasks.clear()
+        self._pending.clear()
+        self._leases.clear()
+        self._lock.notify_all()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (EOFError, OSError,
+                    multiprocessing.AuthenticationError) as e:
+                if not self._listening:
+                    return
+                logging.warning(f"Rejected eval worker connection - {e}")
+                continue
+            if not self._listening:
+                connection.close()
+                return
+            with self._lock:
+                self._connections.add(connection)
+            threading.Thread(target=self._serve_worker,
+                             args=(connection, ),
+                             daemon=True).start()
+
+    def _expire_loop(self):
+        with self._lock:
+            while not self._closing:
+                now = time.monotonic()
+                for lease in list(self._leases.values()):
+                    if lease.deadline < now:
+                        logging.warning(f"Lease on task {lease.task_id} by "
+                                        f"{lease.worker} expired")
+                        self._requeue(lease.task_id)
+                self._lock.wait(self._lease_timeout_sec / 4)
+
+    def _requeue(self, task_id: int):
+        # Called with the lock held
+        del self._leases[task_id]
+        self._pending.appendleft(task_id)
+        self.reassigned += 1
+        metrics.count('coordinator_reassigned_total')
+        self._lock.notify()
+
+    # None once shut down
+    def _next_task(self, worker: str) -> Optional[Tuple[int, _Task]]:
+        with self._lock:
+            while True:
+                self._lock.wait_for(lambda: self._pending or self._closing)
+                if not self._pending:
+                    return None
+                task_id = self._pending.popleft()
+                task = self._tasks[task_id]
+                # Re-leased tasks are already running
+                if task.future.running(
+                ) or task.future.set_running_or_notify_cancel():
+                    self._leases[task_id] = _Lease(
+                        task_id, worker,
+                        time.monotonic() + self._lease_timeout_sec)
+                    return task_id, task
+                del self._tasks[task_id]
+                self._lock.notify_all()
+
+    def _complete(self, task_id: int, ok: bool, value: Any):
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            self._leases.pop(task_id, None)
+            if task_id in self._pending:
+                self._pending.remove(task_id)
+            self._lock.notify_all()
+        # None when the task was already completed after being re-leased
+        if task is None:
+            return
+        if ok:
+            task.future.set_result(value)
+        else:
+            task.future.set_exception(value)
+
+    def _serve_worker(self, connection: mp_connection.Connection):
+        worker = "unknown"
+        try:
+            worker = connection.recv()
+            connection.send((self._initializer, self._initargs,
+                             self._lease_timeout_sec / 3))
+            while True:
+                message = connection.recv()
+                if message[0] == 'heartbeat':
+                    with self._lock:
+                        lease = self._leases.get(message[1])
+                        if lease is not None and lease.worker == worker:
+                            lease.deadline = (time.monotonic() +
+                                              self._lease_timeout_sec)
+                    continue
+                if message[0] == 'result':
+                    _, task_id, ok, value = message
+                    self._complete(task_id, ok, value)
+                # A result doubles as the request for the next task, as
+                # separate writes would stall on Nagle's algorithm over TCP
+                next_task = self._next_task(worker)
+                if next_task is None:
+                    connection.send(('stop', ))
+                    return
+                task_id, task = next_task
+                connection.send(
+                    ('task', task_id, task.fn, task.args, task.kwargs))
+        except (EOFError, OSError) as e:
+            if not self._closing:
+                logging.warning(f"Lost eval worker {worker} - {e}")
+        finally:
+            with self._lock:
+                for lease in list(self._leases.values()):
+                    if lease.worker == worker:
+                        self._requeue(lease.task_id)
+                self._connections.discard(connection)
+            connection.close()
+
+
+def _heartbeat(send: Callable[[Tuple], None], task_id: int,
+               done: threading.Event, heartbeat_sec: float):
+    while not done.wait(heartbeat_sec):
+        send(('heartbeat', task_id))
+
+
+# Task process of run_eval_worker, running tasks until the worker closes the
+# pipe or dies
+def _run_tasks(tasks: mp_connection.Connection,
+               initializer: Optional[Callable], initargs: Tuple):
+    if initializer is not None:
+        initializer(*initargs)
+    try:
+        while True:
+            fn, args, kwargs = tasks.recv()
+            try:
+                result: Tuple = (True, fn(*args, **kwargs))
+            except Exception as e:
+                result = (False, e)
+            tasks.send(result)
+    except (EOFError, OSError):
+        return
+
+
+# Tasks run in a single-threaded process from a forkserver, started before the
+# heartbeat thread, as forking the sandbox's children from a multithreaded
+# process can deadlock them. A task that kills that process ends the worker, so
+# its lease is reassigned
+def run_eval_worker(address: AddressT, authkey: Optional[bytes] = None):
+    authkey = authkey or multiprocessing.current_process().authkey
+    worker = f"{os.uname().nodename}:{os.getpid()}"
+    with mp_connection.Client(address, authkey=authkey) as connection:
+        send_lock = threading.Lock()
+
+        def send(message: Tuple):
+            with send_lock:
+                connection.send(message)
+
+        connection.send(worker)
+        initializer, initargs, heartbeat_sec = connection.recv()
+        tasks, task_process_tasks = multiprocessing.Pipe()
+        multiprocessing.get_context('forkserver').Process(
+            target=_run_tasks,
+            args=(task_process_tasks, initializer, initargs),
+            daemon=True).start()
+        task_process_tasks.close()
+        with tasks:
+            send(('request', ))
+            while True:
+                message = connection.recv()
+                if message[0] == 'stop':
+                    return
+                _, task_id, fn, args, kwargs = message
+                done = threading.Event()
+                threading.Thread(target=_heartbeat,
+                                 args=(send, task_id, done, heartbeat_sec),
+                                 daemon=True).start()
+                try:
+                    tasks.send((fn, args, kwargs))
+                    ok, value = tasks.recv()
+                except (EOFError, OSError) as e:
+                    logging.warning(f"Eval worker {worker} lost its task "
+                                    f"process on task {task_id} - {e}")
+                    return
+                finally:
+                    done.set()
+                send(('result', task_id, ok, value))
@@ -0,0 +1,118 @@
+import functools
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Tuple
+
+import pytest
+
+from code_patching import distributed_eval
+from code_patching import solution_evaluator
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import TestD, TestResultSetD
+from domain.testing import make_patched_solution
+
+
+def _worker_pid() -> int:
+    # Task processes come from a forkserver, so this is not os.getppid()
+    worker = multiprocessing.parent_process()
+    assert worker is not None and worker.pid is not None
+    return worker.pid
+
+
+# Fails the first call for a marker_path by sending fail to the worker whose
+# task process runs it
+def _fail_once(marker_path: str, fail: int, value: int) -> int:
+    try:
+        os.close(os.open(marker_path, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return value
+    os.kill(_worker_pid(), fail)
+    return value
+
+
+def _task_process() -> Tuple[int, int]:
+    return _worker_pid(), threading.active_count()
+
+
+@pytest.mark.parametrize("execution_mode", [
+    solution_evaluator.ExecutionMode.SANDBOX_POOL,
+    solution_evaluator.ExecutionMode.BATCHED
+])
+def test_eval_patched_solutions_on_coordinator(
+        tmp_path, execution_mode: solution_evaluator.ExecutionMode):
+    tests = [TestD(input=f"{i} 1\n", output=f"{i + 1}\n") for i in range(4)]
+    solutions = [
+        make_patched_solution(
+            "a, b = map(int, input().split())\nprint(a + b)\n"),
+        make_patched_solution("print(0)\n")
+    ]
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    results = [
+        r for result_set in solution_evaluator.eval_patched_solutions(
+            problem_tests={"problem": tests},
+            patched_solutions={"problem": solutions},
+            domain_writer=dao,
+            max_workers=2,
+            process_batch_size=1,
+            batch_size=2,
+            execution_mode=execution_mode,
+            executor_factory=functools.partial(
+                distributed_eval.EvalCoordinator,
+                address=str(tmp_path / "eval.sock")))
+        for r in result_set.test_results
+    ]
+    assert len(results) == 8
+    assert {(r.solution_id, r.test_id)
+            for r in results
+            if r.is_correct} == {(solutions[0].proto_id, test.proto_id)
+                                 for test in tests}
+    assert sum(len(s.test_results) for s in dao.read()) == 8
+
+
+@pytest.mark.parametrize("fail", [signal.SIGKILL, signal.SIGSTOP])
+def test_tasks_of_lost_workers_are_reassigned(tmp_path, fail: int):
+    authkey = b"test"
+    with distributed_eval.EvalCoordinator(max_workers=0,
+                                          authkey=authkey,
+                                          lease_timeout_sec=2) as executor:
+        workers = [
+            multiprocessing.get_context('forkserver').Process(
+                target=distributed_eval.run_eval_worker,
+                args=(executor.address, authkey)) for _ in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        task_futures = [
+            executor.submit(_fail_once, str(tmp_path / "marker"), fail, i)
+            for i in range(4)
+        ]
+        assert [future.result(timeout=30)
+                for future in task_futures] == list(range(4))
+        assert executor.reassigned == 1
+    for worker in workers:
+        worker.kill()
+        worker.join()
+
+
+def test_many_workers_connecting_at_once():
+    with distributed_eval.EvalCoordinator(max_workers=8) as executor:
+        assert list(executor.map(pow, range(32),
+                                 [2] * 32)) == [i**2 for i in range(32)]
+
+
+def test_tasks_run_in_a_single_threaded_process():
+    with distributed_eval.EvalCoordinator(max_workers=1) as executor:
+        worker_pid, thread_count = executor.submit(_task_process).result()
+    assert worker_pid != os.getpid()
+    assert thread_count == 1
+
+
+def test_shutdown_fails_tasks_once_no_workers_are_left():
+    executor = distributed_eval.EvalCoordinator(max_workers=0,
+                                                lease_timeout_sec=0.2)
+    future = executor.submit(pow, 2, 2)
+    executor.shutdown()
+    with pytest.raises(RuntimeError):
+        future.result(timeout=0)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+import ast
+import dataclasses
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import PatchedSolutionD, SolutionD, TestD, TestResultD, TestResultSetD
+import proto.patched_solutions_pb2 as ps_pb2
+
+# prompt_id of the PatchedSolutionDs the baseline results are evaluated for
+BASE_SOLUTION_PROMPT_ID = "base_solution"
+
+
+# The unpatched solution as evaluated for the baseline results
+def base_patched_solution(problem_id: str,
+                          solution: SolutionD) -> PatchedSolutionD:
+    return PatchedSolutionD(problem_id=problem_id,
+                            patched_solution=solution.solution,
+                            solution_id=solution.proto_id,
+                            prompt_id=BASE_SOLUTION_PROMPT_ID,
+                            model=ps_pb2.MODEL_TYPE_UNSPECIFIED,
+                            patched_response={})
+
+
+# Ignores comments, whitespace and formatting, e.g. quote style or redundant
+# parentheses
+def ast_fingerprint(source: str) -> Optional[str]:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    return hashlib.sha256(ast.dump(tree).encode('utf-8')).hexdigest()
+
+
+@dataclasses.dataclass
+class PassThroughStats:
+    patched_solutions: int = 0
+    passed_through: int = 0
+    # Test executions replaced by baseline results
+    reused_results: int = 0
+
+
+# Baseline results re-keyed to the patched solutions that left their original
+# solution unchanged
+@dataclasses.dataclass(frozen=True)
+class PassThroughReport:
+    reused_results: List[TestResultD]
+    stats: Dict[Tuple[str, 'ps_pb2.ModelType'], PassThroughStats]
+
+    def log(self):
+        for (prompt_id, model), stats in sorted(self.stats.items()):
+            logging.info(f"{prompt_id} - {ps_pb2.ModelType.Name(model)}: "
+                         f"{stats.passed_through}/{stats.patched_solutions} "
+                         f"unchanged, {stats.reused_results} executions saved")
+
+
+# Decodes only the chunks holding results for base_solution_ids
+def _base_results(
+        base_dao: CompressedDomainFileDAO[TestResultSetD],
+        base_solution_ids: Set[str]) -> Dict[str, Dict[str, TestResultD]]:
+    results: Dict[str, Dict[str, TestResultD]] = {}
+    for chunk_path, entries in base_dao.read_index():
+        positions = [
+            position
+            for position, (solution_id, _, skipped, _) in enumerate(entries)
+            if solution_id in base_solution_ids and not skipped
+        ]
+        if not positions:
+            continue
+        chunk_results = base_dao.read_chunk(chunk_path).test_results
+        for position in positions:
+            result = chunk_results[position]
+            results.setdefault(result.solution_id, {})[result.test_id] = result
+    return results
+
+
+# Reuses the baseline results of the patched solutions with the same AST
+# fingerprint as the original they patched. A patch is only passed through when
+# the baseline covers all of its problem's tests, the rest are left to
+# eval_patched_solutions
+def find_pass_through(
+        problem_tests: Dict[str, List[TestD]],
+        patched_solutions: Dict[str, List[PatchedSolutionD]],
+        original_solutions: Dict[str, SolutionD],
+        base_dao: CompressedDomainFileDAO[TestResultSetD]
+) -> PassThroughReport:
+    fingerprints: Dict[str, Optional[str]] = {}
+    unchanged: List[Tuple[PatchedSolutionD, PatchedSolutionD]] = []
+    stats: Dict[Tuple[str, 'ps_pb2.ModelType'], PassThroughStats] = {}
+    for problem_id, solutions in patched_solutions.items():
+        for solution in solutions:
+            key = (solution.prompt_id, solution.model)
+            stats.setdefault(key, PassThroughStats()).patched_solutions += 1
+            original = original_solutions.get(solution.solution_id)
+            if original is None:
+                continue
+            if solution.solution_id not in fingerprints:
+                fingerprints[solution.solution_id] = ast_fingerprint(
+                    original.solution)
+            fingerprint = fingerprints[solution.solution_id]
+            if fingerprint and fingerprint == ast_fingerprint(
+                    solution.patched_solution):
+                unchanged.append(
+                    (solution, base_patched_solution(problem_id, original)))
+
+    base_results = _base_results(base_dao,
+                                 {base.proto_id
+                                  for _, base in unchanged})
+    reused_results: List[TestResultD] = []
+    for solution, base in unchanged:
+        solution_base_results = base_results.get(base.proto_id, {})
+        test_ids = list(
+            dict.fromkeys(test.proto_id
+                          for test in problem_tests[solution.problem_id]))
+        if not all(test_id in solution_base_results for test_id in test_ids):
+            continue
+        reused_results.extend(
+            dataclasses.replace(solution_base_results[test_id],
+                                solution_id=solution.proto_id)
+            for test_id in test_ids)
+        key = (solution.prompt_id, solution.model)
+        stats[key].passed_through += 1
+        stats[key].reused_results += len(test_ids)
+    return PassThroughReport(reused_results=reused_results, stats=stats)
@@ -0,0 +1,92 @@
+import dataclasses
+
+from code_patching import pass_through
+from code_patching import solution_evaluator
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import PatchedSolutionD, SolutionD, TestD, TestResultSetD
+from domain.testing import make_patched_solution
+from proto.contest_problem_pb2 import ContestProblem
+import proto.patched_solutions_pb2 as ps_pb2
+
+_BUGGY_SOLUTION = SolutionD(solution="a, b = map(int, input().split())\n"
+                            "print(a - b)\n",
+                            language=ContestProblem.Solution.PYTHON3)
+_TESTS = [
+    TestD(input="1 2\n", output="3\n"),
+    TestD(input="5 5\n", output="10\n")
+]
+
+
+def _patched(source: str, prompt_id: str = "prompt") -> PatchedSolutionD:
+    return make_patched_solution(source,
+                                 solution_id=_BUGGY_SOLUTION.proto_id,
+                                 prompt_id=prompt_id)
+
+
+def test_ast_fingerprint_ignores_formatting():
+    fingerprint = pass_through.ast_fingerprint(_BUGGY_SOLUTION.solution)
+    assert fingerprint == pass_through.ast_fingerprint(
+        "# reads two ints\na,b = map( int,input().split() )\n\n"
+        "print((a - b))  # difference\n")
+    assert fingerprint != pass_through.ast_fingerprint(
+        "a, b = map(int, input().split())\nprint(a + b)\n")
+    assert pass_through.ast_fingerprint("def f(:\n") is None
+
+
+def test_unchanged_patches_reuse_baseline_results(tmp_path):
+    (tmp_path / "base").mkdir()
+    (tmp_path / "patched").mkdir()
+    base_dao = CompressedDomainFileDAO(str(tmp_path / "base"), TestResultSetD)
+    base = pass_through.base_patched_solution("problem", _BUGGY_SOLUTION)
+    base_dao.write([
+        TestResultSetD(test_results=[
+            solution_evaluator.execute_solution(base, test) for test in _TESTS
+        ])
+    ])
+    unchanged = _patched("a,b = map(int, input().split())  # same\n"
+                         "print(a - b)\n")
+    fixed = _patched(_BUGGY_SOLUTION.solution.replace("-", "+"), "other")
+    patched_solutions = {"problem": [unchanged, fixed]}
+
+    report = pass_through.find_pass_through(
+        {"problem": _TESTS}, patched_solutions,
+        {_BUGGY_SOLUTION.proto_id: _BUGGY_SOLUTION}, base_dao)
+    assert [(r.solution_id, r.test_id) for r in report.reused_results
+            ] == [(unchanged.proto_id, test.proto_id) for test in _TESTS]
+    assert report.stats == {
+        ("prompt", ps_pb2.MODEL_TYPE_GPT_4_TURBO):
+        pass_through.PassThroughStats(1, 1, 2),
+        ("other", ps_pb2.MODEL_TYPE_GPT_4_TURBO):
+        pass_through.PassThroughStats(1, 0, 0),
+    }
+
+    dao = CompressedDomainFileDAO(str(tmp_path / "patched"), TestResultSetD)
+    results = [
+        r for result_set in solution_evaluator.eval_patched_solutions(
+            problem_tests={"problem": _TESTS},
+            patched_solutions=patched_solutions,
+            domain_writer=dao,
+            max_workers=1,
+            reused_results=report.reused_results)
+        for r in result_set.test_results
+    ]
+    assert len(results) == 4
+    assert {r.solution_id for r in results if r.is_correct} == {fixed.proto_id}
+    assert [
+        dataclasses.replace(r, solution_id=base.proto_id) for r in results
+        if r.solution_id == unchanged.proto_id
+    ] == list(base_dao.read())[0].test_results
+
+
+def test_partial_baseline_is_not_reused(tmp_path):
+    base_dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    base = pass_through.base_patched_solution("problem", _BUGGY_SOLUTION)
+    base_dao.write([
+        TestResultSetD(test_results=[
+            solution_evaluator.execute_solution(base, _TESTS[0])
+        ])
+    ])
+    report = pass_through.find_pass_through(
+        {"problem": _TESTS}, {"problem": [_patched(_BUGGY_SOLUTION.solution)]},
+        {_BUGGY_SOLUTION.proto_id: _BUGGY_SOLUTION}, base_dao)
+    assert report.reused_results == []
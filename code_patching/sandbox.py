@@ -0,0 +1,382 @@
+import builtins
+import dataclasses
+import importlib
+import math
+import os
+import resource
+import selectors
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+from typing import List, NoReturn, Optional, Tuple
+
+import proto.patched_solutions_pb2 as ps_pb2
+
+DEFAULT_TIMEOUT_SEC: float = 10
+SOLUTION_FILENAME = "<string>"
+_READ_SIZE = 1 << 16
+# Written by the child on its status pipe when the solution hits MemoryError
+_MEMORY_ERROR_MARKER = b"M"
+# Wall clock budget per second of the hard CPU rlimit, leaving CPU-bound
+# solutions to the rlimit and room for time spent blocked
+_WALL_TIME_PER_CPU_SEC = 2
+# ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+_MAXRSS_UNIT_BYTES = 1 if sys.platform == "darwin" else 1024
+
+# Imported once per worker interpreter so every forked child inherits them
+# instead of paying the import cost per test.
+PREIMPORTED_MODULES: Tuple[str, ...] = (
+    "array",
+    "bisect",
+    "collections",
+    "copy",
+    "decimal",
+    "fractions",
+    "functools",
+    "heapq",
+    "io",
+    "itertools",
+    "math",
+    "operator",
+    "os",
+    "queue",
+    "random",
+    "re",
+    "statistics",
+    "string",
+    "sys",
+    "threading",
+    "typing",
+)
+
+
+# Pool initializer pre-importing the solution template
+def warm_interpreter():
+    for module_name in PREIMPORTED_MODULES:
+        importlib.import_module(module_name)
+
+
+# Per-execution limits, 0 disables a limit
+@dataclasses.dataclass(frozen=True)
+class ResourceLimits:
+    cpu_time_sec: float = 0
+    memory_bytes: int = 0
+    output_bytes: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class ExecutionResult:
+    stdout: str
+    stderr: str
+    wall_time_nsec: int
+    limit_exceeded: 'ps_pb2.LimitType' = ps_pb2.LIMIT_TYPE_UNSPECIFIED
+    cpu_time_nsec: int = 0
+    peak_rss_bytes: int = 0
+    # Parts of wall_time_nsec spent forking the child and reaping it
+    spawn_nsec: int = 0
+    teardown_nsec: int = 0
+
+    @property
+    def timed_out(self) -> bool:
+        return self.limit_exceeded == ps_pb2.LIMIT_TYPE_WALL_TIME
+
+    def passes(self, expected_output: str) -> bool:
+        return (self.limit_exceeded == ps_pb2.LIMIT_TYPE_UNSPECIFIED
+                and self.stdout == expected_output)
+
+
+def wall_timeout_sec(limits: ResourceLimits) -> float:
+    if not limits.cpu_time_sec:
+        return DEFAULT_TIMEOUT_SEC
+    return _WALL_TIME_PER_CPU_SEC * (_cpu_rlimit_sec(limits) + 1)
+
+
+def compile_solution(source: str) -> types.CodeType:
+    return compile(source, SOLUTION_FILENAME, "exec", dont_inherit=True)
+
+
+def format_compile_error(e: BaseException) -> str:
+    return "".join(traceback.format_exception_only(type(e), e))
+
+
+def execute_source(source: str,
+                   stdin: str,
+                   timeout: Optional[float] = None,
+                   limits: Optional[ResourceLimits] = None) -> ExecutionResult:
+    try:
+        code = compile_solution(source)
+    except (SyntaxError, ValueError) as e:
+        return ExecutionResult(stdout="",
+                               stderr=format_compile_error(e),
+                               wall_time_nsec=0)
+    return execute_code(code, stdin, timeout, limits)
+
+
+# The child's process group is killed on timeout or once it exceeds the output
+# limit, CPU time and memory are capped by rlimits
+def execute_code(code: types.CodeType,
+                 stdin: str,
+                 timeout: Optional[float] = None,
+                 limits: Optional[ResourceLimits] = None) -> ExecutionResult:
+    limits = limits or ResourceLimits()
+    if timeout is None:
+        timeout = wall_timeout_sec(limits)
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    status_r, status_w = os.pipe()
+    start_nsec = time.monotonic_ns()
+    pid = os.fork()
+    if pid == 0:
+        for fd in (stdin_w, stdout_r, stderr_r, status_r):
+            os.close(fd)
+        _child_main(code, stdin_r, stdout_w, stderr_w, status_w, limits)
+    for fd in (stdin_r, stdout_w, stderr_w, status_w):
+        os.close(fd)
+    spawned_nsec = time.monotonic_ns()
+
+    stdout, stderr, limit_exceeded = _communicate(
+        pid, stdin_w, stdout_r, stderr_r, stdin.encode(),
+        start_nsec + int(timeout * 1e9), limits.output_bytes)
+    ran_nsec = time.monotonic_ns()
+    _, status, rusage = os.wait4(pid, 0)
+    memory_error = _read_status(status_r) == _MEMORY_ERROR_MARKER
+    wall_time_nsec = time.monotonic_ns() - start_nsec
+    cpu_time_nsec = int((rusage.ru_utime + rusage.ru_stime) * 1e9)
+    peak_rss_bytes = rusage.ru_maxrss * _MAXRSS_UNIT_BYTES
+    if limit_exceeded == ps_pb2.LIMIT_TYPE_UNSPECIFIED:
+        limit_exceeded = _rlimit_exceeded(status, cpu_time_nsec, memory_error,
+                                          limits)
+
+    if limit_exceeded == ps_pb2.LIMIT_TYPE_UNSPECIFIED:
+        stdout_str, stderr_str = _decode(stdout), _decode(stderr)
+    elif limit_exceeded == ps_pb2.LIMIT_TYPE_WALL_TIME:
+        stdout_str = ""
+        stderr_str = f"Timeout - Solution timed out after {timeout} seconds"
+    elif limit_exceeded == ps_pb2.LIMIT_TYPE_OUTPUT:
+        stdout_str = ""
+        stderr_str = f"Output limit exceeded - {limits.output_bytes} bytes"
+    elif limit_exceeded == ps_pb2.LIMIT_TYPE_CPU_TIME:
+        stdout_str = _decode(stdout)
+        stderr_str = (_decode(stderr) +
+                      f"CPU time limit exceeded - {limits.cpu_time_sec} "
+                      f"seconds")
+    else:
+        stdout_str = _decode(stdout)
+        stderr_str = (_decode(stderr) +
+                      f"Memory limit exceeded - {limits.memory_bytes} bytes")
+    return ExecutionResult(stdout=stdout_str,
+                           stderr=stderr_str,
+                           wall_time_nsec=wall_time_nsec,
+                           limit_exceeded=limit_exceeded,
+                           cpu_time_nsec=cpu_time_nsec,
+                           peak_rss_bytes=peak_rss_bytes,
+                           spawn_nsec=spawned_nsec - start_nsec,
+                           teardown_nsec=start_nsec + wall_time_nsec -
+                           ran_nsec)
+
+
+def _read_status(status_r: int) -> bytes:
+    # Non-blocking, as a process the solution spawned may hold the write end
+    os.set_blocking(status_r, False)
+    try:
+        return os.read(status_r, len(_MEMORY_ERROR_MARKER))
+    except BlockingIOError:
+        return b""
+    finally:
+        os.close(status_r)
+
+
+def _rlimit_exceeded(status: int, cpu_time_nsec: int, memory_error: bool,
+                     limits: ResourceLimits) -> 'ps_pb2.LimitType':
+    if limits.cpu_time_sec and os.WIFSIGNALED(status):
+        # SIGXCPU at the soft limit, SIGKILL at the hard limit. Any other
+        # SIGKILL, such as the OOM killer's, is only CPU time when the child
+        # had used up its limit
+        signum = os.WTERMSIG(status)
+        used_limit = cpu_time_nsec >= limits.cpu_time_sec * 1e9
+        if signum == signal.SIGXCPU or (signum == signal.SIGKILL
+                                        and used_limit):
+            return ps_pb2.LIMIT_TYPE_CPU_TIME
+    if limits.memory_bytes and memory_error:
+        return ps_pb2.LIMIT_TYPE_MEMORY
+    return ps_pb2.LIMIT_TYPE_UNSPECIFIED
+
+
+def _decode(output: bytes) -> str:
+    # Mirrors subprocess text mode: universal newlines
+    return output.decode("utf-8",
+                         errors="replace").replace("\r\n",
+                                                   "\n").replace("\r", "\n")
+
+
+def _kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _close_all(selector: selectors.BaseSelector):
+    for key in list(selector.get_map().values()):
+        selector.unregister(key.fd)
+        os.close(key.fd)
+
+
+def _communicate(
+        pid: int, stdin_w: int, stdout_r: int, stderr_r: int, stdin: bytes,
+        deadline_nsec: int,
+        output_limit_bytes: int) -> Tuple[bytes, bytes, 'ps_pb2.LimitType']:
+    outputs = {stdout_r: [], stderr_r: []}
+    output_bytes = 0
+    stdin_view = memoryview(stdin)
+    with selectors.DefaultSelector() as selector:
+        if stdin_view:
+            os.set_blocking(stdin_w, False)
+            selector.register(stdin_w, selectors.EVENT_WRITE)
+        else:
+            os.close(stdin_w)
+        selector.register(stdout_r, selectors.EVENT_READ)
+        selector.register(stderr_r, selectors.EVENT_READ)
+
+        while selector.get_map():
+            remaining_sec = (deadline_nsec - time.monotonic_ns()) / 1e9
+            if remaining_sec <= 0:
+                _kill_group(pid)
+                _close_all(selector)
+                return b"", b"", ps_pb2.LIMIT_TYPE_WALL_TIME
+            for key, _ in selector.select(remaining_sec):
+                if key.fd == stdin_w:
+                    try:
+                        written = os.write(stdin_w, stdin_view[:_READ_SIZE])
+                        stdin_view = stdin_view[written:]
+                    except BrokenPipeError:
+                        stdin_view = stdin_view[:0]
+                    if not stdin_view:
+                        selector.unregister(stdin_w)
+                        os.close(stdin_w)
+                    continue
+                data = os.read(key.fd, _READ_SIZE)
+                if not data:
+                    selector.unregister(key.fd)
+                    os.close(key.fd)
+                    continue
+                outputs[key.fd].append(data)
+                output_bytes += len(data)
+                if output_limit_bytes and output_bytes > output_limit_bytes:
+                    _kill_group(pid)
+                    _close_all(selector)
+                    return b"", b"", ps_pb2.LIMIT_TYPE_OUTPUT
+    return (b"".join(outputs[stdout_r]), b"".join(outputs[stderr_r]),
+            ps_pb2.LIMIT_TYPE_UNSPECIFIED)
+
+
+def _address_space_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+# RLIMIT_CPU only takes whole seconds
+def _cpu_rlimit_sec(limits: ResourceLimits) -> int:
+    return max(1, math.ceil(limits.cpu_time_sec))
+
+
+def _apply_limits(limits: ResourceLimits):
+    if limits.cpu_time_sec:
+        soft_sec = _cpu_rlimit_sec(limits)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft_sec, soft_sec + 1))
+    if limits.memory_bytes:
+        # The forked child already maps the whole worker interpreter, so the
+        # problem's budget is granted on top of the inherited address space
+        address_space = _address_space_bytes() + limits.memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+
+
+def _child_main(code: types.CodeType, stdin_r: int, stdout_w: int,
+                stderr_w: int, status_w: int,
+                limits: ResourceLimits) -> NoReturn:
+    exit_code = 1
+    try:
+        os.setpgid(0, 0)
+        _apply_limits(limits)
+        os.dup2(stdin_r, 0)
+        os.dup2(stdout_w, 1)
+        os.dup2(stderr_w, 2)
+        for fd in (stdin_r, stdout_w, stderr_w):
+            os.close(fd)
+        sys.stdin = sys.__stdin__ = open(0,
+                                         "r",
+                                         encoding="utf-8",
+                                         closefd=False)
+        sys.stdout = sys.__stdout__ = open(1,
+                                           "w",
+                                           encoding="utf-8",
+                                           closefd=False)
+        sys.stderr = sys.__stderr__ = open(2,
+                                           "w",
+                                           encoding="utf-8",
+                                           errors="backslashreplace",
+                                           buffering=1,
+                                           closefd=False)
+        exit_code = _run_as_main(code, status_w)
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def _run_as_main(code: types.CodeType, status_w: int) -> int:
+    main_module = types.ModuleType("__main__")
+    main_module.__dict__["__builtins__"] = builtins
+    sys.modules["__main__"] = main_module
+    sys.argv = ["-c"]
+    try:
+        exec(code, main_module.__dict__)
+        _join_threads()
+        return 0
+    except SystemExit as e:
+        return _exit_code(e)
+    except MemoryError as e:
+        # Marked before printing, which may itself run out of memory
+        os.write(status_w, _MEMORY_ERROR_MARKER)
+        traceback.print_exception(type(e), e, _solution_traceback(e))
+        return 1
+    except BaseException as e:
+        traceback.print_exception(type(e), e, _solution_traceback(e))
+        return 1
+
+
+def _solution_traceback(e: BaseException) -> Optional[types.TracebackType]:
+    # Drop the sandbox frame so tracebacks match `python3 -c`
+    tb = e.__traceback__
+    return tb.tb_next if tb is not None else None
+
+
+def _join_threads():
+    main_thread = threading.main_thread()
+    threads: List[threading.Thread] = [
+        thread for thread in threading.enumerate()
+        if thread is not main_thread and not thread.daemon
+    ]
+    for thread in threads:
+        thread.join()
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
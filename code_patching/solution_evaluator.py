@@ -1,113 +1,629 @@
+from __future__ import annotations
 import concurrent.futures as futures
-from typing import List, Optional, Iterable, Tuple, Dict
-from itertools import product
+from typing import Callable, List, Optional, Iterable, Iterator, Tuple, Dict, Set, TypeVar, Union, TypeAlias
+import itertools
+import functools
+import hashlib
+import dataclasses
+import enum
+import os
+import time
 import tqdm
 import subprocess
 import logging
+import pickle
+import types
 
-from domain.problems_d import PatchedSolutionD, TestResultSetD, TestD, TestResultD
+from domain.problems_d import PatchedSolutionD, TestResultSetD, TestD, TestResultD, ContestProblemD
+from domain import metrics
 from domain.domain_dao import CompressedDomainFileDAO
+from domain.write_ahead_log import ChunkWriteAheadLog
+from code_patching import sandbox
+import proto.patched_solutions_pb2 as ps_pb2
 
+DEFAULT_OUTPUT_LIMIT_BYTES = 64 * 1024 * 1024
 
-def execute_solution(solution: PatchedSolutionD, test: TestD) -> TestResultD:
+
+class ExecutionMode(enum.Enum):
+    # Cold `python3 -c` interpreter per (solution, test) pair
+    SUBPROCESS = 'subprocess'
+    # Warm pool workers fork a child per (solution, test) pair
+    SANDBOX_POOL = 'sandbox_pool'
+    # Warm pool workers compile each solution once and fork a child per test
+    BATCHED = 'batched'
+
+
+# Skips a solution's remaining tests once max_failures tests failed
+@dataclasses.dataclass(frozen=True)
+class EarlyExitPolicy:
+    max_failures: int = 1
+
+
+# Sources and tests loaded once per pool worker, so tasks only carry indices
+@dataclasses.dataclass(frozen=True)
+class WorkerTables:
+    solution_sources: List[str]
+    solution_limits: List[Optional[sandbox.ResourceLimits]]
+    test_inputs: List[str]
+    test_outputs: List[str]
+
+
+# (solution_idx, test_idx, execution), execution is None for skipped tests
+ExecRecordT: TypeAlias = Tuple[int, int, Optional[sandbox.ExecutionResult]]
+
+# (solution_idx, test_idx) pair run by compute_batch
+PairUnitT: TypeAlias = Tuple[int, int]
+
+# (solution_idx, test_idxs) run by compute_solution_batch in batched mode,
+# one solution compiled once for all its pending tests
+SolutionUnitT: TypeAlias = Tuple[int, List[int]]
+
+UnitT = TypeVar('UnitT', PairUnitT, SolutionUnitT)
+
+# Builds the executor for a run from max_workers, initializer and initargs,
+# e.g. futures.ProcessPoolExecutor or distributed_eval.EvalCoordinator
+ExecutorFactoryT: TypeAlias = Callable[..., futures.Executor]
+
+# Installed in each pool worker by _init_worker
+_WORKER_TABLES: Optional[WorkerTables] = None
+
+
+def _init_worker(execution_mode: ExecutionMode, tables: WorkerTables):
+    global _WORKER_TABLES
+    if execution_mode is not ExecutionMode.SUBPROCESS:
+        sandbox.warm_interpreter()
+    _WORKER_TABLES = tables
+
+
+def _worker_tables() -> WorkerTables:
+    if _WORKER_TABLES is None:
+        raise ValueError("Worker tables have not been initialized")
+    return _WORKER_TABLES
+
+
+def problem_resource_limits(
+        problem: ContestProblemD,
+        output_bytes: int = DEFAULT_OUTPUT_LIMIT_BYTES
+) -> sandbox.ResourceLimits:
+    return sandbox.ResourceLimits(cpu_time_sec=problem.time_limit_sec
+                                  or ContestProblemD.DEFAULT_TIME_LIMIT_SEC,
+                                  memory_bytes=problem.memory_limit_bytes,
+                                  output_bytes=output_bytes)
+
+
+def run_subprocess(source: str, stdin: str) -> sandbox.ExecutionResult:
     stdout = ""
     stderr = "Unhandled exception"
+    limit_exceeded = ps_pb2.LIMIT_TYPE_UNSPECIFIED
+    start_nsec = time.monotonic_ns()
     try:
-        completed_process = subprocess.run(
-            ["python3", "-c", solution.patched_solution],
-            input=test.input,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=10)
+        completed_process = subprocess.run(["python3", "-c", source],
+                                           input=stdin,
+                                           stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE,
+                                           text=True,
+                                           timeout=10)
         stdout = completed_process.stdout
         stderr = completed_process.stderr
     except subprocess.TimeoutExpired as e:
         stderr = f"Timeout - {str(e)}"
+        limit_exceeded = ps_pb2.LIMIT_TYPE_WALL_TIME
     finally:
-        return TestResultD(solution_id=solution.proto_id,
-                           problem_id=solution.problem_id,
-                           test_id=test.proto_id,
-                           solution_output=stdout,
-                           exception_info=stderr,
-                           expected_output=test.output)
+        return sandbox.ExecutionResult(stdout=stdout,
+                                       stderr=stderr,
+                                       wall_time_nsec=time.monotonic_ns() -
+                                       start_nsec,
+                                       limit_exceeded=limit_exceeded)
+
+
+# Drops differences that cannot change what a solution does: line ending style
+# and trailing whitespace
+def normalize_source(source: str) -> str:
+    return source.replace('\r\n', '\n').replace('\r', '\n').rstrip()
+
+
+def source_key(source: str) -> str:
+    return hashlib.sha256(normalize_source(source).encode('utf-8')).hexdigest()
+
+
+# The result of every test instead of the code when it is known without
+# running: empty solutions print nothing and unparsable ones fail to compile
+def prepare_solution(
+        source: str) -> Union[types.CodeType, sandbox.ExecutionResult]:
+    if not normalize_source(source):
+        return sandbox.ExecutionResult(stdout="", stderr="", wall_time_nsec=0)
+    try:
+        return sandbox.compile_solution(source)
+    except (SyntaxError, ValueError) as e:
+        return sandbox.ExecutionResult(stdout="",
+                                       stderr=sandbox.format_compile_error(e),
+                                       wall_time_nsec=0)
+
+
+# Forks a child per test from the solution compiled once, None for the tests
+# skipped by the early exit policy
+def run_solution_tests(
+    source: str,
+    test_inputs: List[str],
+    test_outputs: List[str],
+    limits: Optional[sandbox.ResourceLimits] = None,
+    early_exit: Optional[EarlyExitPolicy] = None
+) -> List[Optional[sandbox.ExecutionResult]]:
+    code = prepare_solution(source)
+    executions: List[Optional[sandbox.ExecutionResult]] = []
+    failures = 0
+    for test_input, test_output in zip(test_inputs, test_outputs):
+        if early_exit and failures >= early_exit.max_failures:
+            executions.append(None)
+            continue
+        if isinstance(code, sandbox.ExecutionResult):
+            execution = code
+        else:
+            execution = sandbox.execute_code(code, test_input, limits=limits)
+        failures += not execution.passes(test_output)
+        executions.append(execution)
+    return executions
+
+
+def _test_result(solution_id: str,
+                 problem_id: str,
+                 test_id: str,
+                 expected_output: str,
+                 execution: Optional[sandbox.ExecutionResult],
+                 failures: int = 0) -> TestResultD:
+    if execution is None:
+        return TestResultD(solution_id=solution_id,
+                           problem_id=problem_id,
+                           test_id=test_id,
+                           solution_output="",
+                           exception_info=f"Skipped - {failures} failed tests",
+                           expected_output=expected_output,
+                           skipped=True)
+    return TestResultD(solution_id=solution_id,
+                       problem_id=problem_id,
+                       test_id=test_id,
+                       solution_output=execution.stdout,
+                       exception_info=execution.stderr,
+                       expected_output=expected_output,
+                       wall_time_nsec=execution.wall_time_nsec,
+                       limit_exceeded=execution.limit_exceeded,
+                       cpu_time_nsec=execution.cpu_time_nsec,
+                       peak_rss_bytes=execution.peak_rss_bytes)
+
+
+def execute_solution(solution: PatchedSolutionD, test: TestD) -> TestResultD:
+    execution = run_subprocess(solution.patched_solution, test.input)
+    return _test_result(solution.proto_id, solution.problem_id, test.proto_id,
+                        test.output, execution)
+
+
+def execute_solution_in_sandbox(
+        solution: PatchedSolutionD,
+        test: TestD,
+        limits: Optional[sandbox.ResourceLimits] = None) -> TestResultD:
+    execution = sandbox.execute_source(solution.patched_solution,
+                                       test.input,
+                                       limits=limits)
+    return _test_result(solution.proto_id, solution.problem_id, test.proto_id,
+                        test.output, execution)
+
+
+def skipped_test_result(solution: PatchedSolutionD, test: TestD,
+                        failures: int) -> TestResultD:
+    return _test_result(solution.proto_id, solution.problem_id, test.proto_id,
+                        test.output, None, failures)
+
+
+def execute_solution_tests(
+        solution: PatchedSolutionD,
+        tests: List[TestD],
+        limits: Optional[sandbox.ResourceLimits] = None,
+        early_exit: Optional[EarlyExitPolicy] = None) -> List[TestResultD]:
+    executions = run_solution_tests(solution.patched_solution,
+                                    [test.input for test in tests],
+                                    [test.output
+                                     for test in tests], limits, early_exit)
+    failures = early_exit.max_failures if early_exit else 0
+    return [
+        _test_result(solution.proto_id, solution.problem_id, test.proto_id,
+                     test.output, execution, failures)
+        for test, execution in zip(tests, executions)
+    ]
 
 
 def compute_batch(
-        exec_args: List[Tuple[PatchedSolutionD, TestD]]) -> List[TestResultD]:
-    results = []
-    for solution, test in exec_args:
-        results.append(execute_solution(solution, test))
-    return results
+    exec_args: List[PairUnitT],
+    execution_mode: ExecutionMode = ExecutionMode.SUBPROCESS
+) -> List[ExecRecordT]:
+    tables = _worker_tables()
+    records: List[ExecRecordT] = []
+    for solution_idx, test_idx in exec_args:
+        source = tables.solution_sources[solution_idx]
+        test_input = tables.test_inputs[test_idx]
+        if execution_mode is ExecutionMode.SUBPROCESS:
+            execution = run_subprocess(source, test_input)
+        else:
+            execution = sandbox.execute_source(
+                source,
+                test_input,
+                limits=tables.solution_limits[solution_idx])
+        records.append((solution_idx, test_idx, execution))
+    return records
+
+
+def compute_solution_batch(
+        exec_args: List[SolutionUnitT],
+        early_exit: Optional[EarlyExitPolicy] = None) -> List[ExecRecordT]:
+    tables = _worker_tables()
+    records: List[ExecRecordT] = []
+    for solution_idx, test_idxs in exec_args:
+        executions = run_solution_tests(
+            tables.solution_sources[solution_idx],
+            [tables.test_inputs[test_idx] for test_idx in test_idxs],
+            [tables.test_outputs[test_idx] for test_idx in test_idxs],
+            tables.solution_limits[solution_idx], early_exit)
+        records.extend((solution_idx, test_idx, execution)
+                       for test_idx, execution in zip(test_idxs, executions))
+    return records
+
+
+# Records of the representatives in index.static_executions, built in the
+# calling process as they need no execution
+def resolve_static_units(
+        index: EvalIndex,
+        units: Iterable[SolutionUnitT],
+        early_exit: Optional[EarlyExitPolicy] = None) -> List[ExecRecordT]:
+    records: List[ExecRecordT] = []
+    for solution_idx, test_idxs in units:
+        executions = run_solution_tests(
+            index.solutions[solution_idx].patched_solution,
+            [index.tests[test_idx].input for test_idx in test_idxs],
+            [index.tests[test_idx].output for test_idx in test_idxs],
+            early_exit=early_exit)
+        records.extend((solution_idx, test_idx, execution)
+                       for test_idx, execution in zip(test_idxs, executions))
+    return records
+
+
+def record_execution_metrics(records: List[ExecRecordT]):
+    if not metrics.enabled():
+        return
+    metrics.observe('eval_pickle_bytes',
+                    len(pickle.dumps(records)),
+                    payload='records')
+    for _, _, execution in records:
+        if execution is None or not execution.spawn_nsec:
+            continue
+        run_nsec = (execution.wall_time_nsec - execution.spawn_nsec -
+                    execution.teardown_nsec)
+        metrics.observe('sandbox_phase_seconds',
+                        execution.spawn_nsec / 1e9,
+                        phase='spawn')
+        metrics.observe('sandbox_phase_seconds', run_nsec / 1e9, phase='run')
+        metrics.observe('sandbox_phase_seconds',
+                        execution.teardown_nsec / 1e9,
+                        phase='teardown')
+
+
+def add_test_runtime(runtimes: Dict[str, List[int]], test_id: str,
+                     skipped: bool, wall_time_nsec: int):
+    if wall_time_nsec and not skipped:
+        runtimes.setdefault(test_id, []).append(wall_time_nsec)
+
+
+def mean_test_runtimes(runtimes: Dict[str, List[int]]) -> Dict[str, float]:
+    return {
+        test_id: sum(test_runtimes) / len(test_runtimes)
+        for test_id, test_runtimes in runtimes.items()
+    }
+
+
+# Deduplicated solutions and tests, keying every pair by (solution_idx,
+# test_idx). Solutions of a problem with the same normalized source share the
+# execution of the first of them, their representative
+@dataclasses.dataclass(frozen=True)
+class EvalIndex:
+    solutions: List[PatchedSolutionD]
+    solution_ids: List[str]
+    solution_idxs: Dict[str, int]
+    tests: List[TestD]
+    test_ids: List[str]
+    test_idxs: Dict[str, int]
+    problem_solution_idxs: Dict[str, List[int]]
+    problem_test_idxs: Dict[str, List[int]]
+    solution_test_idxs: List[Set[int]]
+    # Representative solution_idx to the solution_idxs sharing its execution
+    shared_solution_idxs: Dict[int, List[int]] = dataclasses.field(
+        default_factory=dict)
+    # Representatives whose result is known without running them
+    static_executions: Dict[int, sandbox.ExecutionResult] = dataclasses.field(
+        default_factory=dict)
+
+    @classmethod
+    def build(
+            cls, problem_tests: Dict[str, List[TestD]],
+            patched_solutions: Dict[str, List[PatchedSolutionD]]) -> EvalIndex:
+        index = EvalIndex([], [], {}, [], [], {}, {}, {}, [])
+        for problem_id, tests in problem_tests.items():
+            test_idxs = index.problem_test_idxs.setdefault(problem_id, [])
+            for test in tests:
+                test_id = test.proto_id
+                if test_id not in index.test_idxs:
+                    index.test_idxs[test_id] = len(index.tests)
+                    index.tests.append(test)
+                    index.test_ids.append(test_id)
+                if index.test_idxs[test_id] not in test_idxs:
+                    test_idxs.append(index.test_idxs[test_id])
+        representatives: Dict[Tuple[str, str], int] = {}
+        for problem_id, solutions in patched_solutions.items():
+            solution_idxs = index.problem_solution_idxs.setdefault(
+                problem_id, [])
+            problem_test_idxs = set(index.problem_test_idxs[problem_id])
+            for solution in solutions:
+                solution_id = solution.proto_id
+                if solution_id in index.solution_idxs:
+                    continue
+                solution_idx = len(index.solutions)
+                index.solution_idxs[solution_id] = solution_idx
+                index.solutions.append(solution)
+                index.solution_ids.append(solution_id)
+                index.solution_test_idxs.append(problem_test_idxs)
+                solution_idxs.append(solution_idx)
+                # Keyed per problem, as its limits and tests are part of
+                # what an execution depends on
+                representative = representatives.setdefault(
+                    (problem_id, source_key(solution.patched_solution)),
+                    solution_idx)
+                index.shared_solution_idxs.setdefault(representative,
+                                                      []).append(solution_idx)
+                if representative == solution_idx:
+                    code = prepare_solution(solution.patched_solution)
+                    if isinstance(code, sandbox.ExecutionResult):
+                        index.static_executions[solution_idx] = code
+        logging.info(
+            f"{len(index.solutions)} solutions share "
+            f"{len(index.shared_solution_idxs)} executions, "
+            f"{len(index.static_executions)} resolved without running")
+        return index
+
+    def pair_idx(self, solution_id: str,
+                 test_id: str) -> Optional[Tuple[int, int]]:
+        solution_idx = self.solution_idxs.get(solution_id)
+        test_idx = self.test_idxs.get(test_id)
+        if solution_idx is None or test_idx is None:
+            return None
+        if test_idx not in self.solution_test_idxs[solution_idx]:
+            return None
+        return (solution_idx, test_idx)
 
+    def worker_tables(
+            self,
+            problem_limits: Dict[str, sandbox.ResourceLimits]) -> WorkerTables:
+        return WorkerTables(solution_sources=[
+            solution.patched_solution for solution in self.solutions
+        ],
+                            solution_limits=[
+                                problem_limits.get(solution.problem_id)
+                                for solution in self.solutions
+                            ],
+                            test_inputs=[test.input for test in self.tests],
+                            test_outputs=[test.output for test in self.tests])
 
+    # The representative's record for every solution sharing its execution that
+    # has not completed the test
+    def fan_out(self, record: ExecRecordT,
+                completed: Set[Tuple[int, int]]) -> Iterator[ExecRecordT]:
+        solution_idx, test_idx, execution = record
+        for shared_idx in self.shared_solution_idxs[solution_idx]:
+            if (shared_idx, test_idx) not in completed:
+                yield (shared_idx, test_idx, execution)
+
+    def test_result(self, record: ExecRecordT, failures: int) -> TestResultD:
+        solution_idx, test_idx, execution = record
+        return _test_result(self.solution_ids[solution_idx],
+                            self.solutions[solution_idx].problem_id,
+                            self.test_ids[test_idx],
+                            self.tests[test_idx].output, execution, failures)
+
+
+# Each representative with the tests not yet completed by some solution sharing
+# its execution, cheapest-first by historical runtime with unseen tests last.
+# static selects the representatives in index.static_executions or the others
+def pending_solution_units(index: EvalIndex,
+                           completed: Set[Tuple[int, int]],
+                           test_runtimes: Optional[Dict[str, float]] = None,
+                           static: bool = False) -> Iterator[SolutionUnitT]:
+    for problem_id, solution_idxs in index.problem_solution_idxs.items():
+        test_idxs = list(index.problem_test_idxs[problem_id])
+        if test_runtimes:
+            test_idxs.sort(key=lambda test_idx: test_runtimes.get(
+                index.test_ids[test_idx], float("inf")))
+        for solution_idx in solution_idxs:
+            shared_idxs = index.shared_solution_idxs.get(solution_idx)
+            if shared_idxs is None or static != (solution_idx
+                                                 in index.static_executions):
+                continue
+            pending_test_idxs = [
+                test_idx for test_idx in test_idxs
+                if any((shared_idx, test_idx) not in completed
+                       for shared_idx in shared_idxs)
+            ]
+            if pending_test_idxs:
+                yield (solution_idx, pending_test_idxs)
+
+
+def pending_pair_units(
+        index: EvalIndex,
+        completed: Set[Tuple[int, int]],
+        test_runtimes: Optional[Dict[str,
+                                     float]] = None) -> Iterator[PairUnitT]:
+    for solution_idx, test_idxs in pending_solution_units(
+            index, completed, test_runtimes):
+        yield from ((solution_idx, test_idx) for test_idx in test_idxs)
+
+
+def chunked(items: Iterable[UnitT], size: int) -> Iterator[List[UnitT]]:
+    item_iter = iter(items)
+    while chunk := list(itertools.islice(item_iter, size)):
+        yield chunk
+
+
+# At most max_in_flight process batches are submitted at once, 4 per worker by
+# default. executor_factory swaps the local process pool, e.g. for an
+# EvalCoordinator, and reused_results stand in for executions, see pass_through
 def eval_patched_solutions(
         problem_tests: Dict[str, List[TestD]],
         patched_solutions: Dict[str, List[PatchedSolutionD]],
         domain_writer: CompressedDomainFileDAO[TestResultSetD],
         max_workers: Optional[int] = None,
         process_batch_size: int = 10,
-        batch_size: int = 1000) -> Iterable[TestResultSetD]:
+        batch_size: int = 1000,
+        execution_mode: ExecutionMode = ExecutionMode.SUBPROCESS,
+        problem_limits: Optional[Dict[str, sandbox.ResourceLimits]] = None,
+        early_exit: Optional[EarlyExitPolicy] = None,
+        reused_results: Iterable[TestResultD] = (),
+        executor_factory: ExecutorFactoryT = futures.ProcessPoolExecutor,
+        max_in_flight: Optional[int] = None) -> Iterable[TestResultSetD]:
     if not set(problem_tests.keys()) == set(patched_solutions.keys()):
         raise ValueError(
             "Problem tests and patched solutions keys do not match")
     if batch_size < process_batch_size:
         raise ValueError("Batch size must be greater than process batch size")
+    if problem_limits and execution_mode is ExecutionMode.SUBPROCESS:
+        raise ValueError("Resource limits require a sandboxed execution mode")
+    if early_exit and execution_mode is not ExecutionMode.BATCHED:
+        raise ValueError("Early exit requires the batched execution mode")
 
-    new_args = {}
-    for problem_id, solutions in patched_solutions.items():
-        for solution, test in product(solutions, problem_tests[problem_id]):
-            new_args[(solution.proto_id, test.proto_id)] = (solution, test)
-
-    results = []
-    for existing_solution_set in domain_writer.read():
-        for existing_result in existing_solution_set.test_results:
-            existign_args = (existing_result.solution_id,
-                             existing_result.test_id)
-            if existign_args in new_args:
-                new_args.pop(existign_args)
-                results.append(existing_result)
-
-    logging.warning(f"Skipped {len(results)} already executed tests")
-    if results:
-        yield TestResultSetD(test_results=results)
-        results = []
-
-    arg_list = list(new_args.values())
-    process_batches: List[List[Tuple[PatchedSolutionD, TestD]]] = [
-        arg_list[i:i + process_batch_size]
-        for i in range(0, len(arg_list), process_batch_size)
-    ]
+    index = EvalIndex.build(problem_tests, patched_solutions)
+
+    # Each result is logged as it completes and compacted into batch_size
+    # chunks in the background. Recovering the log compacts results a
+    # crashed run had logged but not yet compacted, so it precedes the
+    # resume pass
+    result_log = ChunkWriteAheadLog(domain_writer,
+                                    TestResultD,
+                                    TestResultSetD,
+                                    chunk_size=batch_size)
+    result_log.recover()
+
+    # Resume from the chunk sidecar indexes, decoding only the chunks that
+    # hold results for this run
+    completed: Set[Tuple[int, int]] = set()
+    test_runtimes: Dict[str, List[int]] = {}
+    for chunk_path, entries in domain_writer.read_index():
+        positions = []
+        for position, (solution_id, test_id, skipped,
+                       wall_time_nsec) in enumerate(entries):
+            add_test_runtime(test_runtimes, test_id, skipped, wall_time_nsec)
+            # Tests skipped by an early exit still need running without one
+            if skipped and not early_exit:
+                continue
+            existing_args = index.pair_idx(solution_id, test_id)
+            if existing_args is not None and existing_args not in completed:
+                completed.add(existing_args)
+                positions.append(position)
+        if positions:
+            existing_results = domain_writer.read_chunk(
+                chunk_path).test_results
+            yield TestResultSetD(test_results=[
+                existing_results[position] for position in positions
+            ])
+
+    reused: List[TestResultD] = []
+    for result in reused_results:
+        existing_args = index.pair_idx(result.solution_id, result.test_id)
+        if existing_args is not None and existing_args not in completed:
+            completed.add(existing_args)
+            reused.append(result)
+
+    logging.warning(f"Skipped {len(completed) - len(reused)} already "
+                    f"executed tests and {len(reused)} reused results")
+    metrics.count('eval_results_total',
+                  len(completed) - len(reused),
+                  source='resumed')
+    metrics.count('eval_results_total', len(reused), source='reused')
+
+    batched = execution_mode is ExecutionMode.BATCHED
+    # Empty and unparsable solutions are resolved here rather than on the pool
+    static_records = resolve_static_units(
+        index, pending_solution_units(index, completed, static=True),
+        early_exit)
+    total_tests = len(static_records) + sum(
+        len(test_idxs)
+        for _, test_idxs in pending_solution_units(index, completed))
+    mean_runtimes = mean_test_runtimes(test_runtimes)
+    # In batched mode a unit is one solution with all its pending tests, so
+    # process_batch_size counts solutions rather than (solution, test) pairs
+    batch_calls: Iterator[functools.partial[List[ExecRecordT]]]
+    if batched:
+        solution_batches = chunked(
+            pending_solution_units(index, completed, mean_runtimes),
+            process_batch_size)
+        batch_calls = (functools.partial(compute_solution_batch,
+                                         batch,
+                                         early_exit=early_exit)
+                       for batch in solution_batches)
+    else:
+        pair_batches = chunked(
+            pending_pair_units(index, completed, mean_runtimes),
+            process_batch_size)
+        batch_calls = (functools.partial(compute_batch,
+                                         batch,
+                                         execution_mode=execution_mode)
+                       for batch in pair_batches)
+    failures = early_exit.max_failures if early_exit else 0
+    max_in_flight = max_in_flight or 4 * (max_workers or os.cpu_count() or 1)
 
     logging.info(
-        f"{process_batch_size=} {batch_size=} - {len(process_batches)} batches - {len(arg_list)} total tests"
+        f"{process_batch_size=} {batch_size=} {max_in_flight=} - {total_tests} total tests"
     )
-    results_pbar = tqdm.tqdm(total=len(arg_list), desc="Test Evals")
-    with futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-
-        batch_futures = [
-            executor.submit(compute_batch, process_batch)
-            for process_batch in process_batches
-        ]
+    results_pbar = tqdm.tqdm(total=total_tests, desc="Test Evals")
+    with result_log, executor_factory(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(execution_mode, index.worker_tables(problem_limits
+                                                          or {}))) as executor:
 
-        results: List[TestResultD] = []
-        for future in futures.as_completed(batch_futures):
-            test_results = future.result()
-            results.extend(test_results)
-            results_pbar.update(len(test_results))
+        result_log.append(reused)
+        results: List[TestResultD] = reused
+        in_flight: Set[futures.Future] = set()
+        done_records: Iterable[List[ExecRecordT]] = [static_records]
+        while True:
+            # Each record is fanned out to the solutions sharing its execution
+            for records in done_records:
+                batch_results = [
+                    index.test_result(shared_record, failures)
+                    for record in records
+                    for shared_record in index.fan_out(record, completed)
+                ]
+                result_log.append(batch_results)
+                results.extend(batch_results)
+                results_pbar.update(len(records))
+                metrics.count('eval_executions_total', len(records))
+                metrics.count('eval_results_total',
+                              len(batch_results),
+                              source='executed')
 
             if len(results) >= batch_size:
-                yield write_results(results, domain_writer)
+                yield TestResultSetD(test_results=results)
                 results = []
-        if results:
-            yield write_results(results, domain_writer)
 
+            for batch_call in itertools.islice(batch_calls,
+                                               max_in_flight - len(in_flight)):
+                in_flight.add(executor.submit(batch_call))
+                if metrics.enabled():
+                    metrics.observe('eval_pickle_bytes',
+                                    len(pickle.dumps(batch_call)),
+                                    payload='units')
+            if not in_flight:
+                break
 
-def write_results(
-        results: List[TestResultD],
-        domain_writer: CompressedDomainFileDAO[TestResultSetD]
-) -> TestResultSetD:
-    result_set_d = TestResultSetD(test_results=results)
-    if result_set_d.test_results:
-        domain_writer.write([result_set_d])
-    return result_set_d
+            metrics.set_gauge('eval_in_flight_batches', len(in_flight))
+            with metrics.timed('eval_wait_seconds'):
+                done, in_flight = futures.wait(
+                    in_flight, return_when=futures.FIRST_COMPLETED)
+            done_records = [future.result() for future in done]
+            for records in done_records:
+                record_execution_metrics(records)
+        if results:
+            yield TestResultSetD(test_results=results)
@@ -0,0 +1,380 @@
+import dataclasses
+import pytest
+
+from code_patching import sandbox
+from code_patching import solution_evaluator
+from domain import metrics
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import TestD, TestResultSetD
+from domain.testing import make_patched_solution
+import proto.patched_solutions_pb2 as ps_pb2
+
+_ECHO_SUM_SOLUTION = "a, b = map(int, input().split())\nprint(a + b)\n"
+_RAISING_SOLUTION = "x = int(input())\nraise ValueError(f'bad {x}')\n"
+_SYNTAX_ERROR_SOLUTION = "def f(:\n    pass\n"
+_THREADED_SOLUTION = (
+    "import threading\n"
+    "threading.Thread(target=lambda: print(input()[::-1])).start()\n")
+
+
+@pytest.mark.parametrize("source,stdin", [
+    (_ECHO_SUM_SOLUTION, "1 2\n"),
+    (_RAISING_SOLUTION, "7\n"),
+    (_SYNTAX_ERROR_SOLUTION, ""),
+    (_THREADED_SOLUTION, "abc\n"),
+    ("import sys\nsys.exit(3)\n", ""),
+    ("", "ignored\n"),
+])
+def test_sandbox_matches_subprocess(source: str, stdin: str):
+    solution = make_patched_solution(source)
+    test = TestD(input=stdin, output="")
+    expected = solution_evaluator.execute_solution(solution, test)
+    actual = solution_evaluator.execute_solution_in_sandbox(solution, test)
+    assert actual.solution_output == expected.solution_output
+    assert actual.exception_info.strip().splitlines()[-1:] == \
+        expected.exception_info.strip().splitlines()[-1:]
+
+
+def test_sandbox_timeout_kills_child():
+    execution = sandbox.execute_source("while True:\n    pass\n",
+                                       "",
+                                       timeout=0.5)
+    assert execution.timed_out
+    assert execution.stdout == ""
+    assert execution.stderr.startswith("Timeout")
+
+
+def test_sandbox_large_io_does_not_deadlock():
+    stdin = "x" * (1 << 20) + "\n"
+    execution = sandbox.execute_source("print(len(input()) * 'y')", stdin)
+    assert execution.stdout == "y" * (1 << 20) + "\n"
+
+
+@pytest.mark.parametrize("execution_mode",
+                         list(solution_evaluator.ExecutionMode))
+def test_eval_patched_solutions_modes(
+        tmp_path, execution_mode: solution_evaluator.ExecutionMode):
+    tests = [
+        TestD(input="1 2\n", output="3\n"),
+        TestD(input="5 5\n", output="10\n")
+    ]
+    solutions = [
+        make_patched_solution(_ECHO_SUM_SOLUTION),
+        make_patched_solution(_RAISING_SOLUTION)
+    ]
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    result_sets = list(
+        solution_evaluator.eval_patched_solutions(
+            problem_tests={"problem": tests},
+            patched_solutions={"problem": solutions},
+            domain_writer=dao,
+            max_workers=2,
+            process_batch_size=1,
+            batch_size=2,
+            execution_mode=execution_mode))
+    results = [
+        r for result_set in result_sets for r in result_set.test_results
+    ]
+    assert len(results) == 4
+    correct = {(r.solution_id, r.test_id) for r in results if r.is_correct}
+    assert correct == {(solutions[0].proto_id, test.proto_id)
+                       for test in tests}
+    assert sum(len(s.test_results) for s in dao.read()) == 4
+
+
+def test_execute_solution_tests_reports_per_test_wall_time():
+    solution = make_patched_solution(_ECHO_SUM_SOLUTION)
+    tests = [TestD(input=f"{i} 1\n", output=f"{i + 1}\n") for i in range(3)]
+    results = solution_evaluator.execute_solution_tests(solution, tests)
+    assert [result.test_id
+            for result in results] == [t.proto_id for t in tests]
+    assert all(result.is_correct for result in results)
+    assert all(result.wall_time_nsec > 0 for result in results)
+
+
+def test_execute_solution_tests_compile_error_skips_fork():
+    solution = make_patched_solution(_SYNTAX_ERROR_SOLUTION)
+    tests = [TestD(input="", output="") for _ in range(2)]
+    results = solution_evaluator.execute_solution_tests(solution, tests)
+    assert len(results) == 2
+    assert all("SyntaxError" in result.exception_info for result in results)
+    assert all(result.wall_time_nsec == 0 for result in results)
+
+
+@pytest.mark.parametrize("source,limits,limit_exceeded", [
+    ("while True:\n    pass\n", sandbox.ResourceLimits(cpu_time_sec=1),
+     ps_pb2.LIMIT_TYPE_CPU_TIME),
+    ("x = bytearray(512 * 1024 * 1024)\n",
+     sandbox.ResourceLimits(memory_bytes=64 * 1024 * 1024),
+     ps_pb2.LIMIT_TYPE_MEMORY),
+    ("while True:\n    print('y' * 1024)\n",
+     sandbox.ResourceLimits(output_bytes=1024 * 1024),
+     ps_pb2.LIMIT_TYPE_OUTPUT),
+    ("print(sum(range(1000)))\n",
+     sandbox.ResourceLimits(cpu_time_sec=1,
+                            memory_bytes=64 * 1024 * 1024,
+                            output_bytes=1024), ps_pb2.LIMIT_TYPE_UNSPECIFIED),
+])
+def test_sandbox_resource_limits(source: str, limits: sandbox.ResourceLimits,
+                                 limit_exceeded: 'ps_pb2.LimitType'):
+    execution = sandbox.execute_source(source, "", limits=limits)
+    assert execution.limit_exceeded == limit_exceeded
+    assert execution.cpu_time_nsec > 0
+    assert execution.peak_rss_bytes > 0
+
+
+@pytest.mark.parametrize("source", [
+    "import sys\nsys.exit(120)\n",
+    "import os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n",
+])
+def test_sandbox_only_classifies_its_own_limits(source: str):
+    limits = sandbox.ResourceLimits(cpu_time_sec=1,
+                                    memory_bytes=64 * 1024 * 1024)
+    execution = sandbox.execute_source(source, "", limits=limits)
+    assert execution.limit_exceeded == ps_pb2.LIMIT_TYPE_UNSPECIFIED
+
+
+def test_wall_timeout_follows_cpu_time_limit():
+    assert sandbox.wall_timeout_sec(
+        sandbox.ResourceLimits()) == sandbox.DEFAULT_TIMEOUT_SEC
+    assert sandbox.wall_timeout_sec(
+        sandbox.ResourceLimits(cpu_time_sec=20)) > 21
+
+
+def test_eval_patched_solutions_limits_require_sandbox(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    with pytest.raises(ValueError):
+        list(
+            solution_evaluator.eval_patched_solutions(
+                problem_tests={"problem": []},
+                patched_solutions={"problem": []},
+                domain_writer=dao,
+                problem_limits={"problem": sandbox.ResourceLimits()}))
+
+
+def test_limit_exceeded_result_is_not_correct():
+    solution = make_patched_solution(
+        "print('3', flush=True)\nwhile True:\n    pass\n")
+    result = solution_evaluator.execute_solution_in_sandbox(
+        solution, TestD(input="", output="3\n"),
+        sandbox.ResourceLimits(cpu_time_sec=1))
+    assert result.solution_output == "3\n"
+    assert result.limit_exceeded == ps_pb2.LIMIT_TYPE_CPU_TIME
+    assert not result.is_correct
+
+
+def test_execute_solution_tests_early_exit_skips_remaining():
+    solution = make_patched_solution(_RAISING_SOLUTION)
+    tests = [TestD(input=f"{i}\n", output="ok\n") for i in range(4)]
+    results = solution_evaluator.execute_solution_tests(
+        solution,
+        tests,
+        early_exit=solution_evaluator.EarlyExitPolicy(max_failures=2))
+    assert [result.skipped for result in results] == [False, False, True, True]
+    assert [result.test_id
+            for result in results] == [t.proto_id for t in tests]
+    assert TestResultSetD(test_results=results).score == 0
+
+
+def test_eval_patched_solutions_early_exit_orders_cheapest_first(tmp_path):
+    slow_test = TestD(input="1 2\n", output="3\n")
+    fast_test = TestD(input="5 5\n", output="10\n")
+    solution = make_patched_solution(_RAISING_SOLUTION)
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    history = make_patched_solution(_ECHO_SUM_SOLUTION, problem_id="history")
+    dao.write([
+        TestResultSetD(test_results=[
+            solution_evaluator.skipped_test_result(history, test, 0)
+            for test in (slow_test, fast_test)
+        ]),
+        TestResultSetD(test_results=[
+            dataclasses.replace(solution_evaluator.execute_solution_tests(
+                history, [test])[0],
+                                wall_time_nsec=wall_time_nsec)
+            for test, wall_time_nsec in ((slow_test, 100), (fast_test, 1))
+        ])
+    ])
+    result_sets = list(
+        solution_evaluator.eval_patched_solutions(
+            problem_tests={"problem": [slow_test, fast_test]},
+            patched_solutions={"problem": [solution]},
+            domain_writer=dao,
+            max_workers=1,
+            process_batch_size=1,
+            execution_mode=solution_evaluator.ExecutionMode.BATCHED,
+            early_exit=solution_evaluator.EarlyExitPolicy()))
+    results = result_sets[-1].test_results
+    assert [(result.test_id, result.skipped)
+            for result in results] == [(fast_test.proto_id, False),
+                                       (slow_test.proto_id, True)]
+
+
+def test_eval_patched_solutions_resumes_with_bounded_window(tmp_path):
+    tests = [TestD(input=f"{i} 1\n", output=f"{i + 1}\n") for i in range(5)]
+    solutions = [
+        make_patched_solution(_ECHO_SUM_SOLUTION),
+        make_patched_solution(_RAISING_SOLUTION)
+    ]
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    dao.write([
+        TestResultSetD(test_results=[
+            solution_evaluator.execute_solution_in_sandbox(
+                solutions[0], tests[0])
+        ])
+    ])
+    result_sets = list(
+        solution_evaluator.eval_patched_solutions(
+            problem_tests={"problem": tests},
+            patched_solutions={"problem": solutions},
+            domain_writer=dao,
+            max_workers=1,
+            process_batch_size=2,
+            batch_size=2,
+            execution_mode=solution_evaluator.ExecutionMode.SANDBOX_POOL,
+            max_in_flight=1))
+    keys = [(r.solution_id, r.test_id) for result_set in result_sets
+            for r in result_set.test_results]
+    assert len(keys) == len(set(keys)) == 10
+    assert sum(len(s.test_results) for s in dao.read()) == 10
+
+
+def test_eval_index_shares_executions_between_identical_sources():
+    tests = [TestD(input="1 2\n", output="3\n")]
+    solutions = [
+        dataclasses.replace(make_patched_solution(_ECHO_SUM_SOLUTION),
+                            solution_id="a"),
+        dataclasses.replace(make_patched_solution(
+            _ECHO_SUM_SOLUTION.replace("\n", "\r\n") + "  \n"),
+                            solution_id="b"),
+        make_patched_solution(_RAISING_SOLUTION),
+    ]
+    index = solution_evaluator.EvalIndex.build(
+        {
+            "problem": tests,
+            "other": tests
+        }, {
+            "problem": solutions,
+            "other": [make_patched_solution(_ECHO_SUM_SOLUTION, "other")]
+        })
+    assert index.shared_solution_idxs == {0: [0, 1], 2: [2], 3: [3]}
+    assert list(solution_evaluator.pending_solution_units(index,
+                                                          {(0, 0)})) == [
+                                                              (0, [0]), (2,
+                                                                         [0]),
+                                                              (3, [0])
+                                                          ]
+    assert list(index.fan_out((0, 0, None), {(0, 0)})) == [(1, 0, None)]
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_worker_runs_shared_source_once_from_its_tables(
+        monkeypatch, batched: bool):
+    monkeypatch.setattr(solution_evaluator, "_WORKER_TABLES", None)
+    tests = [
+        TestD(input="1 2\n", output="3\n"),
+        TestD(input="5 5\n", output="10\n")
+    ]
+    solutions = [
+        dataclasses.replace(make_patched_solution(_ECHO_SUM_SOLUTION),
+                            solution_id=str(i)) for i in range(2)
+    ]
+    index = solution_evaluator.EvalIndex.build({"problem": tests},
+                                               {"problem": solutions})
+    limits = sandbox.ResourceLimits(cpu_time_sec=1)
+    tables = index.worker_tables({"problem": limits})
+    assert tables.solution_limits == [limits, limits]
+
+    execution_mode = (solution_evaluator.ExecutionMode.BATCHED if batched else
+                      solution_evaluator.ExecutionMode.SANDBOX_POOL)
+    solution_evaluator._init_worker(execution_mode, tables)
+    if batched:
+        records = solution_evaluator.compute_solution_batch(
+            list(solution_evaluator.pending_solution_units(index, set())))
+    else:
+        records = solution_evaluator.compute_batch(
+            list(solution_evaluator.pending_pair_units(index, set())),
+            execution_mode=execution_mode)
+    # The representative alone is executed, once per test
+    assert [record[:2] for record in records] == [(0, 0), (0, 1)]
+
+    shared_records = [
+        shared_record for record in records
+        for shared_record in index.fan_out(record, set())
+    ]
+    assert sorted(record[:2] for record in shared_records) == [(0, 0), (0, 1),
+                                                               (1, 0), (1, 1)]
+    results = [index.test_result(record, 0) for record in shared_records]
+    assert all(result.is_correct for result in results)
+    assert {r.solution_id for r in results} == {s.proto_id for s in solutions}
+
+
+@pytest.mark.parametrize("execution_mode",
+                         list(solution_evaluator.ExecutionMode))
+def test_eval_patched_solutions_fans_out_shared_and_static_executions(
+        tmp_path, execution_mode: solution_evaluator.ExecutionMode):
+    tests = [
+        TestD(input="1 2\n", output="3\n"),
+        TestD(input="5 5\n", output="10\n")
+    ]
+    shared = [
+        dataclasses.replace(make_patched_solution(_ECHO_SUM_SOLUTION),
+                            solution_id=str(i)) for i in range(3)
+    ]
+    static = [
+        make_patched_solution(""),
+        make_patched_solution(_SYNTAX_ERROR_SOLUTION)
+    ]
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    results = [
+        r for result_set in solution_evaluator.eval_patched_solutions(
+            problem_tests={"problem": tests},
+            patched_solutions={"problem": shared + static},
+            domain_writer=dao,
+            max_workers=1,
+            process_batch_size=1,
+            batch_size=2,
+            execution_mode=execution_mode) for r in result_set.test_results
+    ]
+    assert sorted((r.solution_id, r.test_id) for r in results) == sorted(
+        (solution.proto_id, test.proto_id) for solution in shared + static
+        for test in tests)
+    assert {r.solution_id
+            for r in results
+            if r.is_correct} == {solution.proto_id
+                                 for solution in shared}
+    static_results = [
+        r for r in results
+        if r.solution_id in {solution.proto_id
+                             for solution in static}
+    ]
+    assert all(r.wall_time_nsec == 0 for r in static_results)
+    assert sum("SyntaxError" in r.exception_info for r in static_results) == 2
+    assert sum(len(s.test_results) for s in dao.read()) == 10
+
+
+def test_eval_patched_solutions_records_metrics(tmp_path):
+    tests = [
+        TestD(input="1 2\n", output="3\n"),
+        TestD(input="5 5\n", output="10\n")
+    ]
+    registry = metrics.enable()
+    try:
+        list(
+            solution_evaluator.eval_patched_solutions(
+                problem_tests={"problem": tests},
+                patched_solutions={
+                    "problem": [make_patched_solution(_ECHO_SUM_SOLUTION)]
+                },
+                domain_writer=CompressedDomainFileDAO(str(tmp_path),
+                                                      TestResultSetD),
+                max_workers=1,
+                execution_mode=solution_evaluator.ExecutionMode.SANDBOX_POOL))
+    finally:
+        metrics.disable()
+    assert registry.counter_value('eval_results_total', source='executed') == 2
+    unit_bytes = registry.summary('eval_pickle_bytes', payload='units')
+    assert unit_bytes is not None and unit_bytes.count == 1
+    for phase in ('spawn', 'run', 'teardown'):
+        phase_seconds = registry.summary('sandbox_phase_seconds', phase=phase)
+        assert phase_seconds is not None
+        assert phase_seconds.count == 2 and phase_seconds.min >= 0
@@ -1,29 +1,32 @@
+import asyncio
 import concurrent.futures as futures
 import json
-from typing import Iterator, List, Dict, Optional, Iterable, Tuple, TypeAlias
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple, TypeAlias
 from itertools import product
 import tqdm
 import logging
 
+from domain import metrics
 from domain.problems_d import CodePatchingPromptD, ContestProblemD, SolutionD, PatchedSolutionD, PatchedSolutionSetD, ContestProblemSetD
 from llm_handler.openai_handler import OpenAIHandler as openai_handler
+from llm_handler.async_openai_handler import AsyncOpenAIHandler
+from llm_handler.llm_handler_interface import AsyncLLMHandler, LLMHandler
 import proto.patched_solutions_pb2 as ps_pb2
 from domain.domain_dao import CompressedDomainFileDAO
+from domain.write_ahead_log import ChunkWriteAheadLog
 
 RESPONSE_FORMAT = {"type": "json_object"}
 
 
-def get_prompted_solution(problem: ContestProblemD, solution: SolutionD,
-                          prompt: CodePatchingPromptD,
-                          model: 'ps_pb2.ModelType') -> PatchedSolutionD:
-
+def prompt_messages(problem: ContestProblemD, solution: SolutionD,
+                    prompt: CodePatchingPromptD) -> List[Dict[str, str]]:
     if prompt.prompt_name == "code_patching_prompt_minimal":
         formatted_prompt = prompt.unformated_prompt
     else:
         formatted_prompt = prompt.format(
             function_description=problem.description)
 
-    messages = [{
+    return [{
         "role": "system",
         "content": formatted_prompt
     }, {
@@ -31,24 +34,27 @@ def get_prompted_solution(problem: ContestProblemD, solution: SolutionD,
         "content": solution.solution
     }]
 
-    try:
-        patched_solution_response = openai_handler.get_chat_completion(
-            messages=messages,
-            model_type=model,
-            response_format=RESPONSE_FORMAT)
-        patched_response_dict: Dict[str, str] = json.loads(
-            patched_solution_response)
-        patched_solution = patched_response_dict.get('solution', "")
+
+# patched_solution_response is None when the completion failed
+def patched_solution_from_response(
+        problem: ContestProblemD, solution: SolutionD,
+        prompt: CodePatchingPromptD, model: 'ps_pb2.ModelType',
+        patched_solution_response: Optional[str]) -> PatchedSolutionD:
+    patched_solution = ""
+    patched_response_dict: Dict[str, str] = {}
+    if patched_solution_response is not None:
+        try:
+            patched_response_dict = json.loads(patched_solution_response)
+            patched_solution = patched_response_dict.get('solution', "")
+        except (ValueError, AttributeError) as e:
+            logging.error(
+                f"Failed to parse patched solution for problem {problem.proto_id} and solution {solution.proto_id} - {model} - {e}"
+            )
+            patched_response_dict = {}
         if not patched_solution:
             logging.warning(
                 f"Failed to patch solution for problem {problem.proto_id} and solution {solution.proto_id} - {model}"
             )
-    except Exception as e:
-        logging.error(
-            f"Failed to patch solution for problem {problem.proto_id} and solution {solution.proto_id}  - {model} - {e}"
-        )
-        patched_solution = ""
-        patched_response_dict = {}
     return PatchedSolutionD(
         solution_id=solution.proto_id,
         problem_id=problem.proto_id,
@@ -58,20 +64,57 @@ def get_prompted_solution(problem: ContestProblemD, solution: SolutionD,
         patched_response={"response": str(patched_response_dict)})
 
 
+def get_prompted_solution(
+    problem: ContestProblemD,
+    solution: SolutionD,
+    prompt: CodePatchingPromptD,
+    model: 'ps_pb2.ModelType',
+    handler: LLMHandler = openai_handler()
+) -> PatchedSolutionD:
+    try:
+        patched_solution_response = handler.get_chat_completion(
+            messages=prompt_messages(problem, solution, prompt),
+            model_type=model,
+            response_format=RESPONSE_FORMAT)
+    except Exception as e:
+        logging.error(
+            f"Failed to patch solution for problem {problem.proto_id} and solution {solution.proto_id}  - {model} - {e}"
+        )
+        patched_solution_response = None
+    return patched_solution_from_response(problem, solution, prompt, model,
+                                          patched_solution_response)
+
+
+async def get_prompted_solution_async(
+        handler: AsyncLLMHandler, problem: ContestProblemD,
+        solution: SolutionD, prompt: CodePatchingPromptD,
+        model: 'ps_pb2.ModelType') -> PatchedSolutionD:
+    try:
+        patched_solution_response = await handler.get_chat_completion(
+            messages=prompt_messages(problem, solution, prompt),
+            model_type=model,
+            response_format=RESPONSE_FORMAT)
+    except Exception as e:
+        logging.error(
+            f"Failed to patch solution for problem {problem.proto_id} and solution {solution.proto_id}  - {model} - {e}"
+        )
+        patched_solution_response = None
+    return patched_solution_from_response(problem, solution, prompt, model,
+                                          patched_solution_response)
+
+
 ArgsIdT: TypeAlias = Tuple[str, str, str, 'ps_pb2.ModelType']
 ArgsT: TypeAlias = Tuple[ContestProblemD, SolutionD, CodePatchingPromptD,
                          'ps_pb2.ModelType']
 
 
-def generate_prompted_dataset(
-        contest_problems: List[ContestProblemSetD],
-        model_types: List['ps_pb2.ModelType'],
-        prompts: List[CodePatchingPromptD],
-        domain_reader: CompressedDomainFileDAO[PatchedSolutionSetD],
-        max_workers: Optional[int] = None,
-        result_batch_size: int = 500,
-        dry_run: bool = False) -> Iterator[PatchedSolutionSetD]:
-
+# Also returns the positions per chunk of the solutions already generated for
+# this run
+def pending_generation_args(
+    contest_problems: List[ContestProblemSetD],
+    model_types: List['ps_pb2.ModelType'], prompts: List[CodePatchingPromptD],
+    domain_reader: CompressedDomainFileDAO[PatchedSolutionSetD]
+) -> Tuple[List[ArgsT], Dict[str, List[int]]]:
     new_id_dict: Dict[ArgsIdT, ArgsT] = {}
     problem_solution_pairs = [(problem, solution)
                               for problem_set in contest_problems
@@ -83,49 +126,131 @@ def generate_prompted_dataset(
         new_id_dict[arg_id] = (problem, solution, prompt, model)
     logging.info(f"Generated new {len(new_id_dict)} args")
 
-    results = []
-    for existing_set in domain_reader.read():
-        for existing_sol in existing_set.solutions:
-            arg_id = (existing_sol.problem_id, existing_sol.solution_id,
-                      existing_sol.prompt_id, existing_sol.model)
+    # Dedup against the chunk sidecar indexes, remembering which positions
+    # matched so only those chunks are decoded when yielding them back
+    existing_positions: Dict[str, List[int]] = {}
+    for chunk_path, entries in domain_reader.read_index():
+        for position, entry in enumerate(entries):
+            arg_id = tuple(entry)
             if arg_id in new_id_dict:
-                results.append(existing_sol)
+                existing_positions.setdefault(chunk_path, []).append(position)
                 new_id_dict.pop(arg_id)
 
-    logging.warning(f"Skipped {len(results)} already generated solutions")
+    logging.warning(
+        f"Skipped {sum(map(len, existing_positions.values()))} already generated solutions"
+    )
+    return list(new_id_dict.values()), existing_positions
+
+
+# Entering the log recovers the solutions logged by a crashed run, so it must
+# precede the dedup pass
+def open_solution_log(
+    domain_writer: CompressedDomainFileDAO[PatchedSolutionSetD],
+    result_batch_size: int
+) -> ChunkWriteAheadLog[PatchedSolutionD, PatchedSolutionSetD]:
+    return ChunkWriteAheadLog(domain_writer,
+                              PatchedSolutionD,
+                              PatchedSolutionSetD,
+                              chunk_size=result_batch_size)
+
+
+def existing_solutions(
+        domain_reader: CompressedDomainFileDAO[PatchedSolutionSetD],
+        existing_positions: Dict[str, List[int]]) -> List[PatchedSolutionD]:
+    results = []
+    for chunk_path, positions in existing_positions.items():
+        chunk_solutions = domain_reader.read_chunk(chunk_path).solutions
+        results.extend(chunk_solutions[position] for position in positions)
+    return results
+
+
+def generate_prompted_dataset(
+        contest_problems: List[ContestProblemSetD],
+        model_types: List['ps_pb2.ModelType'],
+        prompts: List[CodePatchingPromptD],
+        domain_reader: CompressedDomainFileDAO[PatchedSolutionSetD],
+        handler: LLMHandler = openai_handler(),
+        max_workers: Optional[int] = None,
+        result_batch_size: int = 500,
+        dry_run: bool = False) -> Iterator[PatchedSolutionSetD]:
     if dry_run:
+        # A crashed run's log is left for the next run to recover
+        pending_generation_args(contest_problems, model_types, prompts,
+                                domain_reader)
         logging.warning(f"Dry run, not generating solutions")
         return
 
-    if results:
-        yield PatchedSolutionSetD(solutions=results)
-        results = []
+    with open_solution_log(domain_reader, result_batch_size) as solution_log:
+        gen_args, existing_positions = pending_generation_args(
+            contest_problems, model_types, prompts, domain_reader)
+        results = existing_solutions(domain_reader, existing_positions)
+        if results:
+            yield PatchedSolutionSetD(solutions=results)
+            results = []
 
-    gen_args = list(new_id_dict.values())
-    logging.info(f"Generated {len(gen_args)} and")
-    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        logging.info(f"Generated {len(gen_args)} and")
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            solution_futures = [
+                executor.submit(get_prompted_solution, *args, handler)
+                for args in gen_args
+            ]
 
-        solution_futures = [
-            executor.submit(get_prompted_solution, *args) for args in gen_args
-        ]
+            results_pbar = tqdm.tqdm(total=len(gen_args), desc="Solutions")
+            for future in futures.as_completed(solution_futures):
+                solution = future.result()
+                solution_log.append([solution])
+                results.append(solution)
+                results_pbar.update()
+                metrics.set_gauge('generation_pending_requests',
+                                  results_pbar.total - results_pbar.n)
+                if len(results) >= result_batch_size:
+                    yield PatchedSolutionSetD(solutions=results)
+                    results = []
+
+            if results:
+                yield PatchedSolutionSetD(solutions=results)
+
+
+# Concurrency and rate limits are left to the AsyncOpenAIHandler
+async def generate_prompted_dataset_async(
+        contest_problems: List[ContestProblemSetD],
+        model_types: List['ps_pb2.ModelType'],
+        prompts: List[CodePatchingPromptD],
+        domain_reader: CompressedDomainFileDAO[PatchedSolutionSetD],
+        handler: Optional[AsyncLLMHandler] = None,
+        result_batch_size: int = 500,
+        dry_run: bool = False) -> AsyncIterator[PatchedSolutionSetD]:
+    if dry_run:
+        # A crashed run's log is left for the next run to recover
+        pending_generation_args(contest_problems, model_types, prompts,
+                                domain_reader)
+        logging.warning(f"Dry run, not generating solutions")
+        return
 
+    with open_solution_log(domain_reader, result_batch_size) as solution_log:
+        gen_args, existing_positions = pending_generation_args(
+            contest_problems, model_types, prompts, domain_reader)
+        results = existing_solutions(domain_reader, existing_positions)
+        if results:
+            yield PatchedSolutionSetD(solutions=results)
+            results = []
+
+        handler = handler or AsyncOpenAIHandler()
+        solution_tasks = [
+            asyncio.ensure_future(get_prompted_solution_async(handler, *args))
+            for args in gen_args
+        ]
         results_pbar = tqdm.tqdm(total=len(gen_args), desc="Solutions")
-        for future in futures.as_completed(solution_futures):
-            results.append(future.result())
+        for solution_task in asyncio.as_completed(solution_tasks):
+            solution = await solution_task
+            solution_log.append([solution])
+            results.append(solution)
             results_pbar.update()
+            metrics.set_gauge('generation_pending_requests',
+                              results_pbar.total - results_pbar.n)
             if len(results) >= result_batch_size:
-                yield from write_results(results, domain_reader)
+                yield PatchedSolutionSetD(solutions=results)
                 results = []
 
         if results:
-            yield from write_results(results, domain_reader)
-
-
-def write_results(
-    solutions: List[PatchedSolutionD],
-    domain_writer: CompressedDomainFileDAO[PatchedSolutionSetD]
-) -> Iterable[PatchedSolutionSetD]:
-    if solutions:
-        solution_set_d = PatchedSolutionSetD(solutions=solutions)
-        domain_writer.write([solution_set_d])
-        yield solution_set_d
+            yield PatchedSolutionSetD(solutions=results)
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from typing import List
+
+import openai
+
+from code_patching import solution_generator
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import CodePatchingPromptD, ContestProblemD, ContestProblemSetD, PatchedSolutionD, PatchedSolutionSetD, SolutionD
+from llm_handler.async_openai_handler import AsyncOpenAIHandler
+from llm_handler.llm_handler_interface import LLMHandler
+from llm_handler.mock_llm_handler import MockLLMHandler
+from llm_handler.mock_openai_server import MockOpenAIServer
+from llm_handler.openai_handler import OpenAIHandler
+from proto.contest_problem_pb2 import ContestProblem
+import proto.patched_solutions_pb2 as ps_pb2
+
+_PATCHED_SOLUTION = "print(input())\n"
+_PROMPTS = [
+    CodePatchingPromptD(f"prompt_{i}", "{function_description}")
+    for i in range(3)
+]
+_PROBLEM_SET = ContestProblemSetD(problems=[
+    ContestProblemD(name="problem",
+                    description="Echo the input",
+                    difficulty=ContestProblem.UNKNOWN_DIFFICULTY,
+                    time_limit_nsec=10**9,
+                    memory_limit_bytes=0,
+                    public_tests=[],
+                    private_tests=[],
+                    generated_tests=[],
+                    solutions=[],
+                    incorrect_solutions=[
+                        SolutionD(solution=f"print({i})",
+                                  language=ContestProblem.Solution.PYTHON3)
+                        for i in range(5)
+                    ],
+                    cf_points=0.0,
+                    cf_rating=0)
+])
+
+
+async def _generate(
+        server: MockOpenAIServer,
+        dao: CompressedDomainFileDAO[PatchedSolutionSetD],
+        prompts: List[CodePatchingPromptD]) -> List[PatchedSolutionSetD]:
+    handler = AsyncOpenAIHandler(client=openai.AsyncOpenAI(
+        api_key="test", base_url=server.base_url),
+                                 initial_concurrency=8)
+    return [
+        solution_set async for solution_set in
+        solution_generator.generate_prompted_dataset_async(
+            contest_problems=[_PROBLEM_SET],
+            model_types=[ps_pb2.MODEL_TYPE_GPT_3_5_TURBO],
+            prompts=prompts,
+            domain_reader=dao,
+            handler=handler,
+            result_batch_size=4)
+    ]
+
+
+def test_generate_prompted_dataset_async_under_rate_limits(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), PatchedSolutionSetD)
+    content = json.dumps({"solution": _PATCHED_SOLUTION})
+    with MockOpenAIServer(content=content, latency_sec=0.01,
+                          capacity=3) as server:
+        solution_sets = asyncio.run(_generate(server, dao, _PROMPTS[:2]))
+        assert server.rate_limited > 0
+    solutions = [
+        s for solution_set in solution_sets for s in solution_set.solutions
+    ]
+    assert len(solutions) == 10
+    assert all(s.patched_solution == _PATCHED_SOLUTION for s in solutions)
+    assert len(list(dao.read())) == 3
+
+    # Resuming with another prompt only requests the new solutions
+    with MockOpenAIServer(content=content) as server:
+        resumed_sets = asyncio.run(_generate(server, dao, _PROMPTS))
+        assert server.requests == 5
+    assert len(resumed_sets[0].solutions) == 10
+    assert sum(len(s.solutions) for s in resumed_sets) == 15
+
+
+def _generate_sync(
+    handler: LLMHandler, dao: CompressedDomainFileDAO[PatchedSolutionSetD]
+) -> List[PatchedSolutionD]:
+    return [
+        s for solution_set in solution_generator.generate_prompted_dataset(
+            contest_problems=[_PROBLEM_SET],
+            model_types=[ps_pb2.MODEL_TYPE_GPT_3_5_TURBO],
+            prompts=_PROMPTS,
+            domain_reader=dao,
+            handler=handler,
+            max_workers=4,
+            result_batch_size=4) for s in solution_set.solutions
+    ]
+
+
+def test_generate_prompted_dataset_with_mock_handler(tmp_path):
+    handler = MockLLMHandler(
+        chat_completion=[json.dumps({"solution": _PATCHED_SOLUTION})])
+    dao = CompressedDomainFileDAO(str(tmp_path), PatchedSolutionSetD)
+    solutions = _generate_sync(handler, dao)
+    assert len(solutions) == 15
+    assert all(s.patched_solution == _PATCHED_SOLUTION for s in solutions)
+    assert handler.chat_requests == 15
+    assert sum(len(s.solutions) for s in dao.read()) == 15
+
+
+class _StandInHandler(OpenAIHandler):
+    pass
+
+
+def test_generate_prompted_dataset_against_stand_in_server(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), PatchedSolutionSetD)
+    with MockOpenAIServer(content=json.dumps({"solution": _PATCHED_SOLUTION}),
+                          latency_sec=0.005,
+                          latency_sigma=0.5,
+                          rate_limit_rate=0.2,
+                          retry_after_sec=0.01,
+                          seed=1) as server:
+        _StandInHandler.set_client(
+            openai.OpenAI(api_key="test", base_url=server.base_url))
+        solutions = _generate_sync(_StandInHandler(), dao)
+        assert server.rate_limited > 0
+    assert len(solutions) == 15
+    assert all(s.patched_solution == _PATCHED_SOLUTION for s in solutions)
@@ -0,0 +1,112 @@
+import os
+from typing import Any, Dict, Generic, List, Protocol, TypeVar
+import dataclasses
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+
+# Domain class that can flatten itself into one list per column
+class ColumnarDomain(Protocol):
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        ...
+
+
+ColumnarT = TypeVar('ColumnarT', bound=ColumnarDomain, covariant=True)
+
+
+# The chunked DAO an export mirrors, e.g. a CompressedDomainFileDAO
+class ColumnarSource(Protocol[ColumnarT]):
+
+    @property
+    def sorted_file_paths(self) -> List[str]:
+        ...
+
+    def read_chunk(self, file_path: str) -> ColumnarT:
+        ...
+
+
+# Schema metadata recording the source chunk an export was built from
+_SOURCE_STAMP_KEY = b'source_stamp'
+
+
+def _source_stamp(chunk_path: str) -> bytes:
+    stat = os.stat(chunk_path)
+    return f'{stat.st_mtime_ns}:{stat.st_size}'.encode()
+
+
+# Mirrors the chunks of a CompressedDomainFileDAO as Arrow IPC files, one per
+# chunk, so analytics can memory-map flat tables instead of decoding every
+# proto
+@dataclasses.dataclass(frozen=True)
+class ColumnarExportDAO(Generic[ColumnarT]):
+    _source: ColumnarSource[ColumnarT]
+    _dir_path: str
+
+    def __post_init__(self):
+        os.makedirs(self._dir_path, exist_ok=True)
+
+    def _export_path(self, chunk_path: str) -> str:
+        chunk_name = os.path.basename(chunk_path)[:-len('.pb')]
+        return f'{self._dir_path}/{chunk_name}.arrow'
+
+    def _is_current(self, chunk_path: str) -> bool:
+        # Chunk names are reused after clear_cache, so an export only stands
+        # for the chunk it was built from
+        try:
+            with pa.memory_map(self._export_path(chunk_path)) as source:
+                metadata = ipc.open_file(source).schema.metadata or {}
+        except FileNotFoundError:
+            return False
+        return metadata.get(_SOURCE_STAMP_KEY) == _source_stamp(chunk_path)
+
+    @property
+    def file_paths(self) -> List[str]:
+        return [
+            self._export_path(chunk_path)
+            for chunk_path in self._source.sorted_file_paths
+            if self._is_current(chunk_path)
+        ]
+
+    # Exports the chunks new or changed since their export, and drops the
+    # exports whose chunk is gone
+    def export(self) -> int:
+        chunk_paths = self._source.sorted_file_paths
+        export_paths = {self._export_path(path) for path in chunk_paths}
+        for file_name in os.listdir(self._dir_path):
+            file_path = f'{self._dir_path}/{file_name}'
+            if file_name.endswith('.arrow') and file_path not in export_paths:
+                os.remove(file_path)
+
+        exported = 0
+        for chunk_path in chunk_paths:
+            if self._is_current(chunk_path):
+                continue
+            export_path = self._export_path(chunk_path)
+            stamp = _source_stamp(chunk_path)
+            table = pa.Table.from_pydict(
+                self._source.read_chunk(chunk_path).to_columns())
+            table = table.replace_schema_metadata({_SOURCE_STAMP_KEY: stamp})
+            # Written under a temporary name so an interrupted export is
+            # never mistaken for a finished chunk
+            with ipc.new_file(f'{export_path}.tmp', table.schema) as writer:
+                writer.write_table(table)
+            os.replace(f'{export_path}.tmp', export_path)
+            exported += 1
+        logging.info(f"Exported {exported} chunks to {self._dir_path}")
+        return exported
+
+    def read_table(self) -> pa.Table:
+        tables = [
+            ipc.open_file(pa.memory_map(file_path)).read_all()
+            for file_path in self.file_paths
+        ]
+        if not tables:
+            raise FileNotFoundError(f'No exported chunks in {self._dir_path}')
+        return pa.concat_tables(tables, promote_options='default')
+
+    def read_df(self) -> pd.DataFrame:
+        return self.read_table().to_pandas()
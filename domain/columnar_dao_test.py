@@ -0,0 +1,49 @@
+import os
+
+from domain.columnar_dao import ColumnarExportDAO
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import TestResultSetD
+from domain.testing import make_result
+
+
+def _result_set(*outputs: str) -> TestResultSetD:
+    return TestResultSetD(test_results=[
+        make_result(solution_id=f"solution_{output}",
+                    solution_output=output,
+                    expected_output="1") for output in outputs
+    ])
+
+
+def test_export_is_incremental_and_round_trips(tmp_path):
+    os.makedirs(tmp_path / "results")
+    source = CompressedDomainFileDAO(str(tmp_path / "results"), TestResultSetD)
+    columns = ColumnarExportDAO(source, str(tmp_path / "columns"))
+
+    source.write([_result_set("1", "2")])
+    assert columns.export() == 1
+    source.write([_result_set("1")])
+    assert columns.export() == 1
+    assert columns.export() == 0
+
+    df = columns.read_df()
+    result_sets = list(source.read())
+    assert list(df["result_id"]) == [
+        result.proto_id for result_set in result_sets
+        for result in result_set.test_results
+    ]
+    assert list(df["solution_output"]) == ["1", "2", "1"]
+    assert list(df["is_correct"]) == [True, False, True]
+
+
+def test_export_rebuilds_replaced_chunks_and_drops_removed_ones(tmp_path):
+    os.makedirs(tmp_path / "results")
+    source = CompressedDomainFileDAO(str(tmp_path / "results"), TestResultSetD)
+    columns = ColumnarExportDAO(source, str(tmp_path / "columns"))
+    source.write([_result_set("1"), _result_set("2")])
+    assert columns.export() == 2
+
+    source.clear_cache()
+    source.write([_result_set("3", "4")])
+    assert columns.export() == 1
+    assert sorted(os.listdir(tmp_path / "columns")) == ["chunk_1.arrow"]
+    assert list(columns.read_df()["solution_output"]) == ["3", "4"]
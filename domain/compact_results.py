@@ -0,0 +1,107 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from domain.problems_d import TestResultD, TestResultSetD
+
+# TestResultD fields stored as codes into the shared string table
+_STRING_FIELDS = ('test_id', 'problem_id', 'solution_id', 'solution_output',
+                  'exception_info', 'expected_output')
+# TestResultD fields stored as machine integers, with their array typecodes
+_INT_FIELDS = (
+    ('wall_time_nsec', 'q'),
+    ('limit_exceeded', 'b'),
+    ('cpu_time_nsec', 'q'),
+    ('peak_rss_bytes', 'q'),
+    ('skipped', 'b'),
+)
+
+
+class _StringTable:
+    __slots__ = ('_codes', 'values')
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+# Holds a full evaluation run in memory. Every string field is interned into
+# one shared table and kept as a 4 byte code per result, so ids are stored once
+# and outputs matching their expected output share its entry. Results are
+# rebuilt as TestResultDs on access
+class CompactTestResults:
+    __slots__ = ('_strings', '_string_columns', '_int_columns')
+
+    def __init__(self, results: Iterable[TestResultD] = ()):
+        self._strings = _StringTable()
+        self._string_columns: Dict[str, array] = {
+            field: array('I')
+            for field in _STRING_FIELDS
+        }
+        self._int_columns: Dict[str, array] = {
+            field: array(typecode)
+            for field, typecode in _INT_FIELDS
+        }
+        self.extend(results)
+
+    @classmethod
+    def from_result_sets(
+            cls, result_sets: Iterable[TestResultSetD]) -> CompactTestResults:
+        compact = cls()
+        for result_set in result_sets:
+            compact.extend(result_set.test_results)
+        return compact
+
+    def append(self, result: TestResultD):
+        for field, column in self._string_columns.items():
+            column.append(self._strings.code(getattr(result, field)))
+        for field, column in self._int_columns.items():
+            column.append(int(getattr(result, field)))
+
+    def extend(self, results: Iterable[TestResultD]):
+        for result in results:
+            self.append(result)
+
+    def __len__(self) -> int:
+        return len(self._int_columns['skipped'])
+
+    @property
+    def n_strings(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, i: int) -> TestResultD:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f'Result index out of range: {i}')
+        values = self._strings.values
+        fields: Dict[str, Any] = {
+            field: values[column[i]]
+            for field, column in self._string_columns.items()
+        }
+        for field, column in self._int_columns.items():
+            fields[field] = column[i]
+        fields['skipped'] = bool(fields['skipped'])
+        return TestResultD(**fields)
+
+    def __iter__(self) -> Iterator[TestResultD]:
+        return (self[i] for i in range(len(self)))
+
+    def to_result_set(self,
+                      start: int = 0,
+                      stop: Optional[int] = None) -> TestResultSetD:
+        stop = len(self) if stop is None else min(stop, len(self))
+        return TestResultSetD(
+            test_results=[self[i] for i in range(start, stop)])
+
+    def to_result_sets(self, batch_size: int) -> Iterator[TestResultSetD]:
+        for start in range(0, len(self), batch_size):
+            yield self.to_result_set(start, start + batch_size)
@@ -0,0 +1,57 @@
+import pytest
+
+from domain.compact_results import CompactTestResults
+from domain.problems_d import TestResultD, TestResultSetD
+from domain.testing import make_result
+import proto.patched_solutions_pb2 as ps_pb2
+
+
+def _result(solution: int, test: int, output: str) -> TestResultD:
+    return make_result(solution_id=f"solution_{solution}",
+                       test_id=f"test_{test}",
+                       solution_output=output,
+                       expected_output=f"expected {test}",
+                       wall_time_nsec=solution * 1000 + test,
+                       limit_exceeded=ps_pb2.LIMIT_TYPE_CPU_TIME
+                       if test == 2 else ps_pb2.LIMIT_TYPE_UNSPECIFIED,
+                       cpu_time_nsec=2**40,
+                       peak_rss_bytes=2**33,
+                       skipped=solution == 3)
+
+
+def _results() -> list:
+    return [
+        _result(solution, test, f"expected {test}" if solution % 2 else "")
+        for solution in range(4) for test in range(3)
+    ]
+
+
+def test_round_trips_results():
+    results = _results()
+    compact = CompactTestResults(results)
+    assert len(compact) == len(results)
+    assert list(compact) == results
+    assert compact[-1] == results[-1]
+    assert compact[5].proto_id == results[5].proto_id
+    with pytest.raises(IndexError):
+        compact[len(results)]
+
+
+def test_interns_ids_and_outputs():
+    compact = CompactTestResults(_results())
+    # 3 test ids, 1 problem id, 4 solution ids, the empty string (shared by
+    # outputs and exception info) and 3 expected outputs, which the correct
+    # solutions' outputs reuse
+    assert compact.n_strings == 3 + 1 + 4 + 1 + 3
+
+
+def test_converts_back_to_result_sets():
+    results = _results()
+    compact = CompactTestResults.from_result_sets([
+        TestResultSetD(test_results=results[:5]),
+        TestResultSetD(test_results=results[5:])
+    ])
+    assert [
+        result_set.test_results for result_set in compact.to_result_sets(5)
+    ] == [results[:5], results[5:10], results[10:]]
+    assert compact.to_result_set() == TestResultSetD(test_results=results)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import concurrent.futures as futures
+import dataclasses
+import glob
+import logging
+from typing import List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import ContestProblemD, ContestProblemSetD
+from proto.contest_problem_pb2 import ContestProblem
+
+# Only the CodeContests columns ContestProblemD.from_df_row reads are
+# decoded from the parquet files
+INGEST_COLUMNS = [
+    'name', 'description', 'difficulty', 'time_limit', 'memory_limit_bytes',
+    'public_tests', 'private_tests', 'generated_tests', 'solutions',
+    'incorrect_solutions', 'cf_points', 'cf_rating'
+]
+DEFAULT_ROW_BATCH_SIZE = 64
+
+
+# The private tests kept are appended to the public tests, which the evaluator
+# runs
+@dataclasses.dataclass(frozen=True)
+class ProblemTruncation:
+    max_problems: Optional[int] = 5
+    max_solutions: int = 5
+    max_incorrect_solutions: int = 5
+    max_public_tests: int = 5
+    max_private_tests: int = 5
+
+    def apply(self, problem: ContestProblemD) -> ContestProblemD:
+        public_tests = problem.public_tests[:self.max_public_tests]
+        private_tests = problem.private_tests[:self.max_private_tests]
+        incorrect = problem.incorrect_solutions[:self.max_incorrect_solutions]
+        return dataclasses.replace(
+            problem,
+            solutions=problem.solutions[:self.max_solutions],
+            public_tests=public_tests + private_tests,
+            incorrect_solutions=incorrect)
+
+
+# Rows with both correct and incorrect Python solutions, from the language
+# lists alone
+def _python_rows(batch: pa.RecordBatch) -> List[bool]:
+    python = ContestProblem.Solution.PYTHON3
+    mask = [True] * batch.num_rows
+    for column in ('solutions', 'incorrect_solutions'):
+        languages = batch.column(column).field('language').to_pylist()
+        mask = [
+            keep and python in row_languages
+            for keep, row_languages in zip(mask, languages)
+        ]
+    return mask
+
+
+# Rows are streamed a batch at a time, and reading stops once max_problems are
+# kept
+def ingest_file(
+        file_path: str,
+        truncation: Optional[ProblemTruncation] = None,
+        row_batch_size: int = DEFAULT_ROW_BATCH_SIZE) -> ContestProblemSetD:
+    parquet_file = pq.ParquetFile(file_path)
+    max_problems = truncation.max_problems if truncation else None
+    problems: List[ContestProblemD] = []
+    for batch in parquet_file.iter_batches(batch_size=row_batch_size,
+                                           columns=INGEST_COLUMNS):
+        batch = batch.filter(pa.array(_python_rows(batch)))
+        if max_problems is not None:
+            batch = batch.slice(0, max_problems - len(problems))
+        batch_problems = ContestProblemD.from_columns(batch.to_pydict())
+        if truncation:
+            batch_problems = list(map(truncation.apply, batch_problems))
+        problems.extend(batch_problems)
+        if len(problems) == max_problems:
+            break
+    return ContestProblemSetD(problems=problems)
+
+
+def _ingest_chunk(file_path: str, truncation: Optional[ProblemTruncation],
+                  row_batch_size: int) -> Tuple[bytes, List[Tuple], int]:
+    # Pool tasks return the compressed chunk, which is far smaller to send
+    # back than the pickled problems
+    problem_set = ingest_file(file_path, truncation, row_batch_size)
+    return (problem_set.to_compressed(), problem_set.index_entries(),
+            len(problem_set.problems))
+
+
+# One file per task, appending one chunk per file in file order
+def ingest_code_contests(file_pattern: str,
+                         dao: CompressedDomainFileDAO[ContestProblemSetD],
+                         truncation: Optional[ProblemTruncation] = None,
+                         max_workers: Optional[int] = None,
+                         row_batch_size: int = DEFAULT_ROW_BATCH_SIZE) -> int:
+    file_paths = sorted(glob.glob(file_pattern))
+    if not file_paths:
+        raise FileNotFoundError(f'No parquet files match: {file_pattern}')
+    n_problems = 0
+    with futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunks = executor.map(_ingest_chunk, file_paths,
+                              [truncation] * len(file_paths),
+                              [row_batch_size] * len(file_paths))
+        for file_path, (compressed, index_entries,
+                        file_problems) in zip(file_paths, chunks):
+            dao.write_compressed([(compressed, index_entries)])
+            n_problems += file_problems
+            logging.info(f"Ingested {file_problems} problems "
+                         f"from {file_path}")
+    return n_problems
@@ -0,0 +1,122 @@
+from typing import List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from domain.contest_ingestion import ProblemTruncation, ingest_code_contests
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import ContestProblemD, ContestProblemSetD
+
+PYTHON3 = 3
+CPP = 2
+
+
+def _tests(n: int) -> dict:
+    return {
+        "input": [f"in {i}" for i in range(n)],
+        "output": [f"out {i}" for i in range(n)]
+    }
+
+
+def _solutions(languages: List[int]) -> dict:
+    return {
+        "language": languages,
+        "solution": [f"print({i})" for i in range(len(languages))]
+    }
+
+
+def _row(name: str, languages: List[int]) -> dict:
+    return {
+        "name": name,
+        "description": f"{name} description",
+        "difficulty": 1,
+        "time_limit": {
+            "seconds": 2,
+            "nanos": 0
+        },
+        "memory_limit_bytes": 256 << 20,
+        "public_tests": _tests(7),
+        "private_tests": _tests(3),
+        "generated_tests": _tests(1),
+        "solutions": _solutions(languages),
+        "incorrect_solutions": _solutions(languages),
+        "cf_points": 0.0,
+        "cf_rating": 800,
+        "source": 2,
+    }
+
+
+def _write_parquet(path: str, rows: List[dict]):
+    pq.write_table(pa.Table.from_pylist(rows), path, row_group_size=2)
+
+
+def test_ingest_filters_truncates_and_keeps_file_order(tmp_path):
+    _write_parquet(str(tmp_path / "train-00001.parquet"), [
+        _row("cpp_only", [CPP]),
+        _row("a", [PYTHON3] * 8 + [CPP]),
+        _row("b", [CPP, PYTHON3]),
+        _row("c", [PYTHON3]),
+    ])
+    _write_parquet(str(tmp_path / "train-00000.parquet"),
+                   [_row("d", [PYTHON3])])
+    (tmp_path / "chunks").mkdir()
+    dao = CompressedDomainFileDAO(str(tmp_path / "chunks"), ContestProblemSetD)
+
+    n_problems = ingest_code_contests(str(tmp_path / "*.parquet"),
+                                      dao,
+                                      ProblemTruncation(max_problems=2),
+                                      max_workers=2)
+
+    problem_sets = list(dao.read())
+    assert n_problems == 3
+    assert [[problem.name for problem in problem_set.problems]
+            for problem_set in problem_sets] == [["d"], ["a", "b"]]
+    problem_a = problem_sets[1].problems[0]
+    assert len(problem_a.solutions) == 5
+    assert len(problem_a.incorrect_solutions) == 5
+    assert {solution.language for solution in problem_a.solutions} == {PYTHON3}
+    assert [test.input for test in problem_a.public_tests
+            ] == [f"in {i}" for i in range(5)] + ["in 0", "in 1", "in 2"]
+    assert len(problem_a.generated_tests) == 1
+    assert problem_a.time_limit_nsec == 2_000_000_000
+
+
+def test_ingest_without_truncation_keeps_every_python_problem(tmp_path):
+    _write_parquet(str(tmp_path / "test.parquet"),
+                   [_row(str(i), [PYTHON3] * 7) for i in range(6)])
+    (tmp_path / "chunks").mkdir()
+    dao = CompressedDomainFileDAO(str(tmp_path / "chunks"), ContestProblemSetD)
+
+    assert ingest_code_contests(str(tmp_path / "*.parquet"), dao) == 6
+    [problem_set] = list(dao.read())
+    assert all(len(problem.solutions) == 7 for problem in problem_set.problems)
+
+
+def test_from_df_row_reads_time_limit():
+    row = {**_row("a", [PYTHON3]), "time_limit": {"seconds": 2, "nanos": 5}}
+    problem = ContestProblemD.from_df_row(row)
+    assert problem.time_limit_nsec == 2_000_000_005
+    assert ContestProblemD.from_proto(
+        problem.to_proto()).time_limit_nsec == 2_000_000_005
+    assert ContestProblemD.from_df_row({
+        **row, "time_limit": None
+    }).time_limit_nsec == 1_000_000_000
+
+
+def test_problem_id_is_stable_across_time_limits():
+    row = _row("a", [PYTHON3])
+    problem = ContestProblemD.from_df_row(row)
+    legacy = ContestProblemD.from_df_row({**row, "time_limit": None})
+    assert problem.time_limit_nsec != legacy.time_limit_nsec
+    assert problem.proto_id == legacy.proto_id
+
+
+def test_from_df_keeps_problems_with_python_solutions():
+    df = pd.DataFrame([_row("cpp_only", [CPP]), _row("a", [CPP, PYTHON3])])
+    [problem] = ContestProblemD.from_df(df)
+    assert problem.name == "a"
+    assert [solution.language for solution in problem.solutions] == [PYTHON3]
+    [decoded] = ContestProblemSetD.from_compressed(
+        ContestProblemSetD.compressed_from_df(df)).problems
+    assert decoded.proto_id == problem.proto_id
@@ -1,13 +1,53 @@
+import atexit
 import os
-from typing import TypeVar, Type, Iterable, Generic, Tuple
+from typing import TypeVar, Type, Iterable, Generic, Tuple, List, Optional, Deque
+import collections
 import dataclasses
 import concurrent.futures as futures
 import logging
+import multiprocessing
+import gzip
+import itertools
+import json
+import mmap
+import struct
+import time
 
+from domain import metrics
 from domain.domain_protocol import DomainProtocol
 
 DomainT = TypeVar('DomainT', bound=DomainProtocol)
 
+DEFAULT_PREFETCH = 8
+
+# Binary .pb files are a run of length-prefixed serialized records
+_LENGTH = struct.Struct('<I')
+_WRITE_BUFFER_BYTES = 1 << 20
+
+_READ_EXECUTOR: Optional[futures.ProcessPoolExecutor] = None
+
+
+# Workers start from a forkserver, as forking a reader that runs threads, e.g.
+# a write-ahead log's compaction, can deadlock them
+def _read_executor() -> futures.ProcessPoolExecutor:
+    global _READ_EXECUTOR
+    if _READ_EXECUTOR is None:
+        _READ_EXECUTOR = futures.ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context('forkserver'))
+    return _READ_EXECUTOR
+
+
+# Shuts down the shared pool, or only executor if it is still shared, so the
+# next read starts a new one
+@atexit.register
+def _shutdown_read_executor(
+        executor: Optional[futures.ProcessPoolExecutor] = None):
+    global _READ_EXECUTOR
+    if _READ_EXECUTOR is None or executor not in (None, _READ_EXECUTOR):
+        return
+    _READ_EXECUTOR.shutdown(cancel_futures=True)
+    _READ_EXECUTOR = None
+
 
 @dataclasses.dataclass(frozen=True)
 class DomainFileDAO(Generic[DomainT]):
@@ -32,11 +72,25 @@ class DomainFileDAO(Generic[DomainT]):
             raise ValueError(f'Unsupported file format: {self._file_path}')
 
     def _read_from_text_binary(self) -> Iterable[DomainT]:
-        with open(self._file_path, 'r') as file:
-            for line in file.readlines():
-                proto = self._domain_cls.message_cls()()
-                proto.ParseFromString(line.encode('utf-8'))
-                yield self._domain_cls.from_proto(proto)
+        message_cls = self._domain_cls.message_cls()
+        with open(self._file_path, 'rb') as file:
+            if not os.fstat(file.fileno()).st_size:
+                return
+            # Records are sliced straight out of the mapping, so only the
+            # record being parsed is copied into memory
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = 0
+                while offset < len(data):
+                    record_start = offset + _LENGTH.size
+                    record_end = record_start
+                    if record_start <= len(data):
+                        record_end += _LENGTH.unpack_from(data, offset)[0]
+                    if record_end > len(data):
+                        raise ValueError(f'Truncated record at {offset} in '
+                                         f'{self._file_path}')
+                    yield self._domain_cls.from_proto(
+                        message_cls.FromString(data[record_start:record_end]))
+                    offset = record_end
 
     def _read_from_jsonl(self) -> Iterable[DomainT]:
         with open(self._file_path, 'r') as file:
@@ -54,12 +108,13 @@ class DomainFileDAO(Generic[DomainT]):
     def _write_to_text_binary(self,
                               domain_objects: Iterable[DomainT],
                               replace: bool = True):
-        mode = 'w' if replace else 'a'
-        with open(self._file_path, mode) as file:
+        mode = 'wb' if replace else 'ab'
+        with open(self._file_path, mode,
+                  buffering=_WRITE_BUFFER_BYTES) as file:
             for domain_object in domain_objects:
-                file.write(domain_object.to_proto().SerializeToString().decode(
-                    'utf-8'))
-                file.write('\n')
+                record = domain_object.to_proto().SerializeToString()
+                file.write(_LENGTH.pack(len(record)))
+                file.write(record)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -75,43 +130,138 @@ class CompressedDomainFileDAO(Generic[DomainT]):
     @staticmethod
     def _read_from_compressed_text_binary(domain_cls: Type[DomainT],
                                           file_path: str) -> DomainT:
+        domain_object, stage_times = CompressedDomainFileDAO._read_stages(
+            domain_cls, file_path)
+        CompressedDomainFileDAO._record_read(stage_times)
+        return domain_object
+
+    # DomainProtocol.from_compressed of the chunk, with the seconds spent
+    # reading, decompressing and parsing it
+    @staticmethod
+    def _read_stages(
+            domain_cls: Type[DomainT],
+            file_path: str) -> Tuple[DomainT, Tuple[float, float, float]]:
+        start = time.perf_counter()
         with open(file_path, 'rb') as file:
-            return domain_cls.from_compressed(file.read())
+            compressed = file.read()
+        read = time.perf_counter()
+        data = gzip.decompress(compressed)
+        decompressed = time.perf_counter()
+        domain_object = domain_cls.from_proto(
+            domain_cls.message_cls().FromString(data))
+        return domain_object, (read - start, decompressed - read,
+                               time.perf_counter() - decompressed)
+
+    @staticmethod
+    def _record_read(stage_times: Tuple[float, float, float]):
+        for stage, seconds in zip(('read', 'decompress', 'parse'),
+                                  stage_times):
+            metrics.observe('dao_chunk_seconds', seconds, stage=stage)
 
     def _ff_path(self, file_path: str) -> str:
         return f'{self._dir_path}/{file_path}'
 
     @property
     def file_paths(self) -> Iterable[str]:
-        return map(self._ff_path, os.listdir(self._dir_path))
+        return map(
+            self._ff_path,
+            filter(lambda file: file.endswith('.pb'),
+                   os.listdir(self._dir_path)))
+
+    @staticmethod
+    def _index_path(file_path: str) -> str:
+        return file_path[:-len('.pb')] + '.idx'
+
+    # Renamed into place, so readers never see a partially written file
+    @staticmethod
+    def _write_atomic(file_path: str, data: bytes):
+        with open(f'{file_path}.tmp', 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f'{file_path}.tmp', file_path)
+
+    @staticmethod
+    def _write_index(file_path: str, entries: List[Tuple]):
+        CompressedDomainFileDAO._write_atomic(
+            CompressedDomainFileDAO._index_path(file_path),
+            gzip.compress(json.dumps(entries).encode('utf-8')))
+
+    def read_chunk(self, file_path: str) -> DomainT:
+        return self._read_from_compressed_text_binary(self._domain_cls,
+                                                      file_path)
+
+    def _read_index(self, file_path: str) -> List[Tuple]:
+        index_path = self._index_path(file_path)
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as file:
+                return [
+                    tuple(entry)
+                    for entry in json.loads(gzip.decompress(file.read()))
+                ]
+        # Chunks written before sidecars existed are decoded, until reindex
+        return self.read_chunk(file_path).index_entries()
+
+    # Chunk paths with their index entries, without decoding the chunks
+    def read_index(self) -> Iterable[Tuple[str, List[Tuple]]]:
+        for file_path in self.sorted_file_paths:
+            yield (file_path, self._read_index(file_path))
+
+    # Writes the sidecars missing for chunks written before they existed
+    def reindex(self) -> int:
+        missing_paths = [
+            file_path for file_path in self.sorted_file_paths
+            if not os.path.exists(self._index_path(file_path))
+        ]
+        for file_path in missing_paths:
+            self._write_index(file_path,
+                              self.read_chunk(file_path).index_entries())
+        return len(missing_paths)
 
     @staticmethod
     def _inc_from_path(file_path: str) -> int:
         return int(file_path.split('_')[-1].split('.')[0])
 
-    def _parallel_read(self) -> Iterable[Tuple[str, DomainT]]:
-        with futures.ProcessPoolExecutor() as exexutor:
-            futures_dict = {}
-            for file_path in self.file_paths:
-                future = exexutor.submit(
-                    self._read_from_compressed_text_binary, self._domain_cls,
-                    file_path)
-                futures_dict[future] = file_path
-            for future in futures.as_completed(futures_dict):
-                file_path = futures_dict[future]
-                yield (file_path, future.result())
-
-    def read(self, parallelize: bool = False) -> Iterable[DomainT]:
-        read_fn = self._parallel_read if parallelize else self._sequential_read
-        for _, domains in sorted(read_fn(),
-                                 key=lambda x: self._inc_from_path(x[0])):
-            yield domains
-
-    def _sequential_read(self) -> Iterable[Tuple[str, DomainT]]:
-        for file_path in self.file_paths:
-            domains = self._read_from_compressed_text_binary(
-                self._domain_cls, file_path)
-            yield (file_path, domains)
+    @property
+    def sorted_file_paths(self) -> List[str]:
+        return sorted(self.file_paths, key=self._inc_from_path)
+
+    # Decodes up to prefetch chunks ahead, yielding them in order
+    def _parallel_read(self, prefetch: int) -> Iterable[DomainT]:
+        executor = _read_executor()
+        file_paths = iter(self.sorted_file_paths)
+        in_flight: Deque[futures.Future] = collections.deque()
+        try:
+            while True:
+                for file_path in itertools.islice(file_paths,
+                                                  prefetch - len(in_flight)):
+                    in_flight.append(
+                        executor.submit(self._read_stages, self._domain_cls,
+                                        file_path))
+                if not in_flight:
+                    break
+                # Stages are timed in the pool and recorded here
+                domain_object, stage_times = in_flight.popleft().result()
+                self._record_read(stage_times)
+                yield domain_object
+        except futures.BrokenExecutor:
+            # A pool worker died, e.g. of OOM, and the pool is unusable
+            _shutdown_read_executor(executor)
+            raise
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def read(self,
+             parallelize: bool = False,
+             prefetch: int = DEFAULT_PREFETCH) -> Iterable[DomainT]:
+        if parallelize:
+            return self._parallel_read(max(prefetch, 1))
+        return self._sequential_read()
+
+    def _sequential_read(self) -> Iterable[DomainT]:
+        for file_path in self.sorted_file_paths:
+            yield self.read_chunk(file_path)
 
     def clear_cache(self):
         if os.path.exists(self._dir_path):
@@ -119,13 +269,18 @@ class CompressedDomainFileDAO(Generic[DomainT]):
                 os.remove(f'{self._dir_path}/{file}')
 
     def write(self, domain_objects: Iterable[DomainT]):
+        self.write_compressed(
+            (domain_object.to_compressed(), domain_object.index_entries())
+            for domain_object in domain_objects)
+
+    # Chunks compressed elsewhere, e.g. on a process pool, with their index
+    # entries
+    def write_compressed(self, chunks: Iterable[Tuple[bytes, List[Tuple]]]):
         if not os.path.exists(self._dir_path):
             os.makedirs(self._dir_path, exist_ok=True)
-        curr_chunk = max([
-            int(file.split('_')[1].split('.')[0])
-            for file in os.listdir(self._dir_path)
-        ] or [0])
-        for domain_object in domain_objects:
+        curr_chunk = max(map(self._inc_from_path, self.file_paths), default=0)
+        for compressed, index_entries in chunks:
             curr_chunk += 1
-            with open(f'{self._dir_path}/chunk_{curr_chunk}.pb', 'wb') as file:
-                file.write(domain_object.to_compressed())
+            file_path = f'{self._dir_path}/chunk_{curr_chunk}.pb'
+            self._write_atomic(file_path, compressed)
+            self._write_index(file_path, index_entries)
@@ -0,0 +1,99 @@
+from collections.abc import Generator
+from concurrent.futures.process import BrokenProcessPool
+import os
+
+import pytest
+
+from domain import domain_dao
+from domain.domain_dao import CompressedDomainFileDAO, DomainFileDAO
+from domain.problems_d import TestResultD, TestResultSetD
+from domain.testing import make_result
+
+
+def _result_set(*ids: str) -> TestResultSetD:
+    return TestResultSetD(test_results=[
+        make_result(solution_id=f"solution_{i}",
+                    test_id=f"test_{i}",
+                    wall_time_nsec=len(i)) for i in ids
+    ])
+
+
+def test_write_creates_index_sidecars(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    dao.write([_result_set("a", "b"), _result_set("cc")])
+    assert sorted(os.listdir(tmp_path)) == [
+        "chunk_1.idx", "chunk_1.pb", "chunk_2.idx", "chunk_2.pb"
+    ]
+    assert [entries for _, entries in dao.read_index()] == [
+        [("solution_a", "test_a", False, 1),
+         ("solution_b", "test_b", False, 1)],
+        [("solution_cc", "test_cc", False, 2)],
+    ]
+    assert len(list(dao.read())) == 2
+
+
+def test_reindex_backfills_missing_sidecars(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    dao.write([_result_set("a"), _result_set("b")])
+    os.remove(tmp_path / "chunk_1.idx")
+    [(chunk_path, entries), _] = list(dao.read_index())
+    assert entries == [("solution_a", "test_a", False, 1)]
+    # Reading the index leaves the directory untouched
+    assert not os.path.exists(tmp_path / "chunk_1.idx")
+    assert dao.read_chunk(chunk_path) == _result_set("a")
+
+    assert dao.reindex() == 1
+    assert os.path.exists(tmp_path / "chunk_1.idx")
+    assert [entries for _, entries in dao.read_index()] == [
+        [("solution_a", "test_a", False, 1)],
+        [("solution_b", "test_b", False, 1)],
+    ]
+
+
+def test_parallel_read_streams_chunks_in_order(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    result_sets = [_result_set(str(i)) for i in range(12)]
+    dao.write(result_sets)
+    assert list(dao.read(parallelize=True, prefetch=3)) == result_sets
+    assert list(dao.read()) == result_sets
+
+    reader = dao.read(parallelize=True, prefetch=3)
+    assert isinstance(reader, Generator)
+    assert next(reader) == result_sets[0]
+    reader.close()
+
+
+def test_parallel_read_recovers_from_broken_pool(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    result_sets = [_result_set(str(i)) for i in range(4)]
+    dao.write(result_sets)
+    assert list(dao.read(parallelize=True)) == result_sets
+    executor = domain_dao._read_executor()
+    for process in list(executor._processes.values()):
+        process.kill()
+        process.join()
+    with pytest.raises(BrokenProcessPool):
+        list(dao.read(parallelize=True))
+    assert list(dao.read(parallelize=True)) == result_sets
+    assert domain_dao._read_executor() is not executor
+
+
+def test_binary_file_round_trips_arbitrary_bytes(tmp_path):
+    # Newlines and varints >= 128 broke the old newline separated format
+    results = _result_set("a\nb", "c" * 200).test_results
+    dao = DomainFileDAO(str(tmp_path / "results.pb"), TestResultD)
+    dao.write(results)
+    dao.write(results[:1], replace=False)
+    assert list(dao.read()) == results + results[:1]
+
+    dao.write([])
+    assert list(dao.read()) == []
+
+
+def test_binary_file_rejects_truncated_record(tmp_path):
+    dao = DomainFileDAO(str(tmp_path / "results.pb"), TestResultD)
+    dao.write(_result_set("a", "b").test_results)
+    with open(tmp_path / "results.pb", "r+b") as file:
+        file.truncate(os.path.getsize(tmp_path / "results.pb") - 1)
+    with pytest.raises(ValueError):
+        list(dao.read())
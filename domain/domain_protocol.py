@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import TypeVar, get_args, Type, Protocol, Optional, Tuple
+from typing import TypeVar, get_args, Type, Protocol, Optional, Tuple, List
 from google.protobuf import json_format, message
+import functools
 import hashlib
 import gzip
 import dataclasses
@@ -12,11 +13,18 @@ DomainProtocolType = TypeVar("DomainProtocolType", bound='DomainProtocol')
 @dataclasses.dataclass(frozen=True)
 class DomainProtocol(Protocol[MessageType]):
 
-    @property
+    @functools.cached_property
     def proto_id(self) -> str:
+        # Memoized in the instance __dict__, which frozen dataclasses still
+        # allow, so the proto is serialized and hashed once per instance
         return hashlib.sha256(
             self.to_proto().SerializeToString(deterministic=True)).hexdigest()
 
+    # Small per-record tuples stored in a chunk's sidecar index, so resume
+    # checks need not decode the chunk itself
+    def index_entries(self) -> List[Tuple]:
+        return []
+
     @classmethod
     def message_cls(cls: Type[DomainProtocolType]) -> Type[MessageType]:
         orig_bases: Optional[Tuple[Type[MessageType],
@@ -33,11 +41,12 @@ class DomainProtocol(Protocol[MessageType]):
 
     @classmethod
     def from_proto(cls: Type[DomainProtocolType],
-                   proto: MessageType) -> MessageType:
+                   proto: MessageType) -> DomainProtocolType:
         ...
 
     @classmethod
-    def from_json(cls: Type[DomainProtocolType], json_str: str) -> MessageType:
+    def from_json(cls: Type[DomainProtocolType],
+                  json_str: str) -> DomainProtocolType:
         try:
             proto = cls.message_cls()()
             json_format.Parse(json_str, proto)
@@ -49,7 +58,8 @@ class DomainProtocol(Protocol[MessageType]):
         return json_format.MessageToJson(self.to_proto()).replace("\n", " ")
 
     @classmethod
-    def from_dict(cls: Type[DomainProtocolType], d: dict) -> MessageType:
+    def from_dict(cls: Type[DomainProtocolType],
+                  d: dict) -> DomainProtocolType:
         try:
             proto = cls.message_cls()()
             json_format.ParseDict(d, proto)
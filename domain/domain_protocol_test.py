@@ -0,0 +1,51 @@
+import dataclasses
+import hashlib
+import pickle
+
+from domain.domain_protocol import DomainProtocol
+from domain.problems_d import TestD, SolutionD, ContestProblemD
+from proto.contest_problem_pb2 import ContestProblem
+
+
+def _uncached_proto_id(domain_object: DomainProtocol) -> str:
+    return hashlib.sha256(domain_object.to_proto().SerializeToString(
+        deterministic=True)).hexdigest()
+
+
+def _problem() -> ContestProblemD:
+    return ContestProblemD(
+        name="problem",
+        description="add two numbers",
+        difficulty=ContestProblem.EASY,
+        # The default limit, which ContestProblemD.proto_id hashes
+        time_limit_nsec=int(1e9),
+        memory_limit_bytes=256 * 1024 * 1024,
+        public_tests=[TestD(input="1 2\n", output="3\n")],
+        private_tests=[TestD(input="2 2\n", output="4\n")],
+        generated_tests=[],
+        solutions=[
+            SolutionD(solution="print(sum(map(int, input().split())))",
+                      language=ContestProblem.Solution.PYTHON3)
+        ],
+        incorrect_solutions=[],
+        cf_points=0,
+        cf_rating=800)
+
+
+def test_proto_id_is_memoized_per_instance():
+    problem = _problem()
+    assert problem.proto_id == _uncached_proto_id(problem)
+    assert problem.__dict__["proto_id"] == problem.proto_id
+    assert problem == _problem()
+
+
+def test_proto_id_tracks_replaced_fields():
+    problem = _problem()
+    renamed = dataclasses.replace(problem, name="renamed")
+    assert problem.proto_id != renamed.proto_id
+    assert renamed.proto_id == _uncached_proto_id(renamed)
+
+
+def test_proto_id_survives_pickling():
+    problem = _problem()
+    assert pickle.loads(pickle.dumps(problem)).proto_id == problem.proto_id
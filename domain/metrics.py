@@ -0,0 +1,253 @@
+from __future__ import annotations
+import dataclasses
+import json
+import random
+import threading
+import time
+from typing import Any, ContextManager, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_SAMPLES = 10_000
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Sorted (label, value) pairs
+LabelsT = Tuple[Tuple[str, str], ...]
+MetricKeyT = Tuple[str, LabelsT]
+
+
+@dataclasses.dataclass
+class Gauge:
+    value: float = 0.0
+    max: float = 0.0
+
+
+# Quantiles are estimated from a uniform reservoir sample of max_samples
+# observations
+@dataclasses.dataclass
+class Summary:
+    max_samples: int = DEFAULT_MAX_SAMPLES
+    count: int = 0
+    sum: float = 0.0
+    min: float = float('inf')
+    max: float = float('-inf')
+    samples: List[float] = dataclasses.field(default_factory=list)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.samples) < self.max_samples:
+            self.samples.append(value)
+        elif (i := random.randrange(self.count)) < self.max_samples:
+            self.samples[i] = value
+
+    def quantiles(self) -> Dict[str, float]:
+        samples = sorted(self.samples) or [0.0]
+        last = len(samples) - 1
+        return {
+            f'p{int(q * 100)}': samples[min(int(q * len(samples)), last)]
+            for q in QUANTILES
+        }
+
+
+def _key(name: str, labels: Dict[str, Any]) -> MetricKeyT:
+    label_values = ((label, str(value)) for label, value in labels.items())
+    return (name, tuple(sorted(label_values)))
+
+
+# Durations are observed in seconds and sizes in bytes, with the unit as the
+# name's suffix, following Prometheus naming
+class MetricsRegistry:
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters: Dict[MetricKeyT, float] = {}
+        self._gauges: Dict[MetricKeyT, Gauge] = {}
+        self._summaries: Dict[MetricKeyT, Summary] = {}
+        self.started_at = time.time()
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            gauge = self._gauges.setdefault(key, Gauge())
+            gauge.value = value
+            gauge.max = max(gauge.max, value)
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary(self._max_samples)
+            summary.observe(value)
+
+    def timed(self, name: str, **labels) -> ContextManager:
+        return _Timer(self, name, labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def summary(self, name: str, **labels) -> Optional[Summary]:
+        with self._lock:
+            return self._summaries.get(_key(name, labels))
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'started_at':
+                self.started_at,
+                'duration_sec':
+                time.time() - self.started_at,
+                'counters': [{
+                    'name': name,
+                    'labels': dict(labels),
+                    'value': value
+                } for (name, labels), value in sorted(self._counters.items())],
+                'gauges': [{
+                    'name': name,
+                    'labels': dict(labels),
+                    'value': gauge.value,
+                    'max': gauge.max
+                } for (name, labels), gauge in sorted(self._gauges.items())],
+                'summaries': [{
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': summary.count,
+                    'sum': summary.sum,
+                    'min': summary.min,
+                    'max': summary.max,
+                    **summary.quantiles()
+                } for (name,
+                       labels), summary in sorted(self._summaries.items())],
+            }
+
+    def to_prometheus(self) -> str:
+        report = self.report()
+        lines: List[str] = []
+        typed = set()
+
+        def sample(name: str, metric_type: str, labels: Dict[str, str],
+                   value: float):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name}{_format_labels(labels)} {value!r}')
+
+        for counter in report['counters']:
+            sample(counter['name'], 'counter', counter['labels'],
+                   counter['value'])
+        for gauge in report['gauges']:
+            sample(gauge['name'], 'gauge', gauge['labels'], gauge['value'])
+        for gauge in report['gauges']:
+            sample(f"{gauge['name']}_max", 'gauge', gauge['labels'],
+                   gauge['max'])
+        for summary in report['summaries']:
+            name, labels = summary['name'], summary['labels']
+            for q in QUANTILES:
+                sample(name, 'summary', {
+                    **labels, 'quantile': str(q)
+                }, summary[f'p{int(q * 100)}'])
+            lines.append(f"{name}_sum{_format_labels(labels)} "
+                         f"{summary['sum']!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} "
+                         f"{summary['count']}")
+        return ''.join(f'{line}\n' for line in lines)
+
+    def write_json(self, file_path: str):
+        with open(file_path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+    def write_prometheus(self, file_path: str):
+        with open(file_path, 'w') as file:
+            file.write(self.to_prometheus())
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape_label(value)}"'
+                          for label, value in labels.items()) + '}'
+
+
+class _Timer:
+    __slots__ = ('_registry', '_name', '_labels', '_start')
+
+    def __init__(self, registry: MetricsRegistry, name: str,
+                 labels: Dict[str, Any]):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._registry.observe(self._name,
+                               time.perf_counter() - self._start,
+                               **self._labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+# Metrics are only recorded while a registry is enabled, so instrumented
+# code pays one global lookup per call otherwise
+_REGISTRY: Optional[MetricsRegistry] = None
+
+
+def enable(registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    global _REGISTRY
+    _REGISTRY = registry or MetricsRegistry()
+    return _REGISTRY
+
+
+def disable() -> Optional[MetricsRegistry]:
+    global _REGISTRY
+    registry, _REGISTRY = _REGISTRY, None
+    return registry
+
+
+def enabled() -> bool:
+    return _REGISTRY is not None
+
+
+def count(name: str, value: float = 1, **labels):
+    if _REGISTRY is not None:
+        _REGISTRY.count(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels):
+    if _REGISTRY is not None:
+        _REGISTRY.set_gauge(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    if _REGISTRY is not None:
+        _REGISTRY.observe(name, value, **labels)
+
+
+def timed(name: str, **labels) -> ContextManager:
+    if _REGISTRY is None:
+        return _NULL_TIMER
+    return _REGISTRY.timed(name, **labels)
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from domain import metrics
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import TestResultSetD
+from domain.testing import make_result
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.enable()
+    yield registry
+    metrics.disable()
+
+
+def test_disabled_metrics_are_not_recorded():
+    assert not metrics.enabled()
+    metrics.count('requests_total')
+    metrics.observe('latency_seconds', 1.0)
+    with metrics.timed('latency_seconds'):
+        pass
+    registry = metrics.enable()
+    metrics.disable()
+    assert registry.report()['counters'] == []
+    assert registry.report()['summaries'] == []
+
+
+def test_counters_gauges_and_summaries(registry: metrics.MetricsRegistry):
+    metrics.count('requests_total', result='hit')
+    metrics.count('requests_total', 2, result='hit')
+    metrics.count('requests_total', result='miss')
+    metrics.set_gauge('in_flight', 3)
+    metrics.set_gauge('in_flight', 1)
+    for value in range(1, 101):
+        metrics.observe('latency_seconds', value / 100, stage='run')
+    with metrics.timed('latency_seconds', stage='wait'):
+        pass
+
+    assert registry.counter_value('requests_total', result='hit') == 3
+    assert registry.counter_value('requests_total', result='miss') == 1
+    report = json.loads(json.dumps(registry.report()))
+    assert report['gauges'] == [{
+        'name': 'in_flight',
+        'labels': {},
+        'value': 1,
+        'max': 3
+    }]
+    run = registry.summary('latency_seconds', stage='run')
+    assert run is not None
+    assert (run.count, run.min, run.max) == (100, 0.01, 1.0)
+    assert run.quantiles() == {'p50': 0.51, 'p90': 0.91, 'p99': 1.0}
+    wait = registry.summary('latency_seconds', stage='wait')
+    assert wait is not None and wait.count == 1
+
+
+def test_summary_samples_are_bounded():
+    summary = metrics.Summary(max_samples=10)
+    for value in range(1000):
+        summary.observe(value)
+    assert (summary.count, summary.sum) == (1000, sum(range(1000)))
+    assert len(summary.samples) == 10
+
+
+def test_prometheus_exposition(registry: metrics.MetricsRegistry):
+    metrics.count('tokens_total', 5, model='gpt "4"\n')
+    metrics.set_gauge('in_flight', 2)
+    metrics.observe('latency_seconds', 0.5)
+    assert registry.to_prometheus().splitlines() == [
+        '# TYPE tokens_total counter',
+        'tokens_total{model="gpt \\"4\\"\\n"} 5',
+        '# TYPE in_flight gauge',
+        'in_flight 2',
+        '# TYPE in_flight_max gauge',
+        'in_flight_max 2',
+        '# TYPE latency_seconds summary',
+        'latency_seconds{quantile="0.5"} 0.5',
+        'latency_seconds{quantile="0.9"} 0.5',
+        'latency_seconds{quantile="0.99"} 0.5',
+        'latency_seconds_sum 0.5',
+        'latency_seconds_count 1',
+    ]
+
+
+@pytest.mark.parametrize("parallelize", [False, True])
+def test_dao_reads_record_chunk_stages(tmp_path,
+                                       registry: metrics.MetricsRegistry,
+                                       parallelize: bool):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    dao.write([
+        TestResultSetD(
+            test_results=[make_result(test_id=f"test_{i}", wall_time_nsec=i)])
+        for i in range(3)
+    ])
+    assert len(list(dao.read(parallelize=parallelize))) == 3
+    for stage in ('read', 'decompress', 'parse'):
+        chunk_seconds = registry.summary('dao_chunk_seconds', stage=stage)
+        assert chunk_seconds is not None and chunk_seconds.count == 3
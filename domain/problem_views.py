@@ -0,0 +1,131 @@
+from __future__ import annotations
+import functools
+from typing import ClassVar, List
+
+from domain.domain_protocol import DomainProtocol
+from domain.problems_d import ContestProblemD, ContestProblemSetD, SolutionD, TestD
+from proto.contest_problem_pb2 import ContestProblem
+import proto.patched_solutions_pb2 as ps_pb2
+
+
+# Read-only ContestProblemD backed by its proto. Repeated fields are decoded
+# the first time they are accessed, so fields that are never touched, e.g.
+# generated_tests, are never copied out of the proto
+class ContestProblemView(DomainProtocol[ContestProblem]):
+    DEFAULT_TIME_LIMIT_SEC: ClassVar[
+        int] = ContestProblemD.DEFAULT_TIME_LIMIT_SEC
+
+    def __init__(self, proto: ContestProblem):
+        self._proto = proto
+
+    @classmethod
+    def from_proto(cls, proto: ContestProblem) -> ContestProblemView:
+        return cls(proto)
+
+    def to_proto(self) -> ContestProblem:
+        return self._proto
+
+    def to_domain(self) -> ContestProblemD:
+        return ContestProblemD.from_proto(self._proto)
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, ContestProblemView)
+                and self._proto == other._proto)
+
+    def __repr__(self) -> str:
+        return f'ContestProblemView(name={self.name!r})'
+
+    @property
+    def name(self) -> str:
+        return self._proto.name
+
+    @property
+    def description(self) -> str:
+        return self._proto.description
+
+    @property
+    def difficulty(self) -> ContestProblem.Difficulty:
+        return self._proto.difficulty
+
+    @property
+    def time_limit_nsec(self) -> int:
+        return self._proto.time_limit.ToNanoseconds()
+
+    @property
+    def memory_limit_bytes(self) -> int:
+        return self._proto.memory_limit_bytes
+
+    @property
+    def cf_points(self) -> float:
+        return self._proto.cf_points
+
+    @property
+    def cf_rating(self) -> int:
+        return self._proto.cf_rating
+
+    @functools.cached_property
+    def public_tests(self) -> List[TestD]:
+        return [TestD.from_proto(test) for test in self._proto.public_tests]
+
+    @functools.cached_property
+    def private_tests(self) -> List[TestD]:
+        return [TestD.from_proto(test) for test in self._proto.private_tests]
+
+    @functools.cached_property
+    def generated_tests(self) -> List[TestD]:
+        return [TestD.from_proto(test) for test in self._proto.generated_tests]
+
+    @functools.cached_property
+    def solutions(self) -> List[SolutionD]:
+        return [
+            SolutionD.from_proto(solution)
+            for solution in self._proto.solutions
+        ]
+
+    @functools.cached_property
+    def incorrect_solutions(self) -> List[SolutionD]:
+        return [
+            SolutionD.from_proto(solution)
+            for solution in self._proto.incorrect_solutions
+        ]
+
+    tests = ContestProblemD.tests
+    time_limit_sec = ContestProblemD.time_limit_sec
+    proto_id = ContestProblemD.proto_id
+
+    def only_python_solutions(self) -> ContestProblemD:
+        return self.to_domain().only_python_solutions()
+
+
+# For reading problem chunks on hot paths, e.g.
+# CompressedDomainFileDAO(FILTERED_DIR, ContestProblemSetView)
+class ContestProblemSetView(DomainProtocol[ps_pb2.ContestProblemSet]):
+
+    def __init__(self, proto: ps_pb2.ContestProblemSet):
+        self._proto = proto
+
+    @classmethod
+    def from_proto(cls,
+                   proto: ps_pb2.ContestProblemSet) -> ContestProblemSetView:
+        return cls(proto)
+
+    def to_proto(self) -> ps_pb2.ContestProblemSet:
+        return self._proto
+
+    def to_domain(self) -> ContestProblemSetD:
+        return ContestProblemSetD.from_proto(self._proto)
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, ContestProblemSetView)
+                and self._proto == other._proto)
+
+    def __repr__(self) -> str:
+        return f'ContestProblemSetView(problems={len(self._proto.problems)})'
+
+    @functools.cached_property
+    def problems(self) -> List[ContestProblemView]:
+        return [
+            ContestProblemView(problem) for problem in self._proto.problems
+        ]
+
+    to_columns = ContestProblemSetD.to_columns
@@ -0,0 +1,64 @@
+import pickle
+
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problem_views import ContestProblemSetView, ContestProblemView
+from domain.problems_d import ContestProblemD, ContestProblemSetD, SolutionD, TestD
+from proto.contest_problem_pb2 import ContestProblem
+
+
+def _problem(name: str) -> ContestProblemD:
+    return ContestProblemD(
+        name=name,
+        description=f"{name} description",
+        difficulty=ContestProblem.EASY,
+        time_limit_nsec=int(2e9),
+        memory_limit_bytes=256 * 1024 * 1024,
+        public_tests=[TestD(input="1 2\n", output="3\n")],
+        private_tests=[TestD(input="2 2\n", output="4\n")],
+        generated_tests=[TestD(input="3 3\n", output="6\n")],
+        solutions=[
+            SolutionD(solution="print(sum(map(int, input().split())))",
+                      language=ContestProblem.Solution.PYTHON3)
+        ],
+        incorrect_solutions=[
+            SolutionD(solution="print(0)",
+                      language=ContestProblem.Solution.PYTHON3)
+        ],
+        cf_points=0.5,
+        cf_rating=800)
+
+
+def test_view_matches_dataclass():
+    problem = _problem("a")
+    view = ContestProblemView.from_proto(problem.to_proto())
+    assert view.proto_id == problem.proto_id
+    for field in ("name", "description", "difficulty", "time_limit_nsec",
+                  "memory_limit_bytes", "public_tests", "private_tests",
+                  "generated_tests", "solutions", "incorrect_solutions",
+                  "cf_points", "cf_rating", "tests", "time_limit_sec"):
+        assert getattr(view, field) == getattr(problem, field), field
+    assert view.to_domain() == problem
+    assert view.only_python_solutions() == problem.only_python_solutions()
+
+
+def test_view_decodes_repeated_fields_on_access():
+    view = ContestProblemView(_problem("a").to_proto())
+    assert [solution.proto_id for solution in view.incorrect_solutions]
+    assert "incorrect_solutions" in view.__dict__
+    assert "generated_tests" not in view.__dict__
+    assert "public_tests" not in view.__dict__
+
+
+def test_set_view_reads_through_dao(tmp_path):
+    problem_set = ContestProblemSetD(problems=[_problem("a"), _problem("b")])
+    CompressedDomainFileDAO(str(tmp_path),
+                            ContestProblemSetD).write([problem_set])
+    dao = CompressedDomainFileDAO(str(tmp_path), ContestProblemSetView)
+
+    [view_set] = list(dao.read(parallelize=True))
+    assert view_set.to_domain() == problem_set
+    assert view_set.proto_id == problem_set.proto_id
+    assert [view.proto_id for view in view_set.problems
+            ] == [problem.proto_id for problem in problem_set.problems]
+    assert view_set.to_columns() == problem_set.to_columns()
+    assert pickle.loads(pickle.dumps(view_set)) == view_set
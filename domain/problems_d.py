@@ -1,6 +1,8 @@
 from __future__ import annotations
 import dataclasses
-from typing import Dict, List, ClassVar, Any
+import functools
+import hashlib
+from typing import Dict, List, ClassVar, Any, Tuple
 import google.protobuf.duration_pb2 as duration_pb2
 
 from proto.contest_problem_pb2 import ContestProblem
@@ -22,6 +24,19 @@ class ContestProblemSetD(DomainProtocol[ps_pb2.ContestProblemSet]):
         return ps_pb2.ContestProblemSet(
             problems=[problem.to_proto() for problem in self.problems])
 
+    def to_columns(self) -> Dict[str, List[Any]]:
+        return {
+            "problem_id": [problem.proto_id for problem in self.problems],
+            "name": [problem.name for problem in self.problems],
+            "difficulty": [problem.difficulty for problem in self.problems],
+            "time_limit_nsec":
+            [problem.time_limit_nsec for problem in self.problems],
+            "memory_limit_bytes":
+            [problem.memory_limit_bytes for problem in self.problems],
+            "cf_points": [problem.cf_points for problem in self.problems],
+            "cf_rating": [problem.cf_rating for problem in self.problems],
+        }
+
     @classmethod
     def compressed_from_df(cls, df) -> bytes:
         domain = ContestProblemSetD(ContestProblemD.from_df(df))
@@ -45,6 +60,23 @@ class PatchedSolutionSetD(DomainProtocol[ps_pb2.PatchedSolutionSet]):
             solution.to_proto() for solution in self.solutions
         ])
 
+    def to_columns(self) -> Dict[str, List[Any]]:
+        return {
+            "patched_solution_id":
+            [solution.proto_id for solution in self.solutions],
+            "solution_id":
+            [solution.solution_id for solution in self.solutions],
+            "problem_id": [solution.problem_id for solution in self.solutions],
+            "prompt_id": [solution.prompt_id for solution in self.solutions],
+            "model": [solution.model for solution in self.solutions],
+            "patched_solution":
+            [solution.patched_solution for solution in self.solutions],
+        }
+
+    def index_entries(self) -> List[Tuple[str, str, str, int]]:
+        return [(solution.problem_id, solution.solution_id, solution.prompt_id,
+                 solution.model) for solution in self.solutions]
+
 
 @dataclasses.dataclass(frozen=True)
 class TestD(DomainProtocol[ContestProblem.Test]):
@@ -102,6 +134,17 @@ class ContestProblemD(DomainProtocol[ContestProblem]):
     def time_limit_sec(self) -> float:
         return self.time_limit_nsec / 1e9
 
+    @functools.cached_property
+    def proto_id(self) -> str:
+        # Problems were ingested with the 1s default before their time limit
+        # was read, so the id hashes that default to keep existing ids, and
+        # the results keyed on them, valid across re-ingestion
+        proto = ContestProblem()
+        proto.CopyFrom(self.to_proto())
+        proto.time_limit.CopyFrom(duration_pb2.Duration(seconds=1))
+        return hashlib.sha256(
+            proto.SerializeToString(deterministic=True)).hexdigest()
+
     @classmethod
     def from_proto(cls, proto: ContestProblem) -> ContestProblemD:
         return ContestProblemD(
@@ -131,13 +174,16 @@ class ContestProblemD(DomainProtocol[ContestProblem]):
 
     @classmethod
     def from_df_row(cls, row_dict: Dict[str, Any]) -> ContestProblemD:
-        seconds = int(row_dict.get("time_limit.seconds", 1))
+        # CodeContests leaves time_limit null for some problems
+        time_limit = row_dict.get("time_limit") or {"seconds": 1}
+        time_limit_nsec = (int(time_limit.get("seconds") or 0) * 10**9 +
+                           int(time_limit.get("nanos") or 0))
         return ContestProblemD(
             name=row_dict["name"],
             description=row_dict["description"],
             difficulty=ContestProblem.Difficulty.Name(
                 int(row_dict["difficulty"] or 0)),
-            time_limit_nsec=int(seconds * 1e9),
+            time_limit_nsec=time_limit_nsec,
             memory_limit_bytes=row_dict["memory_limit_bytes"],
             public_tests=[
                 TestD(input, output)
@@ -173,8 +219,9 @@ class ContestProblemD(DomainProtocol[ContestProblem]):
             name=self.name,
             description=self.description,
             difficulty=self.difficulty,
-            time_limit=duration_pb2.Duration(seconds=int(self.time_limit_nsec /
-                                                         1e9)),
+            time_limit=duration_pb2.Duration(
+                seconds=self.time_limit_nsec // 10**9,
+                nanos=self.time_limit_nsec % 10**9),
             memory_limit_bytes=self.memory_limit_bytes,
             public_tests=[test.to_proto() for test in self.public_tests],
             private_tests=[test.to_proto() for test in self.private_tests],
@@ -186,6 +233,43 @@ class ContestProblemD(DomainProtocol[ContestProblem]):
             cf_points=self.cf_points,
             cf_rating=self.cf_rating)
 
+    @staticmethod
+    def _python_solutions(solutions: Dict[str, list]) -> Dict[str, list]:
+        python = ContestProblem.Solution.PYTHON3
+        kept = [
+            i for i, language in enumerate(solutions["language"])
+            if language == python
+        ]
+        return {
+            "solution": [solutions["solution"][i] for i in kept],
+            "language": [python] * len(kept)
+        }
+
+    # One list per CodeContests column, as from RecordBatch.to_pydict. Rows
+    # without both correct and incorrect Python solutions never have their
+    # tests converted
+    @classmethod
+    def from_columns(cls, columns: Dict[str,
+                                        List[Any]]) -> List[ContestProblemD]:
+        problems = []
+        for i in range(len(columns["name"])):
+            solutions = cls._python_solutions(columns["solutions"][i])
+            incorrect = cls._python_solutions(
+                columns["incorrect_solutions"][i])
+            if not (solutions["solution"] and incorrect["solution"]):
+                continue
+            row_dict = {name: values[i] for name, values in columns.items()}
+            problems.append(
+                cls.from_df_row({
+                    **row_dict, "solutions": solutions,
+                    "incorrect_solutions": incorrect
+                }))
+        return problems
+
+    @classmethod
+    def from_df(cls, df) -> List[ContestProblemD]:
+        return cls.from_columns(df.to_dict("list"))
+
     def only_python_solutions(self) -> ContestProblemD:
         sol_filter = lambda sol: sol.language == ContestProblem.Solution.Language.PYTHON3
         return dataclasses.replace(self,
@@ -195,19 +279,6 @@ class ContestProblemD(DomainProtocol[ContestProblem]):
                                        filter(sol_filter,
                                               self.incorrect_solutions)))
 
-    @classmethod
-    def from_df(cls, df) -> List[ContestProblemD]:
-        problem_ds = [
-            cls.from_df_row(row_dict) for _, row_dict in df.iterrows()
-        ]
-        only_python_ds = [
-            problem.only_python_solutions() for problem in problem_ds
-        ]
-        return [
-            problem for problem in only_python_ds
-            if problem.solutions and problem.incorrect_solutions
-        ]
-
 
 @dataclasses.dataclass(frozen=True)
 class TestResultSetD(DomainProtocol[ps_pb2.TestResultSet]):
@@ -231,6 +302,24 @@ class TestResultSetD(DomainProtocol[ps_pb2.TestResultSet]):
             test_result.to_proto() for test_result in self.test_results
         ])
 
+    def to_columns(self) -> Dict[str, List[Any]]:
+        columns: Dict[str, List[Any]] = {
+            "result_id": [result.proto_id for result in self.test_results]
+        }
+        for field in dataclasses.fields(TestResultD):
+            columns[field.name] = [
+                getattr(result, field.name) for result in self.test_results
+            ]
+        columns["is_correct"] = [
+            result.is_correct for result in self.test_results
+        ]
+        return columns
+
+    def index_entries(self) -> List[Tuple[str, str, bool, int]]:
+        return [(test_result.solution_id, test_result.test_id,
+                 test_result.skipped, test_result.wall_time_nsec)
+                for test_result in self.test_results]
+
 
 @dataclasses.dataclass(frozen=True)
 class TestResultD(DomainProtocol[ps_pb2.TestResult]):
@@ -240,10 +329,17 @@ class TestResultD(DomainProtocol[ps_pb2.TestResult]):
     solution_output: str
     exception_info: str
     expected_output: str
+    wall_time_nsec: int = 0
+    limit_exceeded: ps_pb2.LimitType = ps_pb2.LIMIT_TYPE_UNSPECIFIED
+    cpu_time_nsec: int = 0
+    peak_rss_bytes: int = 0
+    skipped: bool = False
 
     @property
     def is_correct(self) -> bool:
-        return self.solution_output == self.expected_output
+        return (not self.skipped
+                and self.limit_exceeded == ps_pb2.LIMIT_TYPE_UNSPECIFIED
+                and self.solution_output == self.expected_output)
 
     @classmethod
     def from_proto(cls, proto: ps_pb2.TestResult) -> TestResultD:
@@ -252,7 +348,12 @@ class TestResultD(DomainProtocol[ps_pb2.TestResult]):
                            solution_id=proto.solution_id,
                            solution_output=proto.solution_output,
                            exception_info=proto.exception_info,
-                           expected_output=proto.expected_output)
+                           expected_output=proto.expected_output,
+                           wall_time_nsec=proto.wall_time_nsec,
+                           limit_exceeded=proto.limit_exceeded,
+                           cpu_time_nsec=proto.cpu_time_nsec,
+                           peak_rss_bytes=proto.peak_rss_bytes,
+                           skipped=proto.skipped)
 
     def to_proto(self) -> ps_pb2.TestResult:
         return ps_pb2.TestResult(test_id=self.test_id,
@@ -260,7 +361,12 @@ class TestResultD(DomainProtocol[ps_pb2.TestResult]):
                                  solution_id=self.solution_id,
                                  solution_output=self.solution_output,
                                  exception_info=self.exception_info,
-                                 expected_output=self.expected_output)
+                                 expected_output=self.expected_output,
+                                 wall_time_nsec=self.wall_time_nsec,
+                                 limit_exceeded=self.limit_exceeded,
+                                 cpu_time_nsec=self.cpu_time_nsec,
+                                 peak_rss_bytes=self.peak_rss_bytes,
+                                 skipped=self.skipped)
 
 
 @dataclasses.dataclass(frozen=True)
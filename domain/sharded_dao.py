@@ -0,0 +1,330 @@
+from __future__ import annotations
+import bisect
+import dataclasses
+import enum
+import json
+import logging
+import os
+import struct
+from typing import BinaryIO, Callable, Dict, Generic, Iterable, Iterator, List, Tuple, Type, TypeVar
+
+import cramjam
+
+from domain.domain_dao import CompressedDomainFileDAO, DomainT
+from domain.domain_protocol import DomainProtocol
+from domain.problems_d import ContestProblemD, ContestProblemSetD, PatchedSolutionD, PatchedSolutionSetD, TestResultD, TestResultSetD
+
+ItemT = TypeVar('ItemT', bound=DomainProtocol)
+
+SHARD_VERSION = 1
+DEFAULT_BLOCK_BYTES = 256 * 1024
+DEFAULT_RECORDS_PER_SHARD = 100_000
+
+_MAGIC = b'DSHD'
+_LENGTH = struct.Struct('<I')
+# Footer length and magic, read from the end of the shard
+_TRAILER = struct.Struct('<Q4s')
+
+
+class BlockCodec(enum.Enum):
+    ZSTD = 'zstd'
+    LZ4 = 'lz4'
+
+    def compress(self, data: bytes) -> bytes:
+        if self is BlockCodec.ZSTD:
+            return bytes(cramjam.zstd.compress(data))
+        return bytes(cramjam.lz4.compress_block(data))
+
+    def decompress(self, data: bytes) -> bytes:
+        if self is BlockCodec.ZSTD:
+            return bytes(cramjam.zstd.decompress(data))
+        return bytes(cramjam.lz4.decompress_block(data))
+
+
+@dataclasses.dataclass(frozen=True)
+class BlockEntry:
+    offset: int
+    length: int
+    first_record: int
+    n_records: int
+
+
+@dataclasses.dataclass(frozen=True)
+class ShardFooter:
+    codec: BlockCodec
+    blocks: List[BlockEntry]
+
+    @property
+    def n_records(self) -> int:
+        if not self.blocks:
+            return 0
+        return self.blocks[-1].first_record + self.blocks[-1].n_records
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            'version':
+            SHARD_VERSION,
+            'codec':
+            self.codec.value,
+            'blocks': [[block.offset, block.length, block.n_records]
+                       for block in self.blocks]
+        }).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> ShardFooter:
+        footer = json.loads(data)
+        if footer['version'] != SHARD_VERSION:
+            raise ValueError(f'Unsupported shard version: {footer["version"]}')
+        blocks = []
+        first_record = 0
+        for offset, length, n_records in footer['blocks']:
+            blocks.append(BlockEntry(offset, length, first_record, n_records))
+            first_record += n_records
+        return cls(BlockCodec(footer['codec']), blocks)
+
+
+# Packs length-prefixed records into blocks of about block_bytes, each
+# compressed on its own
+class _ShardWriter:
+
+    def __init__(self, file: BinaryIO, codec: BlockCodec, block_bytes: int):
+        self._file = file
+        self._codec = codec
+        self._block_bytes = block_bytes
+        self._block: List[bytes] = []
+        self._block_size = 0
+        self._blocks: List[BlockEntry] = []
+        self._n_records = 0
+        self._file.write(_MAGIC)
+
+    @property
+    def n_records(self) -> int:
+        return self._n_records
+
+    def append(self, record: bytes):
+        self._block.append(_LENGTH.pack(len(record)) + record)
+        self._block_size += _LENGTH.size + len(record)
+        self._n_records += 1
+        if self._block_size >= self._block_bytes:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        data = self._codec.compress(b''.join(self._block))
+        self._blocks.append(
+            BlockEntry(self._file.tell(), len(data),
+                       self._n_records - len(self._block), len(self._block)))
+        self._file.write(data)
+        self._block = []
+        self._block_size = 0
+
+    def finish(self):
+        self._flush_block()
+        footer = ShardFooter(self._codec, self._blocks).to_bytes()
+        self._file.write(footer)
+        self._file.write(_TRAILER.pack(len(footer), _MAGIC))
+
+
+# Stores individual records, e.g. ContestProblemD rather than whole
+# ContestProblemSetD chunks. Each shard is a run of separately compressed
+# blocks with a footer indexing them, so reading a range of records only
+# decompresses the blocks holding them. Records are addressed by their offset
+# across all shards in write order
+@dataclasses.dataclass(frozen=True)
+class ShardedDomainDAO(Generic[ItemT]):
+    _dir_path: str
+    _item_cls: Type[ItemT]
+    _codec: BlockCodec = BlockCodec.ZSTD
+    _block_bytes: int = DEFAULT_BLOCK_BYTES
+    _records_per_shard: int = DEFAULT_RECORDS_PER_SHARD
+    # Shards are immutable once renamed into place, so footers are cached
+    _footers: Dict[str, ShardFooter] = dataclasses.field(default_factory=dict,
+                                                         init=False,
+                                                         repr=False,
+                                                         compare=False)
+
+    def __post_init__(self):
+        os.makedirs(self._dir_path, exist_ok=True)
+
+    @staticmethod
+    def _inc_from_path(file_path: str) -> int:
+        return int(file_path.split('_')[-1].split('.')[0])
+
+    @property
+    def sorted_file_paths(self) -> List[str]:
+        return sorted((f'{self._dir_path}/{file}'
+                       for file in os.listdir(self._dir_path)
+                       if file.endswith('.dshard')),
+                      key=self._inc_from_path)
+
+    def _footer(self, file_path: str) -> ShardFooter:
+        if file_path not in self._footers:
+            with open(file_path, 'rb') as file:
+                file.seek(-_TRAILER.size, os.SEEK_END)
+                footer_length, magic = _TRAILER.unpack(file.read(
+                    _TRAILER.size))
+                if magic != _MAGIC:
+                    raise ValueError(f'Not a shard file: {file_path}')
+                file.seek(-_TRAILER.size - footer_length, os.SEEK_END)
+                self._footers[file_path] = ShardFooter.from_bytes(
+                    file.read(footer_length))
+        return self._footers[file_path]
+
+    # Offset of each shard's first record, followed by the total
+    def _shard_starts(self) -> Tuple[List[str], List[int]]:
+        file_paths = self.sorted_file_paths
+        starts = []
+        n_records = 0
+        for file_path in file_paths:
+            starts.append(n_records)
+            n_records += self._footer(file_path).n_records
+        return file_paths, starts + [n_records]
+
+    def __len__(self) -> int:
+        return self._shard_starts()[1][-1]
+
+    # Records before start are skipped by their length prefix
+    def _parse_block(self, data: bytes, start: int,
+                     stop: int) -> Iterator[ItemT]:
+        offset = 0
+        for record_offset in range(stop):
+            (length, ) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            if record_offset >= start:
+                yield self._item_cls.from_proto(
+                    self._item_cls.message_cls().FromString(
+                        data[offset:offset + length]))
+            offset += length
+
+    def _read_shard_range(self, file_path: str, start: int,
+                          stop: int) -> Iterator[ItemT]:
+        footer = self._footer(file_path)
+        first_records = [block.first_record for block in footer.blocks]
+        first_block = max(bisect.bisect_right(first_records, start) - 1, 0)
+        with open(file_path, 'rb') as file:
+            for block in footer.blocks[first_block:]:
+                if block.first_record >= stop:
+                    break
+                file.seek(block.offset)
+                yield from self._parse_block(
+                    footer.codec.decompress(file.read(block.length)),
+                    max(start - block.first_record, 0),
+                    min(stop - block.first_record, block.n_records))
+
+    def read_range(self, start: int, stop: int) -> Iterator[ItemT]:
+        file_paths, starts = self._shard_starts()
+        stop = min(stop, starts[-1])
+        shard = max(bisect.bisect_right(starts, start) - 1, 0)
+        while start < stop and shard < len(file_paths):
+            shard_stop = min(stop, starts[shard + 1])
+            yield from self._read_shard_range(file_paths[shard],
+                                              start - starts[shard],
+                                              shard_stop - starts[shard])
+            start = shard_stop
+            shard += 1
+
+    def get(self, offset: int) -> ItemT:
+        for record in self.read_range(offset, offset + 1):
+            return record
+        raise IndexError(f'Record offset out of range: {offset}')
+
+    def read(self) -> Iterator[ItemT]:
+        for file_path in self.sorted_file_paths:
+            yield from self._read_shard_range(
+                file_path, 0,
+                self._footer(file_path).n_records)
+
+    def clear_cache(self):
+        for file in os.listdir(self._dir_path):
+            os.remove(f'{self._dir_path}/{file}')
+        self._footers.clear()
+
+    # Writes up to records_per_shard items, renaming the shard into place if
+    # any were written
+    def _write_shard(self, file_path: str, items: Iterator[ItemT]) -> int:
+        tmp_path = f'{file_path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                writer = _ShardWriter(file, self._codec, self._block_bytes)
+                for item in items:
+                    writer.append(item.to_proto().SerializeToString())
+                    if writer.n_records >= self._records_per_shard:
+                        break
+                writer.finish()
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        if writer.n_records:
+            os.replace(tmp_path, file_path)
+        else:
+            os.remove(tmp_path)
+        return writer.n_records
+
+    def write(self, items: Iterable[ItemT]):
+        curr_shard = max(map(self._inc_from_path, self.sorted_file_paths),
+                         default=0)
+        items = iter(items)
+        while True:
+            curr_shard += 1
+            n_records = self._write_shard(
+                f'{self._dir_path}/shard_{curr_shard}.dshard', items)
+            if n_records < self._records_per_shard:
+                return
+
+
+def convert_chunks(source: CompressedDomainFileDAO[DomainT],
+                   dest: ShardedDomainDAO[ItemT],
+                   to_items: Callable[[DomainT], Iterable[ItemT]]) -> int:
+    if dest.sorted_file_paths:
+        raise ValueError(f'Destination is not empty: {dest._dir_path}')
+
+    n_records = 0
+
+    def items() -> Iterator[ItemT]:
+        nonlocal n_records
+        for chunk in source.read(parallelize=True):
+            for item in to_items(chunk):
+                n_records += 1
+                yield item
+
+    dest.write(items())
+    logging.info(f"Converted {n_records} records from {source._dir_path} "
+                 f"to {dest._dir_path}")
+    return n_records
+
+
+@dataclasses.dataclass(frozen=True)
+class ChunkLayout(Generic[DomainT, ItemT]):
+    set_cls: Type[DomainT]
+    item_cls: Type[ItemT]
+    to_items: Callable[[DomainT], Iterable[ItemT]]
+
+
+# Chunk layouts of the data/* directories, keyed by directory name
+DATA_DIR_LAYOUTS: Dict[str, ChunkLayout] = {
+    'filtered_code_contest_data':
+    ChunkLayout(ContestProblemSetD, ContestProblemD,
+                lambda chunk: chunk.problems),
+    'patched_solutions':
+    ChunkLayout(PatchedSolutionSetD, PatchedSolutionD,
+                lambda chunk: chunk.solutions),
+    'eval_results':
+    ChunkLayout(TestResultSetD, TestResultD, lambda chunk: chunk.test_results),
+    'patched_eval_results':
+    ChunkLayout(TestResultSetD, TestResultD, lambda chunk: chunk.test_results),
+}
+
+
+def convert_data_dir(src_dir: str,
+                     dest_dir: str,
+                     codec: BlockCodec = BlockCodec.ZSTD) -> int:
+    dir_name = os.path.basename(os.path.normpath(src_dir))
+    if dir_name not in DATA_DIR_LAYOUTS:
+        raise ValueError(f'Unknown data directory: {src_dir}')
+    layout = DATA_DIR_LAYOUTS[dir_name]
+    return convert_chunks(CompressedDomainFileDAO(src_dir, layout.set_cls),
+                          ShardedDomainDAO(dest_dir, layout.item_cls, codec),
+                          layout.to_items)
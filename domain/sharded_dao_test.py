@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import TestResultD, TestResultSetD
+from domain.sharded_dao import BlockCodec, ShardedDomainDAO, convert_chunks
+from domain.testing import make_result
+
+
+def _results(start: int, stop: int) -> list:
+    return [
+        make_result(solution_id=f"solution_{i}",
+                    test_id=f"test_{i}",
+                    solution_output="output " * i,
+                    wall_time_nsec=i) for i in range(start, stop)
+    ]
+
+
+@pytest.mark.parametrize("codec", list(BlockCodec))
+def test_write_and_read_across_shards(tmp_path, codec):
+    dao = ShardedDomainDAO(str(tmp_path),
+                           TestResultD,
+                           codec,
+                           _block_bytes=256,
+                           _records_per_shard=40)
+    results = _results(0, 100)
+    dao.write(results[:70])
+    dao.write(results[70:])
+    assert sorted(os.listdir(tmp_path)) == [
+        "shard_1.dshard", "shard_2.dshard", "shard_3.dshard"
+    ]
+
+    reopened = ShardedDomainDAO(str(tmp_path), TestResultD, codec)
+    assert len(reopened) == 100
+    assert list(reopened.read()) == results
+    assert reopened.get(55) == results[55]
+    assert list(reopened.read_range(35, 75)) == results[35:75]
+    assert list(reopened.read_range(95, 200)) == results[95:]
+    with pytest.raises(IndexError):
+        reopened.get(100)
+
+
+def test_point_lookup_only_decompresses_its_block(tmp_path, monkeypatch):
+    dao = ShardedDomainDAO(str(tmp_path), TestResultD, _block_bytes=256)
+    results = _results(0, 100)
+    dao.write(results)
+    assert len(dao._footer(dao.sorted_file_paths[0]).blocks) > 10
+
+    decompressed = []
+    decompress = BlockCodec.decompress
+
+    def counting_decompress(codec, data):
+        decompressed.append(len(data))
+        return decompress(codec, data)
+
+    monkeypatch.setattr(BlockCodec, "decompress", counting_decompress)
+    assert dao.get(63) == results[63]
+    assert len(decompressed) == 1
+
+
+def test_convert_chunks_flattens_sets_in_order(tmp_path):
+    os.makedirs(tmp_path / "chunks")
+    source = CompressedDomainFileDAO(str(tmp_path / "chunks"), TestResultSetD)
+    results = _results(0, 30)
+    source.write([
+        TestResultSetD(test_results=results[i:i + 7]) for i in range(0, 30, 7)
+    ])
+    dest = ShardedDomainDAO(str(tmp_path / "shards"), TestResultD)
+    assert convert_chunks(source, dest, lambda chunk: chunk.test_results) == 30
+    assert list(dest.read()) == results
+    with pytest.raises(ValueError):
+        convert_chunks(source, dest, lambda chunk: chunk.test_results)
+
+
+def test_interrupted_write_leaves_no_shard(tmp_path):
+    dao = ShardedDomainDAO(str(tmp_path), TestResultD)
+
+    def failing_items():
+        yield from _results(0, 5)
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        dao.write(failing_items())
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from domain.problems_d import PatchedSolutionD, TestResultD
+import proto.patched_solutions_pb2 as ps_pb2
+
+# Factories for the domain objects the tests build, filling in the fields a
+# test does not care about
+
+
+def make_patched_solution(source: str,
+                          problem_id: str = "problem",
+                          solution_id: Optional[str] = None,
+                          prompt_id: str = "prompt") -> PatchedSolutionD:
+    return PatchedSolutionD(solution_id=solution_id or source,
+                            problem_id=problem_id,
+                            prompt_id=prompt_id,
+                            model=ps_pb2.MODEL_TYPE_GPT_4_TURBO,
+                            patched_solution=source,
+                            patched_response={})
+
+
+def make_result(solution_id: str = "solution",
+                test_id: str = "test",
+                solution_output: str = "",
+                expected_output: str = "",
+                **fields) -> TestResultD:
+    return TestResultD(test_id=test_id,
+                       problem_id="problem",
+                       solution_id=solution_id,
+                       solution_output=solution_output,
+                       exception_info="",
+                       expected_output=expected_output,
+                       **fields)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+import os
+from typing import BinaryIO, Callable, Generic, Iterable, List, Optional, Type, TypeVar
+import concurrent.futures as futures
+import logging
+import struct
+
+from domain.domain_dao import CompressedDomainFileDAO, DomainT
+from domain.domain_protocol import DomainProtocol
+
+ItemT = TypeVar('ItemT', bound=DomainProtocol)
+
+_LENGTH = struct.Struct('<I')
+
+
+# Items are appended to a log segment as soon as they complete, and every
+# chunk_size items the segment is compacted into a chunk on a background
+# thread. Segments left behind by a crash are compacted on recovery, so at most
+# a torn final record is lost
+class ChunkWriteAheadLog(Generic[ItemT, DomainT]):
+
+    def __init__(self,
+                 chunk_dao: CompressedDomainFileDAO[DomainT],
+                 item_cls: Type[ItemT],
+                 to_chunk: Callable[[List[ItemT]], DomainT],
+                 chunk_size: int = 1000,
+                 fsync: bool = False):
+        self._chunk_dao = chunk_dao
+        self._item_cls = item_cls
+        self._to_chunk = to_chunk
+        self._chunk_size = chunk_size
+        self._fsync = fsync
+        self._compactor = futures.ThreadPoolExecutor(max_workers=1)
+        self._compactions: List[futures.Future] = []
+        self._recovered = False
+        self._segment_seq = 0
+        self._segment: Optional[BinaryIO] = None
+        self._segment_items: List[ItemT] = []
+
+    def __enter__(self) -> ChunkWriteAheadLog[ItemT, DomainT]:
+        if not self._recovered:
+            self.recover()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def _dir_path(self) -> str:
+        return self._chunk_dao._dir_path
+
+    def _segment_path(self, seq: int) -> str:
+        return f'{self._dir_path}/wal_{seq}.log'
+
+    @staticmethod
+    def _seq_from_path(file_path: str) -> int:
+        return int(file_path.split('_')[-1].split('.')[0])
+
+    def _segment_paths(self) -> List[str]:
+        return sorted((f'{self._dir_path}/{file}'
+                       for file in os.listdir(self._dir_path)
+                       if file.startswith('wal_') and file.endswith('.log')),
+                      key=self._seq_from_path)
+
+    def _read_segment(self, segment_path: str) -> List[ItemT]:
+        items = []
+        with open(segment_path, 'rb') as file:
+            data = file.read()
+        offset = 0
+        while offset + _LENGTH.size <= len(data):
+            (length, ) = _LENGTH.unpack_from(data, offset)
+            start = offset + _LENGTH.size
+            record = data[start:start + length]
+            if len(record) < length:
+                break
+            items.append(
+                self._item_cls.from_proto(
+                    self._item_cls.message_cls().FromString(record)))
+            offset = start + length
+        if offset < len(data):
+            logging.warning(f"Dropped torn record at the end of "
+                            f"{segment_path}")
+        return items
+
+    # Compacts the segments of a crashed run, so it must precede resuming from
+    # the chunks
+    def recover(self):
+        self._recovered = True
+        segment_paths = self._segment_paths()
+        if not segment_paths:
+            return
+        last_entries = None
+        for _, entries in self._chunk_dao.read_index():
+            last_entries = entries
+        items: List[ItemT] = []
+        for i, segment_path in enumerate(segment_paths):
+            segment_items = self._read_segment(segment_path)
+            # Only the oldest segment can have been mid compaction, in which
+            # case its chunk already landed as the latest one
+            if i == 0 and segment_items and self._to_chunk(
+                    segment_items).index_entries() == last_entries:
+                continue
+            items.extend(segment_items)
+        for start in range(0, len(items), self._chunk_size):
+            self._chunk_dao.write(
+                [self._to_chunk(items[start:start + self._chunk_size])])
+        for segment_path in segment_paths:
+            os.remove(segment_path)
+        logging.warning(f"Recovered {len(items)} items from "
+                        f"{len(segment_paths)} log segments")
+
+    def append(self, items: Iterable[ItemT]):
+        # Recovery removes the segments a crashed run left behind, which new
+        # segments would otherwise append to
+        if not self._recovered:
+            raise ValueError("Log must be recovered before appending")
+        for item in items:
+            if self._segment is None:
+                self._segment_seq += 1
+                self._segment = open(self._segment_path(self._segment_seq),
+                                     'ab')
+            record = item.to_proto().SerializeToString()
+            self._segment.write(_LENGTH.pack(len(record)) + record)
+            self._segment_items.append(item)
+            if len(self._segment_items) >= self._chunk_size:
+                self._rotate()
+        if self._segment is not None:
+            self._segment.flush()
+            if self._fsync:
+                os.fsync(self._segment.fileno())
+
+    def _rotate(self):
+        if self._segment is None:
+            return
+        self._segment.close()
+        self._compactions.append(
+            self._compactor.submit(self._compact,
+                                   self._segment_path(self._segment_seq),
+                                   self._segment_items))
+        self._segment = None
+        self._segment_items = []
+
+    def _compact(self, segment_path: str, items: List[ItemT]):
+        self._chunk_dao.write([self._to_chunk(items)])
+        os.remove(segment_path)
+
+    def close(self):
+        if self._segment_items:
+            self._rotate()
+        elif self._segment is not None:
+            self._segment.close()
+            os.remove(self._segment_path(self._segment_seq))
+            self._segment = None
+        self._compactor.shutdown(wait=True)
+        for compaction in self._compactions:
+            compaction.result()
@@ -0,0 +1,77 @@
+import os
+
+from domain.domain_dao import CompressedDomainFileDAO
+from domain.problems_d import TestResultD, TestResultSetD
+from domain.testing import make_result
+from domain.write_ahead_log import ChunkWriteAheadLog
+
+
+def _result(i: int) -> TestResultD:
+    return make_result(test_id=f"test_{i}",
+                       solution_output=str(i),
+                       expected_output=str(i))
+
+
+def _log(dao: CompressedDomainFileDAO[TestResultSetD],
+         chunk_size: int = 3) -> ChunkWriteAheadLog:
+    return ChunkWriteAheadLog(dao,
+                              TestResultD,
+                              TestResultSetD,
+                              chunk_size=chunk_size)
+
+
+def _chunk_sizes(dao: CompressedDomainFileDAO[TestResultSetD]):
+    return [len(chunk.test_results) for chunk in dao.read()]
+
+
+def test_appends_compact_into_full_chunks(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    with _log(dao) as result_log:
+        for i in range(7):
+            result_log.append([_result(i)])
+    assert _chunk_sizes(dao) == [3, 3, 1]
+    assert [r.test_id for chunk in dao.read()
+            for r in chunk.test_results] == [f"test_{i}" for i in range(7)]
+    assert sorted(os.listdir(tmp_path)) == [
+        f"chunk_{i}.{ext}" for i in range(1, 4) for ext in ("idx", "pb")
+    ]
+
+
+def test_recovers_uncompacted_results_after_crash(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    crashed_log = _log(dao)
+    crashed_log.recover()
+    crashed_log.append([_result(i) for i in range(5)])
+    crashed_log._compactor.shutdown(wait=True)
+    # A torn record from a write interrupted mid append
+    with open(tmp_path / "wal_2.log", "ab") as segment:
+        segment.write(b"\x40\x00\x00\x00partial")
+
+    result_log = _log(dao)
+    # Nothing is recovered until the log is entered
+    assert _chunk_sizes(dao) == [3]
+    with result_log:
+        assert _chunk_sizes(dao) == [3, 2]
+    assert not [file for file in os.listdir(tmp_path) if "wal" in file]
+
+
+def test_recovery_skips_segment_already_compacted(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    results = [_result(i) for i in range(3)]
+    crashed_log = _log(dao, chunk_size=10)
+    crashed_log.recover()
+    crashed_log.append(results)
+    # Crash after the chunk landed but before its segment was removed
+    dao.write([TestResultSetD(results)])
+
+    with _log(dao):
+        pass
+    assert _chunk_sizes(dao) == [3]
+
+
+def test_chunk_writes_leave_no_partial_files(tmp_path):
+    dao = CompressedDomainFileDAO(str(tmp_path), TestResultSetD)
+    (tmp_path / "chunk_1.pb.tmp").write_bytes(b"partial")
+    dao.write([TestResultSetD([_result(0)])])
+    assert _chunk_sizes(dao) == [1]
+    assert "chunk_1.pb" in os.listdir(tmp_path)
@@ -0,0 +1,284 @@
+from __future__ import annotations
+import asyncio
+import dataclasses
+import logging
+import random
+import re
+import time
+from typing import ClassVar, Dict, List, Mapping, Optional, Tuple, Union, cast
+
+import httpx
+import openai
+from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
+
+from domain import metrics
+from llm_handler.openai_handler import OpenAIHandler
+from llm_handler.response_cache import ResponseCache
+import proto.patched_solutions_pb2 as ps_pb2
+
+MessagesT = Union[List[ChatCompletionMessageParam], List[Dict[str, str]]]
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNIT_SEC = {'ms': 1e-3, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+# Rate-limit reset values such as '20ms', '1s' or '6m0s', or plain retry-after
+# seconds
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(
+        float(amount) * _DURATION_UNIT_SEC[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    return int(value) if value and value.isdigit() else None
+
+
+@dataclasses.dataclass(frozen=True)
+class RateBudget:
+    requests_per_min: int
+    tokens_per_min: int
+
+
+# Continuously refilling budget, so callers are admitted at a smooth rate
+# instead of in bursts
+class TokenBucket:
+
+    def __init__(self, per_min: int):
+        self._capacity = float(per_min)
+        self._refill_per_sec = per_min / 60
+        self._level = float(per_min)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(
+            self._capacity,
+            self._level + (now - self._updated) * self._refill_per_sec)
+        self._updated = now
+
+    async def acquire(self, amount: float):
+        amount = min(amount, self._capacity)
+        # Holding the lock while waiting keeps admission first come first
+        # served, so a large request is not starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                wait_sec = self._paused_until - time.monotonic()
+                if wait_sec <= 0 and self._level >= amount:
+                    self._level -= amount
+                    return
+                wait_sec = max(wait_sec,
+                               (amount - self._level) / self._refill_per_sec)
+                await asyncio.sleep(wait_sec)
+
+    def refund(self, amount: float):
+        self._refill()
+        self._level = min(self._capacity, self._level + amount)
+
+    # Lowers the level to the server's view of what is left
+    def sync(self, remaining: Optional[int]):
+        if remaining is not None:
+            self._refill()
+            self._level = min(self._level, remaining)
+
+    def pause(self, delay_sec: float):
+        self._level = 0.0
+        self._updated = time.monotonic()
+        self._paused_until = max(self._paused_until,
+                                 time.monotonic() + delay_sec)
+
+
+# Concurrency limit that grows additively on success and halves on rate
+# limiting
+class AdaptiveLimiter:
+
+    def __init__(self, initial: int, max_limit: int, min_limit: int = 1):
+        self._limit = float(min(initial, max_limit))
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < self.limit
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(self._has_capacity)
+            self._in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+
+    def on_throttle(self):
+        self._limit = max(self._min_limit, self._limit / 2)
+
+
+# Meters requests against per-model request and token budgets and retries 429s
+# after the server's reset time, server errors on an exponential backoff
+class AsyncOpenAIHandler:
+    DEFAULT_BUDGETS: ClassVar[Dict['ps_pb2.ModelType', RateBudget]] = {
+        ps_pb2.MODEL_TYPE_GPT_3_5_TURBO: RateBudget(3500, 160_000),
+        ps_pb2.MODEL_TYPE_GPT_4_TURBO: RateBudget(500, 300_000)
+    }
+    DEFAULT_COMPLETION_TOKENS: ClassVar[int] = 1000
+    _CHARS_PER_TOKEN: ClassVar[int] = 4
+
+    def __init__(self,
+                 client: Optional[openai.AsyncOpenAI] = None,
+                 budgets: Optional[Dict['ps_pb2.ModelType',
+                                        RateBudget]] = None,
+                 max_concurrency: int = 100,
+                 initial_concurrency: int = 16,
+                 max_retries: int = 8,
+                 base_backoff_sec: float = 1.0,
+                 response_cache: Optional[ResponseCache] = None):
+        # Retries are handled here so they respect the shared budgets
+        self._client = (client or openai.AsyncOpenAI(
+            api_key=openai.api_key)).with_options(max_retries=0)
+        self._budgets = budgets or self.DEFAULT_BUDGETS
+        self._response_cache = response_cache
+        self._max_retries = max_retries
+        self._base_backoff_sec = base_backoff_sec
+        self._limiter = AdaptiveLimiter(initial_concurrency, max_concurrency)
+        self._request_buckets: Dict['ps_pb2.ModelType', TokenBucket] = {}
+        self._token_buckets: Dict['ps_pb2.ModelType', TokenBucket] = {}
+
+    @property
+    def concurrency(self) -> int:
+        return self._limiter.limit
+
+    def _buckets(
+            self,
+            model_type: 'ps_pb2.ModelType') -> Tuple[TokenBucket, TokenBucket]:
+        if model_type not in self._request_buckets:
+            if model_type not in self._budgets:
+                raise ValueError(f'No rate budget for model: {model_type}')
+            budget = self._budgets[model_type]
+            self._request_buckets[model_type] = TokenBucket(
+                budget.requests_per_min)
+            self._token_buckets[model_type] = TokenBucket(
+                budget.tokens_per_min)
+        return self._request_buckets[model_type], self._token_buckets[
+            model_type]
+
+    @classmethod
+    def estimate_tokens(cls, messages: List[Dict[str, str]],
+                        max_tokens: Optional[int]) -> int:
+        prompt_chars = sum(
+            len(message.get('content') or '') for message in messages)
+        return (prompt_chars // cls._CHARS_PER_TOKEN +
+                (max_tokens or cls.DEFAULT_COMPLETION_TOKENS))
+
+    def _retry_delay(self, headers: httpx.Headers, attempt: int) -> float:
+        delay = parse_reset_duration(headers.get('retry-after'))
+        if delay is None:
+            resets = [
+                parse_reset_duration(headers.get(name))
+                for name in ('x-ratelimit-reset-requests',
+                             'x-ratelimit-reset-tokens')
+            ]
+            delay = max([reset for reset in resets if reset is not None],
+                        default=None)
+        if delay is None:
+            delay = self._base_backoff_sec * 2**attempt
+        # Jitter spreads the retries out so they don't all land at once
+        return delay * (1 + random.random() / 2)
+
+    async def get_chat_completion(self, messages: MessagesT,
+                                  model_type: 'ps_pb2.ModelType',
+                                  **kwargs) -> str:
+        model = OpenAIHandler.get_model_version(model_type)
+        cache_key = ResponseCache.key(model, messages, **kwargs)
+        # Cache file I/O runs on a thread so it never blocks the event loop
+        if self._response_cache and (cached := await asyncio.to_thread(
+                self._response_cache.get, cache_key)) is not None:
+            return cached
+        request_bucket, token_bucket = self._buckets(model_type)
+        estimated_tokens = self.estimate_tokens(
+            cast(List[Dict[str, str]], messages), kwargs.get('max_tokens'))
+        attempt = 0
+        while True:
+            await request_bucket.acquire(1)
+            await token_bucket.acquire(estimated_tokens)
+            raw_response = None
+            server_error_delay = 0.0
+            async with self._limiter:
+                metrics.set_gauge('llm_concurrency_limit',
+                                  self._limiter.limit,
+                                  model=model)
+                start = time.perf_counter()
+                try:
+                    raw_response = await self._client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=cast(List[ChatCompletionMessageParam],
+                                      messages),
+                        n=1,
+                        **kwargs)
+                except openai.RateLimitError as e:
+                    metrics.count('llm_rate_limited_total', model=model)
+                    if attempt == self._max_retries:
+                        raise
+                    delay = self._retry_delay(e.response.headers, attempt)
+                    logging.warning(
+                        f"Rate limited on {model}, retrying in {delay:.2f}s")
+                    self._limiter.on_throttle()
+                    request_bucket.pause(delay)
+                    token_bucket.pause(delay)
+                    attempt += 1
+                    continue
+                except openai.InternalServerError as e:
+                    metrics.count('llm_server_errors_total', model=model)
+                    if attempt == self._max_retries:
+                        raise
+                    server_error_delay = self._retry_delay(
+                        e.response.headers, attempt)
+            # Server errors are retried on a backoff outside the limiter,
+            # without throttling, as they say nothing of the rate limits
+            if raw_response is None:
+                logging.warning(f"Server error on {model}, retrying in "
+                                f"{server_error_delay:.2f}s")
+                await asyncio.sleep(server_error_delay)
+                attempt += 1
+                continue
+            metrics.observe('llm_request_seconds',
+                            time.perf_counter() - start,
+                            model=model,
+                            endpoint='chat')
+            self._limiter.on_success()
+            headers = raw_response.headers
+            request_bucket.sync(
+                _header_int(headers, 'x-ratelimit-remaining-requests'))
+            token_bucket.sync(
+                _header_int(headers, 'x-ratelimit-remaining-tokens'))
+            response = raw_response.parse()
+            OpenAIHandler.record_usage(model, response.usage)
+            if response.usage:
+                token_bucket.refund(estimated_tokens -
+                                    response.usage.total_tokens)
+            content = OpenAIHandler.completion_content(response)
+            if self._response_cache:
+                await asyncio.to_thread(self._response_cache.put, cache_key,
+                                        content)
+            return content
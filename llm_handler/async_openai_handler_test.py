@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from llm_handler.async_openai_handler import AsyncOpenAIHandler, RateBudget, TokenBucket, parse_reset_duration
+from llm_handler.mock_openai_server import MockOpenAIServer
+import proto.patched_solutions_pb2 as ps_pb2
+
+_MODEL = ps_pb2.MODEL_TYPE_GPT_3_5_TURBO
+_MESSAGES = [{"role": "user", "content": "Hello how are you?"}]
+
+
+def _handler(server: MockOpenAIServer, **kwargs) -> AsyncOpenAIHandler:
+    client = openai.AsyncOpenAI(api_key="test", base_url=server.base_url)
+    return AsyncOpenAIHandler(client=client, **kwargs)
+
+
+async def _gather_completions(handler: AsyncOpenAIHandler, n: int):
+    return await asyncio.gather(*[
+        handler.get_chat_completion(messages=_MESSAGES, model_type=_MODEL)
+        for _ in range(n)
+    ])
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("0.5", 0.5),
+    ("20ms", 0.02),
+    ("6m0s", 360.0),
+    ("1h2m3.5s", 3723.5),
+    ("", None),
+    ("soon", None),
+])
+def test_parse_reset_duration(value: str, expected):
+    assert parse_reset_duration(value) == expected
+
+
+def test_token_bucket_meters_after_burst():
+
+    async def acquire_all():
+        bucket = TokenBucket(per_min=600)
+        start = time.monotonic()
+        for _ in range(605):
+            await bucket.acquire(1)
+        return time.monotonic() - start
+
+    # The full minute's budget is available at once, then 10 per second
+    assert 0.4 < asyncio.run(acquire_all()) < 2
+
+
+def test_handler_retries_rate_limits_and_adapts_concurrency():
+    with MockOpenAIServer(content="ok", latency_sec=0.02,
+                          capacity=4) as server:
+        handler = _handler(server, initial_concurrency=16)
+        completions = asyncio.run(_gather_completions(handler, 40))
+        assert completions == ["ok"] * 40
+        assert server.rate_limited > 0
+        assert server.max_in_flight <= 4
+        assert handler.concurrency < 16
+
+
+def test_handler_gives_up_after_max_retries():
+    with MockOpenAIServer(content="ok", capacity=0) as server:
+        handler = _handler(server, max_retries=2, base_backoff_sec=0.01)
+        with pytest.raises(openai.RateLimitError):
+            asyncio.run(_gather_completions(handler, 1))
+        assert server.requests == 3
+
+
+def test_handler_requires_budget_for_model():
+    with MockOpenAIServer(content="ok") as server:
+        handler = _handler(server, budgets={_MODEL: RateBudget(60, 1000)})
+        with pytest.raises(ValueError):
+            asyncio.run(
+                handler.get_chat_completion(
+                    messages=_MESSAGES,
+                    model_type=ps_pb2.MODEL_TYPE_GPT_4_TURBO))
+
+
+def test_handler_retries_server_errors_without_throttling():
+    with MockOpenAIServer(content="ok", error_rate=0.3, seed=1) as server:
+        handler = _handler(server,
+                           initial_concurrency=4,
+                           base_backoff_sec=0.001)
+        completions = asyncio.run(_gather_completions(handler, 40))
+        assert completions == ["ok"] * 40
+        assert server.errors > 0
+        assert server.requests == 40 + server.errors
+        assert handler.concurrency >= 4
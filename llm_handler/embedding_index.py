@@ -0,0 +1,180 @@
+from __future__ import annotations
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from llm_handler.openai_handler import EmbeddingModelVersion, OpenAIHandler
+
+
+# Append-only float32 matrix memory-mapped from embeddings.f32, with one row
+# per key listed in keys.json
+class EmbeddingStore:
+
+    def __init__(self, dir_path: str):
+        self._dir_path = dir_path
+        os.makedirs(dir_path, exist_ok=True)
+        self.keys: List[str] = []
+        self.dim = 0
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, 'r') as file:
+                meta = json.load(file)
+            self.keys, self.dim = meta['keys'], meta['dim']
+        self._rows: Dict[str, int] = {
+            key: row
+            for row, key in enumerate(self.keys)
+        }
+
+    @property
+    def _matrix_path(self) -> str:
+        return f'{self._dir_path}/embeddings.f32'
+
+    @property
+    def _keys_path(self) -> str:
+        return f'{self._dir_path}/keys.json'
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if not self.keys:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self._matrix_path,
+                         dtype=np.float32,
+                         mode='r',
+                         shape=(len(self.keys), self.dim))
+
+    def vectors(self, keys: List[str]) -> np.ndarray:
+        return np.asarray(self.matrix[[self._rows[key] for key in keys]])
+
+    def add(self, keys: List[str], embeddings: np.ndarray):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(keys) != len(embeddings):
+            raise ValueError(
+                f'Got {len(keys)} keys for {len(embeddings)} embeddings')
+        if not keys:
+            return
+        if any(key in self._rows for key in keys):
+            raise ValueError('Keys are already in the store')
+        if self.dim and embeddings.shape[1] != self.dim:
+            raise ValueError(f'Expected embeddings of dim {self.dim}, '
+                             f'got {embeddings.shape[1]}')
+        self.dim = embeddings.shape[1]
+        # Rows past the last key list are from an interrupted add and are
+        # overwritten, as the key list is only replaced once rows are down
+        with open(self._matrix_path, 'r+b' if self.keys else 'wb') as file:
+            file.seek(len(self.keys) * self.dim * 4)
+            file.write(embeddings.tobytes())
+            file.truncate()
+        for key in keys:
+            self._rows[key] = len(self.keys)
+            self.keys.append(key)
+        with open(f'{self._keys_path}.tmp', 'w') as file:
+            json.dump({'dim': self.dim, 'keys': self.keys}, file)
+        os.replace(f'{self._keys_path}.tmp', self._keys_path)
+
+
+def embed_texts(store: EmbeddingStore,
+                texts: Dict[str, str],
+                model: Optional[EmbeddingModelVersion] = None,
+                batch_size: int = OpenAIHandler.MAX_EMBEDDING_BATCH_SIZE):
+    missing_keys = [key for key in texts if key not in store]
+    logging.info(f"Embedding {len(missing_keys)} of {len(texts)} texts")
+    for start in range(0, len(missing_keys), batch_size):
+        batch_keys = missing_keys[start:start + batch_size]
+        embeddings = OpenAIHandler.get_text_embeddings(
+            [texts[key] for key in batch_keys], model, batch_size)
+        store.add(batch_keys, np.array(embeddings, dtype=np.float32))
+
+
+# Cosine nearest-neighbour search, exact by default. With n_lists > 0 the rows
+# are clustered by k-means and a query only scores the rows in its n_probe
+# nearest clusters
+class SimilarityIndex:
+
+    def __init__(self,
+                 keys: List[str],
+                 matrix: np.ndarray,
+                 n_lists: int = 0,
+                 seed: int = 0):
+        self.keys = keys
+        self._rows = {key: row for row, key in enumerate(keys)}
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._unit = np.asarray(matrix, dtype=np.float32) / np.maximum(
+            norms, 1e-12)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        if n_lists:
+            self._build_lists(min(n_lists, len(keys)), seed)
+
+    @classmethod
+    def from_store(cls, store: EmbeddingStore, **kwargs) -> SimilarityIndex:
+        return cls(list(store.keys), np.asarray(store.matrix), **kwargs)
+
+    def _build_lists(self, n_lists: int, seed: int, iterations: int = 10):
+        rng = np.random.default_rng(seed)
+        centroids = self._unit[rng.choice(len(self._unit),
+                                          n_lists,
+                                          replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(self._unit @ centroids.T, axis=1)
+            for cell in range(n_lists):
+                members = self._unit[assignments == cell]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[cell] = centroid / max(np.linalg.norm(centroid),
+                                                     1e-12)
+        assignments = np.argmax(self._unit @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [
+            np.flatnonzero(assignments == cell) for cell in range(n_lists)
+        ]
+
+    def _top_k(self, scores: np.ndarray,
+               k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, scores.shape[-1])
+        top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        top_scores = np.take_along_axis(scores, top, axis=-1)
+        order = np.argsort(-top_scores, axis=-1)
+        return (np.take_along_axis(top, order, axis=-1),
+                np.take_along_axis(top_scores, order, axis=-1))
+
+    # (rows, scores) of the k nearest rows of each query, best first
+    def search(self,
+               queries: np.ndarray,
+               k: int,
+               n_probe: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        queries = queries / np.maximum(
+            np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        if self._centroids is None:
+            return self._top_k(queries @ self._unit.T, k)
+
+        rows = np.full((len(queries), k), -1)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        cells = self._top_k(queries @ self._centroids.T, n_probe)[0]
+        for i, query in enumerate(queries):
+            candidates = np.concatenate(
+                [self._lists[cell] for cell in cells[i]])
+            if not len(candidates):
+                continue
+            top, top_scores = self._top_k(self._unit[candidates] @ query, k)
+            rows[i, :len(top)] = candidates[top]
+            scores[i, :len(top)] = top_scores
+        return rows, scores
+
+    def similar(self,
+                key: str,
+                k: int,
+                n_probe: int = 1) -> List[Tuple[str, float]]:
+        row = self._rows[key]
+        rows, scores = self.search(self._unit[row], k + 1, n_probe)
+        return [(self.keys[r], float(score))
+                for r, score in zip(rows[0], scores[0])
+                if r != row and r >= 0][:k]
@@ -0,0 +1,85 @@
+import numpy as np
+import openai
+import pytest
+
+from llm_handler.embedding_index import EmbeddingStore, SimilarityIndex, embed_texts
+from llm_handler.mock_openai_server import MockOpenAIServer
+
+
+def _random_matrix(rows: int, dim: int = 16) -> np.ndarray:
+    return np.random.default_rng(0).normal(size=(rows, dim)).astype(np.float32)
+
+
+def test_store_round_trips_and_appends(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    matrix = _random_matrix(5)
+    store.add(["a", "b", "c"], matrix[:3])
+    store.add(["d", "e"], matrix[3:])
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert reopened.keys == ["a", "b", "c", "d", "e"]
+    assert isinstance(reopened.matrix, np.memmap)
+    np.testing.assert_array_equal(reopened.matrix, matrix)
+    np.testing.assert_array_equal(reopened.vectors(["e", "a"]), matrix[[4, 0]])
+    with pytest.raises(ValueError):
+        reopened.add(["a"], matrix[:1])
+
+
+def test_store_overwrites_rows_of_interrupted_add(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    matrix = _random_matrix(3)
+    store.add(["a"], matrix[:1])
+    # Rows written without their keys, as if the add was interrupted
+    with open(tmp_path / "embeddings.f32", "ab") as file:
+        file.write(matrix[1:2].tobytes())
+
+    reopened = EmbeddingStore(str(tmp_path))
+    reopened.add(["c"], matrix[2:])
+    np.testing.assert_array_equal(
+        EmbeddingStore(str(tmp_path)).matrix, matrix[[0, 2]])
+
+
+def test_embed_texts_batches_requests(tmp_path, monkeypatch):
+    texts = {f"problem_{i}": f"description {i}" for i in range(10)}
+    store = EmbeddingStore(str(tmp_path))
+    with MockOpenAIServer() as server:
+        monkeypatch.setattr(openai, "api_key", "test")
+        monkeypatch.setattr(openai, "base_url", f"{server.base_url}/")
+        embed_texts(store, texts, batch_size=4)
+        assert server.requests == 3
+        embed_texts(store, texts, batch_size=4)
+        assert server.requests == 3
+    np.testing.assert_allclose(store.vectors(["problem_7"])[0],
+                               server.embedding("description 7"),
+                               rtol=1e-6)
+
+
+def test_exact_search_matches_brute_force():
+    matrix = _random_matrix(200)
+    index = SimilarityIndex([str(i) for i in range(200)], matrix)
+    queries = _random_matrix(3)
+    rows, scores = index.search(queries, k=5)
+
+    unit = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    unit_queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    expected = np.argsort(-(unit_queries @ unit.T), axis=1)[:, :5]
+    np.testing.assert_array_equal(rows, expected)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_clustered_search_probing_every_list_is_exact():
+    matrix = _random_matrix(200)
+    keys = [str(i) for i in range(200)]
+    exact = SimilarityIndex(keys, matrix)
+    clustered = SimilarityIndex(keys, matrix, n_lists=8)
+    queries = _random_matrix(3)
+    np.testing.assert_array_equal(
+        clustered.search(queries, k=5, n_probe=8)[0],
+        exact.search(queries, k=5)[0])
+    assert len(clustered.search(queries, k=5, n_probe=2)[0][0]) == 5
+
+
+def test_similar_excludes_the_key_itself():
+    matrix = np.array([[1, 0], [0.9, 0.1], [0, 1]], dtype=np.float32)
+    index = SimilarityIndex(["a", "b", "c"], matrix)
+    assert [key for key, _ in index.similar("a", k=2)] == ["b", "c"]
@@ -2,6 +2,8 @@ from __future__ import annotations
 from typing import List, Optional, ClassVar, Protocol
 import enum
 
+import proto.patched_solutions_pb2 as ps_pb2
+
 
 class DefaultEnumMeta(enum.EnumMeta):
 
@@ -18,9 +20,17 @@ class LLMHandler(Protocol):
                             **kwargs) -> List[str]:
         ...
 
-    def get_chat_completion(self, messages: List, model: enum.Enum,
-                            samples: int, **kwargs) -> List[str]:
+    def get_chat_completion(self, messages: List,
+                            model_type: 'ps_pb2.ModelType', **kwargs) -> str:
         ...
 
     def get_text_embedding(self, input: str, model: enum.Enum) -> List[float]:
         ...
+
+
+class AsyncLLMHandler(Protocol):
+
+    async def get_chat_completion(self, messages: List,
+                                  model_type: 'ps_pb2.ModelType',
+                                  **kwargs) -> str:
+        ...
@@ -1,8 +1,11 @@
+import itertools
 import os
+import threading
 from typing import List, Optional, ClassVar, Protocol
 import enum
 
-import llm_handler_interface as llm_handler_interface
+import llm_handler.llm_handler_interface as llm_handler_interface
+import proto.patched_solutions_pb2 as ps_pb2
 
 
 class MockLLMHandler(llm_handler_interface.LLMHandler):
@@ -17,6 +20,10 @@ class MockLLMHandler(llm_handler_interface.LLMHandler):
                  text_embedding: Optional[List[float]] = None):
         self._text_completion = text_completion
         self._chat_completion = chat_completion
+        # Completions are returned in turn, from any number of threads
+        self._chat_completions = itertools.cycle(chat_completion or [])
+        self._lock = threading.Lock()
+        self.chat_requests = 0
         self._text_embedding = text_embedding
 
     def get_text_completion(self,
@@ -29,14 +36,13 @@ class MockLLMHandler(llm_handler_interface.LLMHandler):
             raise ValueError(f'_text_completion not set')
         return self._text_completion
 
-    def get_chat_completion(self,
-                            messages: List,
-                            model: Optional[enum.Enum] = None,
-                            samples: int = 1,
-                            **kwargs) -> List[str]:
+    def get_chat_completion(self, messages: List,
+                            model_type: 'ps_pb2.ModelType', **kwargs) -> str:
         if not self._chat_completion:
             raise ValueError(f'_chat_completion not set')
-        return self._chat_completion
+        with self._lock:
+            self.chat_requests += 1
+            return next(self._chat_completions)
 
     def get_text_embedding(
         self,
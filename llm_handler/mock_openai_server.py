@@ -0,0 +1,184 @@
+from __future__ import annotations
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+# Statuses the server replies to admitted requests with
+_OK, _RATE_LIMITED, _SERVER_ERROR = 200, 429, 500
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    # Load tests open a connection per client thread at once
+    request_queue_size = 1024
+
+
+# OpenAI compatible endpoint for tests and offline load tests. Requests
+# arriving while capacity requests are in flight get a 429, of the rest
+# rate_limit_rate get a 429 and error_rate a 500. Latencies and failures are
+# drawn from a generator seeded with seed, so a load test sees the same
+# sequence every run
+class MockOpenAIServer:
+
+    def __init__(self,
+                 content: str = "",
+                 latency_sec: float = 0.0,
+                 capacity: Optional[int] = None,
+                 retry_after_sec: float = 0.05,
+                 embedding_dim: int = 8,
+                 latency_sigma: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = 0):
+        self.content = content
+        self.embedding_dim = embedding_dim
+        self.latency_sec = latency_sec
+        self.latency_sigma = latency_sigma
+        self.capacity = capacity
+        self.retry_after_sec = retry_after_sec
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), self._handler_cls())
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def __enter__(self) -> MockOpenAIServer:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # Status to reply to the next request with, after how long
+    def _admit(self) -> Tuple[int, float]:
+        with self._lock:
+            self.requests += 1
+            outcome = self._rng.random()
+            latency_sec = self.latency_sec
+            if self.latency_sigma:
+                latency_sec *= self._rng.lognormvariate(0, self.latency_sigma)
+            if (self.capacity is not None and self._in_flight
+                    >= self.capacity) or outcome < self.rate_limit_rate:
+                self.rate_limited += 1
+                return _RATE_LIMITED, 0.0
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            if outcome < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                return _SERVER_ERROR, latency_sec
+            return _OK, latency_sec
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _completion(self, model: str) -> dict:
+        message = {'role': 'assistant', 'content': self.content}
+        return {
+            'id': f'chatcmpl-{self.requests}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': message
+            }],
+            'usage': {
+                'prompt_tokens': 10,
+                'completion_tokens': 10,
+                'total_tokens': 20
+            }
+        }
+
+    def embedding(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        return [(byte - 128) / 128 for byte in digest[:self.embedding_dim]]
+
+    def _embeddings(self, model: str, inputs: Union[str, List[str]]) -> dict:
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = [{
+            'object': 'embedding',
+            'index': i,
+            'embedding': self.embedding(text)
+        } for i, text in enumerate(inputs)]
+        usage = {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)}
+        return {'object': 'list', 'model': model, 'data': data, 'usage': usage}
+
+    def _handler_cls(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            # Keeps connections alive between a client's requests
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: dict, headers: dict):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                request = json.loads(
+                    self.rfile.read(int(self.headers['Content-Length'])))
+                status, latency_sec = server._admit()
+                if status == _RATE_LIMITED:
+                    self._reply(
+                        _RATE_LIMITED, {
+                            'error': {
+                                'message': 'Rate limit reached',
+                                'type': 'requests',
+                                'code': 'rate_limit_exceeded'
+                            }
+                        }, {'retry-after': str(server.retry_after_sec)})
+                    return
+                try:
+                    time.sleep(latency_sec)
+                    if status == _SERVER_ERROR:
+                        self._reply(
+                            _SERVER_ERROR, {
+                                'error': {
+                                    'message': 'The server had an error',
+                                    'type': 'server_error',
+                                    'code': None
+                                }
+                            }, {})
+                        return
+                    if self.path.endswith('/embeddings'):
+                        body = server._embeddings(request['model'],
+                                                  request['input'])
+                    else:
+                        body = server._completion(request['model'])
+                    self._reply(
+                        _OK, body, {
+                            'x-ratelimit-remaining-requests': '1000',
+                            'x-ratelimit-remaining-tokens': '100000'
+                        })
+                finally:
+                    server._release()
+
+        return Handler
@@ -2,13 +2,16 @@ from __future__ import annotations
 import openai
 from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 from openai.types.chat.chat_completion import ChatCompletion
+from openai.types.completion_usage import CompletionUsage
 import os
 from typing import List, Optional, ClassVar, Dict, Union, cast
 import backoff
 import enum
 import numpy as np
 
+from domain import metrics
 import llm_handler.llm_handler_interface as llm_handler_interface
+from llm_handler.response_cache import ResponseCache
 import proto.patched_solutions_pb2 as ps_pb2
 
 
@@ -33,6 +36,11 @@ class OpenAIHandler(llm_handler_interface.LLMHandler):
 
     _ENV_KEY_NAME: ClassVar[str] = 'OPENAI_API_KEY'
 
+    _response_cache: ClassVar[Optional[ResponseCache]] = None
+    _client: ClassVar[Optional[openai.OpenAI]] = None
+
+    MAX_EMBEDDING_BATCH_SIZE: ClassVar[int] = 2048
+
     @classmethod
     def _read_key_from_file(cls, file_path: str) -> str:
         with open(file_path, "r") as f:
@@ -52,6 +60,16 @@ class OpenAIHandler(llm_handler_interface.LLMHandler):
             raise ValueError(f'{cls._ENV_KEY_NAME} not found')
         openai.api_key = openai_api_key
 
+    @classmethod
+    def set_response_cache(cls, response_cache: Optional[ResponseCache]):
+        cls._response_cache = response_cache
+
+    # Sends requests through client, e.g. one for a local stand-in server,
+    # rather than the module level openai client
+    @classmethod
+    def set_client(cls, client: Optional[openai.OpenAI]):
+        cls._client = client
+
     @classmethod
     def get_model_version(cls, model_type: 'ps_pb2.ModelType') -> str:
         if model_type not in cls._MODEL_NAME_TO_VERSION:
@@ -63,18 +81,45 @@ class OpenAIHandler(llm_handler_interface.LLMHandler):
                             **kwargs) -> List[str]:
         ...
 
-    @backoff.on_exception(backoff.expo, openai.RateLimitError)
     @classmethod
+    @backoff.on_exception(backoff.expo, openai.RateLimitError)
     def get_chat_completion(cls,
                             messages: Union[List[ChatCompletionMessageParam],
                                             List[Dict[str, str]]],
                             model_type: 'ps_pb2.ModelType', **kwargs) -> str:
         model = cls.get_model_version(model_type)
-        response: ChatCompletion = openai.chat.completions.create(
-            model=model,
-            messages=cast(List[ChatCompletionMessageParam], messages),
-            n=1,
-            **kwargs)
+        cache_key = ResponseCache.key(model, messages, **kwargs)
+        if cls._response_cache and (
+                cached := cls._response_cache.get(cache_key)) is not None:
+            return cached
+        with metrics.timed('llm_request_seconds', model=model,
+                           endpoint='chat'):
+            response: ChatCompletion = (
+                cls._client or openai).chat.completions.create(
+                    model=model,
+                    messages=cast(List[ChatCompletionMessageParam], messages),
+                    n=1,
+                    **kwargs)
+        cls.record_usage(model, response.usage)
+        content = cls.completion_content(response)
+        if cls._response_cache:
+            cls._response_cache.put(cache_key, content)
+        return content
+
+    @staticmethod
+    def record_usage(model: str, usage: Optional[CompletionUsage]):
+        if usage:
+            metrics.count('llm_tokens_total',
+                          usage.prompt_tokens,
+                          model=model,
+                          kind='prompt')
+            metrics.count('llm_tokens_total',
+                          usage.completion_tokens,
+                          model=model,
+                          kind='completion')
+
+    @staticmethod
+    def completion_content(response: ChatCompletion) -> str:
         if len(response.choices) != 1:
             raise ValueError(f'Expected one choice in response: {response}')
         if response.choices[0].finish_reason != 'stop' or not response.choices[
@@ -88,14 +133,47 @@ class OpenAIHandler(llm_handler_interface.LLMHandler):
             cls,
             input: str,
             model: Optional[EmbeddingModelVersion] = None) -> List[float]:
+        return cls.get_text_embeddings([input], model)[0]
+
+    # One request per batch_size inputs not already in the response cache
+    @classmethod
+    def get_text_embeddings(
+            cls,
+            inputs: List[str],
+            model: Optional[EmbeddingModelVersion] = None,
+            batch_size: int = MAX_EMBEDDING_BATCH_SIZE) -> List[List[float]]:
         MODEL_DEFAULT: EmbeddingModelVersion = EmbeddingModelVersion.ADA_002
         model = model or MODEL_DEFAULT
-        response = openai.embeddings.create(model=model.value,
-                                            encoding_format='float',
-                                            input=input)
-        if not response.data:
-            raise ValueError(f'No embedding in response: {response}')
-        elif len(response.data) != 1:
-            raise ValueError(
-                f'More than one embedding in response: {response}')
-        return np.array(response.data[0].embedding, dtype=float).tolist()
+        cache_keys = [
+            ResponseCache.key(model.value, input) for input in inputs
+        ]
+        embeddings: List[Optional[List[float]]] = [
+            cls._response_cache.get(cache_key) if cls._response_cache else None
+            for cache_key in cache_keys
+        ]
+        missing = [
+            i for i, embedding in enumerate(embeddings) if embedding is None
+        ]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            with metrics.timed('llm_request_seconds',
+                               model=model.value,
+                               endpoint='embeddings'):
+                response = (cls._client or openai).embeddings.create(
+                    model=model.value,
+                    encoding_format='float',
+                    input=[inputs[i] for i in batch])
+            metrics.count('llm_tokens_total',
+                          response.usage.prompt_tokens,
+                          model=model.value,
+                          kind='prompt')
+            if len(response.data) != len(batch):
+                raise ValueError(
+                    f'Expected {len(batch)} embeddings in response: {response}'
+                )
+            for data in response.data:
+                i = batch[data.index]
+                embeddings[i] = np.array(data.embedding, dtype=float).tolist()
+                if cls._response_cache:
+                    cls._response_cache.put(cache_keys[i], embeddings[i])
+        return cast(List[List[float]], embeddings)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+import contextlib
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Optional
+
+from domain import metrics
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# One JSON file per request, keyed by a hash of the model, inputs and request
+# kwargs. Entries are renamed into place, so concurrent writers never expose a
+# partial entry
+class ResponseCache:
+
+    def __init__(self, dir_path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._dir_path = dir_path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+        os.makedirs(dir_path, exist_ok=True)
+        self._size_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key(model: str, inputs: Any, **kwargs) -> str:
+        request = json.dumps(
+            {
+                'model': model,
+                'inputs': inputs,
+                'kwargs': kwargs
+            },
+            sort_keys=True,
+            default=str)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir_path, key[:2], f'{key}.json')
+
+    def _entries(self):
+        for shard in os.scandir(self._dir_path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    yield (stat.st_mtime, entry.path, stat.st_size)
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'r') as file:
+                value = json.load(file)
+            # mtime doubles as the last use time for eviction
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.stats.misses += 1
+            metrics.count('response_cache_lookups_total', result='miss')
+            return None
+        with self._lock:
+            self.stats.hits += 1
+        metrics.count('response_cache_lookups_total', result='hit')
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(value, file)
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                # An overwritten entry no longer counts towards the size
+                try:
+                    size -= os.path.getsize(path)
+                except FileNotFoundError:
+                    pass
+                os.replace(tmp_path, path)
+                self._size_bytes += size
+                over_budget = self._size_bytes > self._max_bytes
+        except BaseException:
+            # Already renamed into place if the failure came after replace
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        if over_budget:
+            self._evict()
+
+    # Drops the least recently used entries down to 90% of max_bytes
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            self._size_bytes = sum(size for _, _, size in entries)
+            target_bytes = int(self._max_bytes * 0.9)
+            for _, path, size in entries:
+                if self._size_bytes <= target_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self._size_bytes -= size
+                self.stats.evictions += 1
+                metrics.count('response_cache_evictions_total')
+        logging.info(f"Evicted response cache down to {self._size_bytes} "
+                     f"bytes - {self.stats}")
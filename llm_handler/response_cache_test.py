@@ -0,0 +1,111 @@
+import asyncio
+import concurrent.futures as futures
+import os
+
+import openai
+import pytest
+
+from llm_handler.async_openai_handler import AsyncOpenAIHandler
+from llm_handler.mock_openai_server import MockOpenAIServer
+from llm_handler.openai_handler import OpenAIHandler
+from llm_handler.response_cache import ResponseCache
+import proto.patched_solutions_pb2 as ps_pb2
+
+_MODEL = ps_pb2.MODEL_TYPE_GPT_3_5_TURBO
+_MESSAGES = [{"role": "user", "content": "Hello how are you?"}]
+
+
+def test_key_depends_on_model_inputs_and_kwargs():
+    key = ResponseCache.key("model", _MESSAGES, temperature=0)
+    assert key == ResponseCache.key("model", list(_MESSAGES), temperature=0)
+    assert key != ResponseCache.key("other", _MESSAGES, temperature=0)
+    assert key != ResponseCache.key("model", _MESSAGES, temperature=1)
+    assert key != ResponseCache.key("model", _MESSAGES[:0], temperature=0)
+
+
+def test_get_put_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get("ab12") is None
+    cache.put("ab12", {"solution": "print(1)"})
+    assert cache.get("ab12") == {"solution": "print(1)"}
+    assert ResponseCache(str(tmp_path)).get("ab12") == {"solution": "print(1)"}
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert cache.stats.hit_rate == 0.5
+
+
+def test_concurrent_writers_never_expose_partial_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    value = "x" * (1 << 16)
+    with futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: cache.put("ab12", value), range(32)))
+        reads = list(executor.map(lambda _: cache.get("ab12"), range(32)))
+    assert reads == [value] * 32
+    assert os.listdir(tmp_path / "ab") == ["ab12.json"]
+
+
+def test_put_overwrites_and_cleans_up_failed_writes(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("ab12", "x" * 100)
+    size_bytes = cache._size_bytes
+    cache.put("ab12", "y" * 100)
+    assert cache._size_bytes == size_bytes
+    with pytest.raises(TypeError):
+        cache.put("ab34", object())
+    assert os.listdir(tmp_path / "ab") == ["ab12.json"]
+    assert cache._size_bytes == size_bytes
+
+
+def test_put_interrupted_after_replace_raises_the_interrupt(
+        tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+
+    def replace_then_interrupt(src: str, dst: str):
+        os.rename(src, dst)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, "replace", replace_then_interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        cache.put("ab12", "x")
+    assert os.listdir(tmp_path / "ab") == ["ab12.json"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=320)
+    for i in range(3):
+        key = f"{i:02d}" + "0" * 62
+        cache.put(key, "x" * 90)
+        os.utime(cache._path(key), (i, i))
+    cache.get("00" + "0" * 62)
+    cache.put("03" + "0" * 62, "x" * 90)
+    assert cache.get("01" + "0" * 62) is None
+    assert cache.get("00" + "0" * 62) is not None
+    assert cache.stats.evictions == 1
+
+
+def test_openai_handler_serves_repeat_requests_from_cache(
+        tmp_path, monkeypatch):
+    with MockOpenAIServer(content="ok") as server:
+        monkeypatch.setattr(openai, "api_key", "test")
+        monkeypatch.setattr(openai, "base_url", server.base_url)
+        OpenAIHandler.set_response_cache(ResponseCache(str(tmp_path)))
+        try:
+            for _ in range(3):
+                assert OpenAIHandler.get_chat_completion(
+                    messages=_MESSAGES, model_type=_MODEL) == "ok"
+        finally:
+            OpenAIHandler.set_response_cache(None)
+        assert server.requests == 1
+
+
+def test_async_handler_serves_repeat_requests_from_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    with MockOpenAIServer(content="ok") as server:
+        handler = AsyncOpenAIHandler(client=openai.AsyncOpenAI(
+            api_key="test", base_url=server.base_url),
+                                     response_cache=cache)
+        for _ in range(3):
+            assert asyncio.run(
+                handler.get_chat_completion(messages=_MESSAGES,
+                                            model_type=_MODEL)) == "ok"
+        assert server.requests == 1
+    assert cache.stats.hits == 2